@@ -6,4 +6,5 @@ app_name = 'dashboard'
 
 urlpatterns = [
     path('', views.dashboard_view, name='dashboard'),
+    path('api/metrics/', views.request_metrics_api, name='request_metrics_api'),
 ]
@@ -1,60 +1,31 @@
 
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from ticketing_system.instrumentation import metrics_registry
 from tickets.models import Ticket
-from django.db.models import Count
-from django.utils import timezone
-from datetime import datetime, timedelta
+from tickets.stats import rollup_stats, today_stats
 
 @login_required
 def dashboard_view(request):
     # Get ticket statistics based on user role
     if request.user.is_staff:
-        open_tickets = Ticket.objects.filter(status='open').count()
-        in_progress_tickets = Ticket.objects.filter(status='in_progress').count()
-        resolved_tickets = Ticket.objects.filter(status__in=['resolved', 'closed']).count()
-        
-        # Get latest tickets for staff (admins) - sorted by creation date
-        latest_tickets = Ticket.objects.all().order_by('-created_at')[:5]
-        
-        # Get urgent tickets count
-        urgent_tickets = Ticket.objects.filter(
-            priority='urgent', 
-            status__in=['open', 'in_progress']
-        ).count()
-        
-        # Get tickets resolved today
-        today = timezone.now().date()
-        resolved_today = Ticket.objects.filter(
-            status='resolved',
-            updated_at__date=today
-        ).count()
-        
+        tickets = Ticket.objects.all()
+        stats = rollup_stats()
     else:
         # Regular users only see their own tickets
-        open_tickets = Ticket.objects.filter(created_by=request.user, status='open').count()
-        in_progress_tickets = Ticket.objects.filter(created_by=request.user, status='in_progress').count()
-        resolved_tickets = Ticket.objects.filter(
-            created_by=request.user, 
-            status__in=['resolved', 'closed']
-        ).count()
-        
-        # Get user's latest tickets
-        latest_tickets = Ticket.objects.filter(created_by=request.user).order_by('-created_at')[:5]
-        
-        urgent_tickets = Ticket.objects.filter(
-            created_by=request.user,
-            priority='urgent',
-            status__in=['open', 'in_progress']
-        ).count()
-        
-        # Get user's tickets resolved today
-        today = timezone.now().date()
-        resolved_today = Ticket.objects.filter(
-            created_by=request.user,
-            status='resolved',
-            updated_at__date=today
-        ).count()
+        tickets = Ticket.objects.filter(created_by=request.user)
+        stats = rollup_stats(request.user, relation='created')
+    
+    stats.update(today_stats(tickets))
+    open_tickets = stats['open']
+    in_progress_tickets = stats['in_progress']
+    resolved_tickets = stats['resolved'] + stats['closed']
+    urgent_tickets = stats['urgent']
+    resolved_today = stats['resolved_today']
+    
+    # Latest tickets, sorted by creation date
+    latest_tickets = tickets.order_by('-created_at')[:5]
     
     context = {
         'title': 'Dashboard',
@@ -66,3 +37,18 @@ def dashboard_view(request):
         'latest_tickets': latest_tickets,
     }
     return render(request, 'dashboard/dashboard.html', context)
+
+@login_required
+def request_metrics_api(request):
+    """
+    API endpoint with per-view request metrics of this server process (staff only).
+    Pass ``reset=true`` to clear them after reading.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Permission denied - admin only'}, status=403)
+    
+    views = metrics_registry.snapshot()
+    if request.GET.get('reset', 'false').lower() == 'true':
+        metrics_registry.reset()
+    
+    return JsonResponse({'views': views})
@@ -66,6 +66,27 @@ export function DataProvider({ children }: { children: React.ReactNode }) {
     }
   }, [user]);
 
+  // Refetch tickets when the server reports a change instead of polling
+  useEffect(() => {
+    if (!user) return;
+    let connected = false;
+    let timer: ReturnType<typeof setTimeout> | undefined;
+    const unsubscribe = ticketAPI.subscribeToEvents((type) => {
+      if (type === 'ready' && !connected) {
+        // First connection: the initial load is already fresh
+        connected = true;
+        return;
+      }
+      // Coalesce bursts (e.g. bulk updates) into one refetch
+      clearTimeout(timer);
+      timer = setTimeout(() => refreshTickets(), 300);
+    });
+    return () => {
+      clearTimeout(timer);
+      unsubscribe();
+    };
+  }, [user]);
+
   const loadInitialData = async () => {
     try {
       setLoading(true);
@@ -130,8 +151,18 @@ export function DataProvider({ children }: { children: React.ReactNode }) {
   const loadUsers = async () => {
     try {
       if (user?.role === 'admin') {
-        const response = await userAPI.getUsers();
-        const backendUsers = response.users.map((u: any) => ({
+        // The API is paginated; fetch every page so the Users page and its
+        // client-side filters see all users
+        const allUsers: any[] = [];
+        let page = 1;
+        let hasNext = true;
+        while (hasNext) {
+          const response = await userAPI.getUsers({ page, per_page: 500 });
+          allUsers.push(...response.users);
+          hasNext = response.pagination?.has_next ?? false;
+          page += 1;
+        }
+        const backendUsers = allUsers.map((u: any) => ({
           id: u.id.toString(),
           name: u.name,
           email: u.email,
@@ -72,6 +72,10 @@ export const ticketAPI = {
   // Get specific ticket details
   getTicket: (id: string) => apiRequest(`/tickets/api/tickets/${id}/`),
 
+  // Status, assignment, department and priority changes, oldest first
+  getTicketTimeline: (id: string, after?: string) =>
+    apiRequest(`/tickets/api/tickets/${id}/timeline/${after ? `?after=${after}` : ''}`),
+
   // Create new ticket
   createTicket: (ticketData: {
     subject: string;
@@ -83,6 +87,18 @@ export const ticketAPI = {
     body: JSON.stringify(ticketData),
   }),
 
+  // Create many tickets in one request; the response has a result per ticket
+  createTickets: (tickets: {
+    subject: string;
+    description: string;
+    priority: string;
+    department?: string;
+    created_by_id?: number;
+  }[], allOrNothing: boolean = false) => apiRequest('/tickets/api/tickets/submit/batch/', {
+    method: 'POST',
+    body: JSON.stringify({ tickets, all_or_nothing: allOrNothing }),
+  }),
+
   // Update ticket status
   updateTicketStatus: (id: string, status: string) => 
     apiRequest(`/tickets/api/tickets/${id}/status/`, {
@@ -137,6 +153,47 @@ export const ticketAPI = {
     apiRequest(`/tickets/${id}/reroute/`, {
       method: 'POST',
     }),
+
+  // Subscribe to ticket events (Server-Sent Events); returns an unsubscribe function.
+  // onEvent also receives 'ready' (on every (re)connect) and 'resync' events,
+  // after which anything shown may be stale.
+  subscribeToEvents: (onEvent: (type: string, data: any) => void) => {
+    const source = new EventSource(`${API_BASE_URL}/tickets/api/tickets/events/`, {
+      withCredentials: true,
+    });
+    const types = [
+      'ready', 'resync', 'ticket.created', 'ticket.deleted',
+      'ticket.status', 'ticket.assigned', 'ticket.comment',
+    ];
+    const handlers = types.map(type => {
+      const handler = (event: MessageEvent) => onEvent(type, JSON.parse(event.data));
+      source.addEventListener(type, handler);
+      return [type, handler] as const;
+    });
+    return () => {
+      handlers.forEach(([type, handler]) => source.removeEventListener(type, handler));
+      source.close();
+    };
+  },
+};
+
+// Analytics API endpoints (admin only)
+export const analyticsAPI = {
+  // Tickets created and resolved per day (or hour), from the activity rollups
+  getTrends: (params: {
+    granularity?: 'day' | 'hour';
+    since?: string;
+    until?: string;
+    group_by?: 'department' | 'priority';
+  } = {}) => {
+    const queryParams = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+      if (value !== undefined) {
+        queryParams.append(key, value.toString());
+      }
+    });
+    return apiRequest(`/tickets/api/analytics/trends/?${queryParams}`);
+  },
 };
 
 // Department API endpoints
@@ -146,7 +203,22 @@ export const departmentAPI = {
 
 // User API endpoints
 export const userAPI = {
-  getUsers: () => apiRequest('/tickets/api/users/'),
+  // Get users with filtering and pagination (50 per page by default)
+  getUsers: (params: {
+    role?: string;
+    department?: string;
+    is_active?: boolean;
+    page?: number;
+    per_page?: number;
+  } = {}) => {
+    const queryParams = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+      if (value !== undefined) {
+        queryParams.append(key, value.toString());
+      }
+    });
+    return apiRequest(`/tickets/api/users/?${queryParams}`);
+  },
 };
 
 // Authentication endpoints (if you have Django auth endpoints)
@@ -0,0 +1,212 @@
+"""
+Per-request SQL and timing instrumentation.
+
+RequestMetricsMiddleware wraps every database query a request runs, adds a
+Server-Timing header (total time, SQL time and query count, duplicated
+queries) and feeds a rolling per-view window kept in this process, which
+staff can read through dashboard's metrics API.
+
+A query counts as a duplicate when the same SQL, placeholders and all, has
+already run during the request: the usual sign of an N+1 loop.
+"""
+import math
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+# Upper bounds (ms) of the latency histogram buckets; the last is open-ended
+LATENCY_BUCKETS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+BUCKET_LABELS = [f'<={bound}ms' for bound in LATENCY_BUCKETS] + [f'>{LATENCY_BUCKETS[-1]}ms']
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper that counts and times the queries it sees.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values())
+
+    def most_repeated(self):
+        """Return (sql, count) of the most repeated statement, or None."""
+        if not self.statements:
+            return None
+        sql, count = self.statements.most_common(1)[0]
+        return (sql, count) if count > 1 else None
+
+
+def _percentile(ordered, pct):
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def _bucket(wall_ms):
+    for bound, label in zip(LATENCY_BUCKETS, BUCKET_LABELS):
+        if wall_ms <= bound:
+            return label
+    return BUCKET_LABELS[-1]
+
+
+class MetricsRegistry:
+    """
+    The last ``window`` requests of every view, with summary statistics.
+    """
+
+    def __init__(self, window=None):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._worst_repeats = {}
+
+    def record(self, view_name, wall_ms, sql_ms, queries, duplicates, status, repeated=None):
+        window = self.window or getattr(settings, 'REQUEST_METRICS_WINDOW', 1000)
+        with self._lock:
+            samples = self._samples.get(view_name)
+            if samples is None:
+                samples = self._samples[view_name] = deque(maxlen=window)
+            samples.append((wall_ms, sql_ms, queries, duplicates, status))
+            if repeated and repeated[1] > self._worst_repeats.get(view_name, ('', 1))[1]:
+                self._worst_repeats[view_name] = repeated
+
+    def snapshot(self):
+        """
+        Return a JSON-serialisable summary per view name.
+        """
+        with self._lock:
+            samples = {view: list(entries) for view, entries in self._samples.items()}
+            worst_repeats = dict(self._worst_repeats)
+
+        views = {}
+        for view, entries in sorted(samples.items()):
+            wall = sorted(entry[0] for entry in entries)
+            histogram = Counter(_bucket(wall_ms) for wall_ms in wall)
+            count = len(entries)
+            repeated = worst_repeats.get(view)
+            views[view] = {
+                'requests': count,
+                'errors': sum(1 for entry in entries if entry[4] >= 500),
+                'wall_ms': {
+                    'p50': round(_percentile(wall, 50), 2),
+                    'p95': round(_percentile(wall, 95), 2),
+                    'max': round(wall[-1], 2),
+                    'mean': round(sum(wall) / count, 2),
+                },
+                'sql_ms_mean': round(sum(entry[1] for entry in entries) / count, 2),
+                'queries_mean': round(sum(entry[2] for entry in entries) / count, 2),
+                'queries_max': max(entry[2] for entry in entries),
+                'duplicate_queries_max': max(entry[3] for entry in entries),
+                'most_repeated_query': {'sql': repeated[0], 'count': repeated[1]} if repeated else None,
+                'histogram': {label: histogram[label] for label in BUCKET_LABELS},
+            }
+        return views
+
+    def reset(self):
+        with self._lock:
+            self._samples = {}
+            self._worst_repeats = {}
+
+
+metrics_registry = MetricsRegistry()
+
+
+class RequestMetricsMiddleware:
+    """
+    Record query count, SQL time, duplicate queries and wall time per request.
+
+    Works in both sync and async chains, so async views under ASGI are not
+    pushed back onto a thread by this middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with self._recording(recorder):
+            response = self.get_response(request)
+        return self._finish(request, response, recorder, start)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        # Connections are per thread and the async ORM runs its queries on
+        # the request's sync thread, so wrap that thread's connections
+        recording = await sync_to_async(self._recording)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recording.close)()
+        return self._finish(request, response, recorder, start)
+
+    @staticmethod
+    def _recording(recorder):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        return stack
+
+    def _finish(self, request, response, recorder, start):
+        if (response.streaming and not response.is_async
+                and getattr(response, 'file_to_stream', None) is None):
+            # The body (and its queries) is produced after we return
+            response.streaming_content = self._record_stream(
+                response.streaming_content, request, response, recorder, start
+            )
+        else:
+            self._record(request, response, recorder, start)
+
+        wall_ms = (time.perf_counter() - start) * 1000
+        timings = [
+            f'total;dur={wall_ms:.1f}',
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"',
+        ]
+        if recorder.duplicates:
+            timings.append(f'dup;desc="{recorder.duplicates} duplicate queries"')
+        response['Server-Timing'] = ', '.join(timings)
+        return response
+
+    def _record_stream(self, content, request, response, recorder, start):
+        try:
+            with self._recording(recorder):
+                yield from content
+        finally:
+            self._record(request, response, recorder, start)
+
+    def _record(self, request, response, recorder, start):
+        match = getattr(request, 'resolver_match', None)
+        metrics_registry.record(
+            match.view_name if match else 'unresolved',
+            wall_ms=(time.perf_counter() - start) * 1000,
+            sql_ms=recorder.duration * 1000,
+            queries=recorder.count,
+            duplicates=recorder.duplicates,
+            status=response.status_code,
+            repeated=recorder.most_repeated(),
+        )
@@ -1,6 +1,9 @@
 
 from django.contrib import admin
-from .models import Ticket, TicketComment, TicketAttachment
+from django.db.models import Count
+from .models import (
+    Ticket, TicketComment, TicketAttachment, TicketEvent, SLAPolicy, ExportJob, RoutingRule, RoutingKeyword,
+)
 
 class TicketCommentInline(admin.TabularInline):
     model = TicketComment
@@ -21,6 +24,7 @@ class TicketAdmin(admin.ModelAdmin):
     inlines = [TicketCommentInline, TicketAttachmentInline]
     list_per_page = 20
     raw_id_fields = ('created_by', 'assigned_to')
+    readonly_fields = ('sla_due_at', 'sla_escalated_at')
 
 @admin.register(TicketComment)
 class CommentAdmin(admin.ModelAdmin):
@@ -35,3 +39,60 @@ class AttachmentAdmin(admin.ModelAdmin):
     list_filter = ('file_type', 'uploaded_at')
     search_fields = ('filename', 'ticket__subject', 'uploaded_by__username')
     raw_id_fields = ('ticket', 'uploaded_by')
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'format', 'status', 'rows_written', 'total_rows', 'created_at', 'finished_at')
+    list_filter = ('status', 'format', 'created_at')
+    search_fields = ('user__username',)
+    # Export files have no URL to link to (see ExportStorage)
+    exclude = ('file',)
+    readonly_fields = ('created_at', 'started_at', 'heartbeat_at', 'finished_at', 'file_name')
+    raw_id_fields = ('user',)
+
+    @admin.display(description='File')
+    def file_name(self, obj):
+        return obj.file.name
+
+@admin.register(TicketEvent)
+class TicketEventAdmin(admin.ModelAdmin):
+    """Ticket history is append-only: it can be browsed but not edited."""
+    list_display = ('id', 'ticket', 'code', 'actor', 'created_at')
+    list_filter = ('code', 'created_at')
+    search_fields = ('ticket__subject', 'actor__username')
+    readonly_fields = ('ticket', 'code', 'payload', 'actor', 'created_at')
+    list_select_related = ('ticket', 'actor')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(SLAPolicy)
+class SLAPolicyAdmin(admin.ModelAdmin):
+    list_display = ('priority', 'first_response_minutes', 'resolution_minutes')
+    list_editable = ('first_response_minutes', 'resolution_minutes')
+
+class RoutingKeywordInline(admin.TabularInline):
+    model = RoutingKeyword
+    extra = 3
+
+@admin.register(RoutingRule)
+class RoutingRuleAdmin(admin.ModelAdmin):
+    """Edits take effect on the next routed ticket, without a restart."""
+    list_display = ('department', 'position', 'is_active', 'keyword_count', 'updated_at')
+    list_editable = ('position', 'is_active')
+    readonly_fields = ('updated_at',)
+    search_fields = ('keywords__keyword',)
+    inlines = [RoutingKeywordInline]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(keyword_count=Count('keywords'))
+
+    @admin.display(description='Keywords', ordering='keyword_count')
+    def keyword_count(self, obj):
+        return obj.keyword_count
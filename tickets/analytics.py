@@ -0,0 +1,232 @@
+"""
+Time-series rollups of ticket activity for the analytics API.
+
+TicketActivityRollup holds how many tickets were created and resolved per
+hour (UTC) and per day (TIME_ZONE), department and priority, so trend
+queries read a few hundred rollup rows instead of grouping the tickets
+table. Tickets count under their current department and priority. A
+resolution is a status change into resolved or closed in the ticket
+history; tickets resolved before the history existed count at their
+resolved_at instead.
+
+update_rollups() is incremental. It finds the tickets touched since the
+watermark (every change bumps last_activity_at), recomputes only the hours
+their creation and resolutions fall in, then re-sums the days holding
+those hours from the hourly rows. Deleted tickets are not noticed; a full
+rebuild (rollup_ticket_activity --full) drops them.
+"""
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, Min, OuterRef, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import RollupWatermark, Ticket, TicketActivityRollup, TicketEvent
+from .sla import DONE_STATUSES
+
+WATERMARK = 'ticket_activity'
+# Changes are re-read this far behind the watermark, so a transaction that
+# committed after the last run with an earlier timestamp is not missed
+WATERMARK_OVERLAP = timedelta(minutes=5)
+# Touched hours closer than this are recomputed as one range
+MERGE_GAP = timedelta(hours=24)
+
+HOUR = timedelta(hours=1)
+# Trend API ranges
+TREND_DAYS = 365
+MAX_HOURLY_DAYS = 31
+
+
+def _hour(moment):
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _day(moment):
+    local = timezone.localtime(moment, timezone.get_default_timezone())
+    return local.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _ranges(starts, length):
+    """
+    Merge bucket starts into (start, end) ranges, joining buckets less
+    than MERGE_GAP apart.
+    """
+    ranges = []
+    for start in sorted(starts):
+        if ranges and start - ranges[-1][1] < MERGE_GAP:
+            ranges[-1][1] = start + length
+        else:
+            ranges.append([start, start + length])
+    return [tuple(bounds) for bounds in ranges]
+
+
+def resolution_events():
+    """
+    History events of tickets moving into a done status.
+    """
+    return TicketEvent.objects.filter(
+        code=TicketEvent.STATUS_CHANGED, payload__to__in=DONE_STATUSES,
+    ).exclude(payload__from__in=DONE_STATUSES)
+
+
+def touched_hours(since):
+    """
+    Hours holding the creation or a resolution of a ticket changed since.
+    """
+    changed = Ticket.objects.filter(last_activity_at__gt=since)
+    hours = set()
+    for created_at, resolved_at in changed.values_list('created_at', 'resolved_at').iterator():
+        hours.add(_hour(created_at))
+        if resolved_at:
+            hours.add(_hour(resolved_at))
+    resolved = resolution_events().filter(ticket__in=changed).values_list('created_at', flat=True)
+    hours.update(_hour(at) for at in resolved.iterator())
+    return hours
+
+
+def _hourly_counts(start, end):
+    """
+    Return {(hour, department, priority): [created, resolved]} for the
+    hours in [start, end), from the tickets and their history.
+    """
+    def grouped(rows, field):
+        return rows.annotate(
+            hour=TruncHour(field, tzinfo=dt_timezone.utc),
+        ).values('hour', 'department', 'priority').annotate(n=Count('pk')).order_by()
+
+    created = grouped(Ticket.objects.filter(created_at__gte=start, created_at__lt=end), 'created_at')
+    resolved = grouped(
+        resolution_events().filter(created_at__gte=start, created_at__lt=end).annotate(
+            department=F('ticket__department'), priority=F('ticket__priority'),
+        ),
+        'created_at',
+    )
+    resolved_before_history = grouped(
+        Ticket.objects.filter(resolved_at__gte=start, resolved_at__lt=end).exclude(
+            Exists(resolution_events().filter(ticket=OuterRef('pk')))
+        ),
+        'resolved_at',
+    )
+
+    counts = {}
+    for column, rows in ((0, created), (1, resolved), (1, resolved_before_history)):
+        for row in rows:
+            key = (row['hour'], row['department'] or '', row['priority'])
+            counts.setdefault(key, [0, 0])[column] += row['n']
+    return counts
+
+
+def _rebuild_hours(start, end):
+    TicketActivityRollup.objects.filter(
+        granularity=TicketActivityRollup.HOUR, bucket__gte=start, bucket__lt=end,
+    ).delete()
+    rows = [
+        TicketActivityRollup(
+            granularity=TicketActivityRollup.HOUR, bucket=hour, department=department,
+            priority=priority, created=created, resolved=resolved,
+        )
+        for (hour, department, priority), (created, resolved) in _hourly_counts(start, end).items()
+    ]
+    TicketActivityRollup.objects.bulk_create(rows, batch_size=1000)
+
+
+def _rebuild_days(start, end):
+    TicketActivityRollup.objects.filter(
+        granularity=TicketActivityRollup.DAY, bucket__gte=start, bucket__lt=end,
+    ).delete()
+    sums = TicketActivityRollup.objects.filter(
+        granularity=TicketActivityRollup.HOUR, bucket__gte=start, bucket__lt=end,
+    ).annotate(
+        day=TruncDay('bucket', tzinfo=timezone.get_default_timezone()),
+    ).values('day', 'department', 'priority').annotate(
+        created_sum=Sum('created'), resolved_sum=Sum('resolved'),
+    ).order_by()
+    TicketActivityRollup.objects.bulk_create([
+        TicketActivityRollup(
+            granularity=TicketActivityRollup.DAY, bucket=row['day'], department=row['department'],
+            priority=row['priority'], created=row['created_sum'], resolved=row['resolved_sum'],
+        )
+        for row in sums
+    ], batch_size=1000)
+
+
+def update_rollups(full=False):
+    """
+    Bring the rollups up to date with the changes since the watermark, or
+    rebuild them from scratch with full=True (also the first run).
+
+    Returns the number of (hourly, daily) buckets recomputed. Days are
+    summed from whole UTC hours, which assumes TIME_ZONE is a whole number
+    of hours from UTC.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # Also keeps two runs from interleaving
+        watermark = RollupWatermark.objects.select_for_update().filter(name=WATERMARK).first()
+        if full or watermark is None:
+            first = Ticket.objects.aggregate(first=Min('created_at'))['first']
+            TicketActivityRollup.objects.all().delete()
+            hour_ranges = [(_hour(first), _hour(now) + HOUR)] if first else []
+            day_ranges = [(_day(first), _day(now) + timedelta(days=1))] if first else []
+        else:
+            hours = touched_hours(watermark.processed_until - WATERMARK_OVERLAP)
+            hour_ranges = _ranges(hours, HOUR)
+            day_ranges = _ranges({_day(hour) for hour in hours}, timedelta(days=1))
+
+        for start, end in hour_ranges:
+            _rebuild_hours(start, end)
+        for start, end in day_ranges:
+            _rebuild_days(start, end)
+
+        RollupWatermark.objects.update_or_create(name=WATERMARK, defaults={'processed_until': now})
+
+    hour_count = sum((end - start) // HOUR for start, end in hour_ranges)
+    day_count = sum((end - start).days for start, end in day_ranges)
+    return hour_count, day_count
+
+
+def last_updated():
+    """
+    When the rollups were last brought up to date, or None.
+    """
+    return RollupWatermark.objects.filter(name=WATERMARK).values_list('processed_until', flat=True).first()
+
+
+def trend_params(params):
+    """
+    Return (granularity, start, end, group_by) from the trend API's query
+    parameters; raises ValueError if one is invalid.
+    """
+    granularity = params.get('granularity', TicketActivityRollup.DAY)
+    if granularity not in (TicketActivityRollup.HOUR, TicketActivityRollup.DAY):
+        raise ValueError('granularity must be "day" or "hour"')
+    group_by = params.get('group_by') or None
+    if group_by not in (None, 'department', 'priority'):
+        raise ValueError('group_by must be "department" or "priority"')
+
+    tz = timezone.get_default_timezone()
+    until = date.fromisoformat(params['until']) if params.get('until') else timezone.localdate(timezone=tz)
+    since = date.fromisoformat(params['since']) if params.get('since') else until - timedelta(days=TREND_DAYS)
+    if since > until:
+        raise ValueError('since must not be after until')
+    if granularity == TicketActivityRollup.HOUR and (until - since).days >= MAX_HOURLY_DAYS:
+        raise ValueError(f'Hourly trends cover at most {MAX_HOURLY_DAYS} days')
+
+    start = timezone.make_aware(datetime.combine(since, time.min), tz)
+    end = timezone.make_aware(datetime.combine(until + timedelta(days=1), time.min), tz)
+    return granularity, start, end, group_by
+
+
+def trend_rows(granularity, start, end, group_by=None):
+    """
+    Created and resolved counts per bucket in [start, end), oldest first,
+    optionally split by 'department' or 'priority'; buckets without
+    activity are left out. One read of the rollup index.
+    """
+    fields = ['bucket'] + ([group_by] if group_by else [])
+    return list(TicketActivityRollup.objects.filter(
+        granularity=granularity, bucket__gte=start, bucket__lt=end,
+    ).values(*fields).annotate(
+        created_count=Sum('created'), resolved_count=Sum('resolved'),
+    ).order_by(*fields))
@@ -0,0 +1,153 @@
+"""
+Async versions of the read-heavy ticket API views.
+
+They return the same payloads, status codes and conditional-GET headers as
+their counterparts in tickets.views (the serializers and query builders are
+shared), but wait on the database with the async ORM, so under an ASGI
+server a request does not hold a thread while its queries run. They are
+served under /tickets/api/async/ next to the sync endpoints.
+"""
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.cache import cache_control
+
+from .conditional import listed_tickets, single_ticket, ticket_scope_condition, visible_tickets
+from .filters import filter_tickets, ticket_listing
+from .models import Ticket
+from .pagination import InvalidCursor, acached_count, akeyset_page, comment_page_params, comments_after
+from .search import asearch_tickets
+from .serializers import (
+    serialize_attachment, serialize_comment, serialize_search_result, serialize_ticket_detail,
+    serialize_ticket_row,
+)
+from .stats import arollup_stats, atoday_stats
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@ticket_scope_condition(listed_tickets)
+async def get_tickets_api(request):
+    """
+    Async version of tickets.views.get_tickets_api.
+    """
+    user = await request.auser()
+    page = int(request.GET.get('page', 1))
+    per_page = int(request.GET.get('per_page', 20))
+
+    tickets = ticket_listing(filter_tickets(user, request.GET))
+
+    if 'cursor' in request.GET:
+        try:
+            page_tickets, next_cursor = await akeyset_page(tickets, request.GET['cursor'], per_page)
+        except InvalidCursor as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        pagination = {
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'has_next': next_cursor is not None,
+        }
+        if request.GET.get('include_count', 'false').lower() == 'true':
+            pagination['total_count'] = await acached_count(tickets)
+
+        return JsonResponse({
+            'tickets': [serialize_ticket_row(ticket) for ticket in page_tickets],
+            'pagination': pagination,
+        })
+
+    # Paginator only counts and slices; do both queries asynchronously
+    paginator = Paginator(tickets, per_page)
+    paginator.count = await tickets.acount()
+    page_obj = paginator.get_page(page)
+    tickets_data = [serialize_ticket_row(ticket) async for ticket in page_obj.object_list]
+
+    return JsonResponse({
+        'tickets': tickets_data,
+        'pagination': {
+            'current_page': page_obj.number,
+            'total_pages': paginator.num_pages,
+            'total_count': paginator.count,
+            'has_next': page_obj.has_next(),
+            'has_previous': page_obj.has_previous(),
+        }
+    })
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@ticket_scope_condition(visible_tickets, daily=True)
+async def get_ticket_stats_api(request):
+    """
+    Async version of tickets.views.get_ticket_stats_api.
+    """
+    user = await request.auser()
+    if user.is_staff:
+        stats = await arollup_stats()
+        stats.update(await atoday_stats(Ticket.objects.all()))
+    else:
+        stats = await arollup_stats(user)
+    return JsonResponse(stats)
+
+
+@login_required
+async def search_tickets_api(request):
+    """
+    Async version of tickets.views.search_tickets_api.
+    """
+    user = await request.auser()
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'tickets': []})
+
+    tickets = await asearch_tickets(filter_tickets(user, {}), query, limit=20)
+    return JsonResponse({'tickets': [serialize_search_result(ticket) for ticket in tickets]})
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@ticket_scope_condition(single_ticket)
+async def get_ticket_detail_api(request, ticket_id):
+    """
+    Async version of tickets.views.get_ticket_detail_api.
+    """
+    user = await request.auser()
+    ticket = await aget_object_or_404(
+        Ticket.objects.select_related('created_by', 'assigned_to'), id=ticket_id
+    )
+    if not user.is_staff and user.id not in (ticket.created_by_id, ticket.assigned_to_id):
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    ticket_data = serialize_ticket_detail(ticket)
+
+    comment_rows = ticket.comments.select_related('author').order_by('created_at', 'id')
+    if not user.is_staff:
+        comment_rows = comment_rows.filter(is_internal=False)
+
+    paginate_comments = 'comments_after' in request.GET or 'comments_limit' in request.GET
+    if paginate_comments:
+        try:
+            after, limit = comment_page_params(request.GET)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid comment pagination parameters'}, status=400)
+        comment_rows = comments_after(comment_rows, after, limit)
+
+    comments = [serialize_comment(comment) async for comment in comment_rows]
+    if paginate_comments:
+        has_more = len(comments) > limit
+        comments = comments[:limit]
+
+    ticket_data['comments'] = comments
+    ticket_data['attachments'] = [
+        serialize_attachment(attachment)
+        async for attachment in ticket.attachments.select_related('uploaded_by')
+    ]
+    if paginate_comments:
+        ticket_data['comments_pagination'] = {
+            'limit': limit,
+            'has_more': has_more,
+            'next_after': comments[-1]['id'] if has_more else None,
+        }
+
+    return JsonResponse(ticket_data)
@@ -0,0 +1,99 @@
+"""
+Conditional GET support for the ticket read APIs.
+
+A response is identified by the tickets it is built from: the latest
+last_activity_at among them (bumped by ticket saves and by comment and
+attachment changes) and their number (which catches deletions). Both come
+from one aggregate query, so an unchanged poll costs that query and a 304
+instead of the full view. The ETag also covers the user, their staff flag
+and the query string, so a response is never reused across permission
+scopes or filters.
+
+Async views are supported: the aggregate (and the user) are loaded with
+the async ORM before condition() asks for them synchronously.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .filters import filter_tickets
+
+
+SCOPE_AGGREGATES = {'latest': Max('last_activity_at'), 'count': Count('id')}
+
+
+def _scope_state(request, scope, args, kwargs):
+    # condition() asks for the ETag and Last-Modified separately; compute once
+    state = getattr(request, '_ticket_scope_state', None)
+    if state is None:
+        state = scope(request, *args, **kwargs).order_by().aggregate(**SCOPE_AGGREGATES)
+        request._ticket_scope_state = state
+    return state
+
+
+async def _ascope_state(request, scope, args, kwargs):
+    # Resolve the lazy user here; touching it synchronously would query
+    request.user = await request.auser()
+    request._ticket_scope_state = await scope(request, *args, **kwargs).order_by().aaggregate(
+        **SCOPE_AGGREGATES
+    )
+
+
+def ticket_scope_condition(scope, daily=False):
+    """
+    View decorator adding ETag/Last-Modified handling for a view whose
+    response depends only on the tickets returned by scope(request, *args,
+    **kwargs). Pass daily=True when the response also changes at midnight
+    (e.g. "created today" figures).
+    """
+    def etag(request, *args, **kwargs):
+        state = _scope_state(request, scope, args, kwargs)
+        parts = [
+            request.user.pk,
+            request.user.is_staff,
+            request.GET.urlencode(),
+            state['latest'].isoformat() if state['latest'] else '',
+            state['count'],
+        ]
+        if daily:
+            parts.append(timezone.localdate().isoformat())
+        return hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        if daily:
+            return None
+        return _scope_state(request, scope, args, kwargs)['latest']
+
+    conditional = condition(etag_func=etag, last_modified_func=last_modified)
+
+    def decorator(view):
+        conditional_view = conditional(view)
+        if not iscoroutinefunction(view):
+            return conditional_view
+
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            await _ascope_state(request, scope, args, kwargs)
+            return await conditional_view(request, *args, **kwargs)
+        return inner
+
+    return decorator
+
+
+def visible_tickets(request, *args, **kwargs):
+    """Tickets the user may see."""
+    return filter_tickets(request.user, {})
+
+
+def listed_tickets(request, *args, **kwargs):
+    """Tickets get_tickets_api lists for this request's filters."""
+    return filter_tickets(request.user, request.GET)
+
+
+def single_ticket(request, ticket_id):
+    """The ticket get_ticket_detail_api shows, if the user may see it."""
+    return filter_tickets(request.user, {}).filter(pk=ticket_id)
@@ -0,0 +1,279 @@
+"""
+Maintenance of the TicketCounter and TicketUserCounter rollups.
+
+Every change to a ticket is described as an (old, new) pair of TicketState
+tuples; None stands for "no ticket" on either side (creation, deletion).
+The pairs are turned into count deltas and applied set-based, with one
+INSERT ... ON CONFLICT DO UPDATE SET count = count + n per counter table
+(plus one UPDATE for rows that are only decremented), so the cost of a bulk
+change does not grow with the number of tickets and users it touches, and
+concurrent writers never overwrite each other.
+"""
+from collections import Counter, namedtuple
+
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .events import publish_ticket_changes
+from .history import record_transitions
+from .models import Ticket, TicketCounter, TicketUserCounter
+from .response_cache import bump_version_on_commit
+from .sla import bulk_sla_changes, record_bulk_changes
+
+TicketState = namedtuple(
+    'TicketState', ['status', 'priority', 'department', 'created_by_id', 'assigned_to_id']
+)
+STATE_FIELDS = TicketState._fields
+
+
+def state_of(ticket):
+    """
+    Return the TicketState of a ticket instance, or None if any of the
+    tracked fields was deferred when it was loaded.
+    """
+    values = ticket.__dict__
+    if any(field not in values for field in STATE_FIELDS):
+        return None
+    return TicketState(*(values[field] for field in STATE_FIELDS))
+
+
+def _deltas(changes):
+    """
+    Turn (old, new) state pairs into counter deltas.
+    """
+    ticket_deltas = Counter()
+    user_deltas = {}
+
+    def add(state, sign):
+        ticket_deltas[(state.status, state.priority, state.department or '')] += sign
+        for field, user_id in (('created', state.created_by_id), ('assigned', state.assigned_to_id)):
+            if user_id is not None:
+                user_deltas.setdefault((user_id, state.status, state.priority), Counter())[field] += sign
+        for user_id in {state.created_by_id, state.assigned_to_id} - {None}:
+            user_deltas.setdefault((user_id, state.status, state.priority), Counter())['involved'] += sign
+
+    for old, new in changes:
+        if old == new:
+            continue
+        if old is not None:
+            add(old, -1)
+        if new is not None:
+            add(new, 1)
+    return ticket_deltas, user_deltas
+
+
+def _upsert(model, key_fields, value_fields, rows):
+    """
+    Add the deltas of rows ((key values, {field: delta}) pairs) to model's
+    counters, creating missing ones, with one statement per 500 rows.
+    ON CONFLICT DO UPDATE is understood by both PostgreSQL and SQLite.
+    """
+    opts = model._meta
+    quote = connection.ops.quote_name
+    table = quote(opts.db_table)
+    key_columns = [quote(opts.get_field(field).column) for field in key_fields]
+    value_columns = [quote(field) for field in value_fields]
+    placeholders = '(' + ', '.join(['%s'] * (len(key_columns) + len(value_columns))) + ')'
+    assignments = ', '.join(f'{column} = {table}.{column} + EXCLUDED.{column}' for column in value_columns)
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), 500):
+            batch = rows[start:start + 500]
+            params = [
+                value
+                for key, deltas in batch
+                for value in (*key, *(deltas.get(field, 0) for field in value_fields))
+            ]
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(key_columns + value_columns)}) '
+                f'VALUES {", ".join([placeholders] * len(batch))} '
+                f'ON CONFLICT ({", ".join(key_columns)}) DO UPDATE SET {assignments}',
+                params,
+            )
+
+
+def _decrement(model, key_fields, value_fields, rows):
+    """
+    Subtract the deltas of rows from the counters that exist, with one
+    UPDATE. Missing counters are left alone, e.g. those of a deleted user.
+    """
+    matches = [(Q(**dict(zip(key_fields, key))), deltas) for key, deltas in rows]
+    updates = {
+        field: F(field) + Case(
+            *[When(match, then=Value(deltas[field])) for match, deltas in matches if deltas.get(field)],
+            default=Value(0),
+        )
+        for field in value_fields
+    }
+    condition = Q()
+    for match, _ in matches:
+        condition |= match
+    model.objects.filter(condition).update(**updates)
+
+
+def _apply(model, key_fields, value_fields, deltas):
+    """
+    Apply {key values: {field: delta}} to model's counters.
+    """
+    rows = []
+    # Sorted so concurrent writers lock the rows in the same order
+    for key in sorted(deltas):
+        fields = {field: delta for field, delta in deltas[key].items() if delta}
+        if fields:
+            rows.append((key, fields))
+    # Counters only need creating when something is added to them
+    created = [(key, fields) for key, fields in rows if any(delta > 0 for delta in fields.values())]
+    decremented = [(key, fields) for key, fields in rows if not any(delta > 0 for delta in fields.values())]
+    if created:
+        _upsert(model, key_fields, value_fields, created)
+    if decremented:
+        _decrement(model, key_fields, value_fields, decremented)
+
+
+def record_ticket_changes(changes):
+    """
+    Apply (old, new) TicketState pairs to the counters, with at most two
+    statements per counter table.
+    """
+    ticket_deltas, user_deltas = _deltas(changes)
+    with transaction.atomic():
+        _apply(
+            TicketCounter, ('status', 'priority', 'department'), ('count',),
+            {key: {'count': delta} for key, delta in ticket_deltas.items()},
+        )
+        _apply(
+            TicketUserCounter, ('user', 'status', 'priority'), ('created', 'assigned', 'involved'),
+            user_deltas,
+        )
+
+
+def update_tickets(tickets, actor=None, **changes):
+    """
+    QuerySet.update() for tickets that keeps the counters and SLA timers in
+    step, records their history (credited to actor) and publishes the live
+    events a save() would have.
+
+    ``changes`` may set status, priority, department, created_by or
+    assigned_to (plus any untracked fields). updated_at and
+    last_activity_at are set to now unless given, as save() would.
+    Returns (updated_count, transitions) where transitions are the
+    (old, new) TicketState pairs.
+    """
+    now = timezone.now()
+    changes.setdefault('updated_at', now)
+    changes.setdefault('last_activity_at', now)
+
+    state_changes = {}
+    for field, value in changes.items():
+        if field in ('created_by', 'assigned_to'):
+            state_changes[f'{field}_id'] = value.pk if value is not None else None
+        elif field in STATE_FIELDS:
+            state_changes[field] = value
+
+    with transaction.atomic():
+        # Lock the rows so the snapshot matches what the update changes
+        rows = list(tickets.select_for_update().values_list('pk', *STATE_FIELDS))
+        updated_count = tickets.update(**changes, **bulk_sla_changes(changes))
+        transitions = [
+            (state, state._replace(**state_changes))
+            for state in (TicketState(*row[1:]) for row in rows)
+        ]
+        record_ticket_changes(transitions)
+        # update() sends no signals; invalidate and announce explicitly
+        bump_version_on_commit('tickets')
+        changes_by_ticket = [(row[0], old, new) for row, (old, new) in zip(rows, transitions)]
+        record_transitions(changes_by_ticket, actor)
+        record_bulk_changes(changes_by_ticket, actor)
+        publish_ticket_changes(changes_by_ticket)
+    return updated_count, transitions
+
+
+def expected_counters():
+    """
+    Compute the counters from the tickets table.
+    Returns ({(status, priority, department): count},
+             {(user_id, status, priority): {'created': n, 'assigned': n, 'involved': n}}).
+    """
+    tickets = Ticket.objects.order_by()
+    ticket_counts = {
+        (row['status'], row['priority'], row['dept']): row['n']
+        for row in tickets.annotate(dept=Coalesce('department', Value(''))).values(
+            'status', 'priority', 'dept'
+        ).annotate(n=Count('id'))
+    }
+
+    user_counts = {}
+
+    def add(rows, user_field, fields, sign=1):
+        for row in rows.values(user_field, 'status', 'priority').annotate(n=Count('id')):
+            counts = user_counts.setdefault(
+                (row[user_field], row['status'], row['priority']),
+                {'created': 0, 'assigned': 0, 'involved': 0},
+            )
+            for field in fields:
+                counts[field] += sign * row['n']
+
+    add(tickets, 'created_by', ['created', 'involved'])
+    add(tickets.filter(assigned_to__isnull=False), 'assigned_to', ['assigned', 'involved'])
+    # Tickets assigned to their own creator are only involved once
+    add(tickets.filter(assigned_to=F('created_by')), 'created_by', ['involved'], sign=-1)
+
+    return ticket_counts, user_counts
+
+
+def current_counters():
+    """
+    Read the counters table in the same shape as expected_counters(),
+    leaving out rows that are all zero.
+    """
+    ticket_counts = {
+        (c.status, c.priority, c.department): c.count
+        for c in TicketCounter.objects.exclude(count=0)
+    }
+    user_counts = {
+        (c.user_id, c.status, c.priority): {
+            'created': c.created, 'assigned': c.assigned, 'involved': c.involved,
+        }
+        for c in TicketUserCounter.objects.all()
+        if c.created or c.assigned or c.involved
+    }
+    return ticket_counts, user_counts
+
+
+def find_discrepancies():
+    """
+    Return a list of (counter key, stored value, expected value) for every
+    counter that disagrees with the tickets table.
+    """
+    expected_tickets, expected_users = expected_counters()
+    current_tickets, current_users = current_counters()
+
+    discrepancies = []
+    for expected, current in ((expected_tickets, current_tickets), (expected_users, current_users)):
+        for key in sorted(set(expected) | set(current), key=str):
+            if expected.get(key) != current.get(key):
+                discrepancies.append((key, current.get(key), expected.get(key)))
+    return discrepancies
+
+
+def rebuild_counters():
+    """
+    Replace both counter tables with values computed from the tickets table.
+    Returns (ticket counter rows, user counter rows) written.
+    """
+    with transaction.atomic():
+        ticket_counts, user_counts = expected_counters()
+        TicketCounter.objects.all().delete()
+        TicketUserCounter.objects.all().delete()
+        TicketCounter.objects.bulk_create([
+            TicketCounter(status=status, priority=priority, department=department, count=count)
+            for (status, priority, department), count in ticket_counts.items()
+        ], batch_size=1000)
+        TicketUserCounter.objects.bulk_create([
+            TicketUserCounter(user_id=user_id, status=status, priority=priority, **counts)
+            for (user_id, status, priority), counts in user_counts.items()
+        ], batch_size=1000)
+        bump_version_on_commit('tickets')
+    return len(ticket_counts), len(user_counts)
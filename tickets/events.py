@@ -0,0 +1,290 @@
+"""
+Real-time ticket events for dashboards.
+
+Ticket changes are published as small JSON-able dicts once their
+transaction commits; ticket_events_stream relays them to every open
+Server-Sent Events connection, filtered to what that user may see, so
+clients refetch only when something they show has changed instead of
+polling the list and stats APIs.
+
+The broker is chosen by settings.TICKET_EVENT_BROKER (a dotted path):
+
+- tickets.events.InProcessBroker (default) fans events out to the
+  subscribers of this process only; fine for a single ASGI worker.
+- tickets.events.RedisBroker goes through Redis pub/sub so every worker
+  sees every event. It needs the redis package, imported on first use.
+
+Streams are long-lived, so the endpoint must be served by an ASGI server
+(e.g. uvicorn ticketing_system.asgi:application); under WSGI each open
+stream would hold a worker thread.
+"""
+import asyncio
+import importlib
+import json
+import logging
+import threading
+from contextlib import asynccontextmanager, suppress
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+EVENT_QUEUE_SIZE = 256
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 5000
+
+
+class Subscription:
+    """
+    One stream's queue of events, owned by the event loop that created it.
+
+    A client too slow to keep up loses its backlog and gets a single
+    "resync" event instead, telling it to refetch.
+    """
+
+    def __init__(self, maxsize=EVENT_QUEUE_SIZE):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def deliver(self, event):
+        # Always called on self.loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout=None):
+        """
+        Return the next event, or None if there was none within timeout.
+        """
+        if self.overflowed:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.overflowed = False
+            return {'type': 'resync'}
+        # Not asyncio.wait_for(): before Python 3.12 it can swallow the
+        # cancellation of a disconnected client's stream
+        getter = asyncio.ensure_future(self.queue.get())
+        try:
+            done, _ = await asyncio.wait({getter}, timeout=timeout)
+        finally:
+            getter.cancel()
+        return getter.result() if done else None
+
+
+class InProcessBroker:
+    """
+    Fan events out to the subscriptions of this process.
+
+    publish() may be called from any thread (sync views run in a thread
+    pool under ASGI); delivery is handed to each subscriber's event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+
+    def publish(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The loop has closed; its stream is going away
+                pass
+
+    @asynccontextmanager
+    async def subscribe(self):
+        subscription = Subscription()
+        with self._lock:
+            self._subscriptions.add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                self._subscriptions.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+
+def _import_redis(module):
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        raise ImproperlyConfigured('RedisBroker requires the redis package (pip install redis)')
+
+
+class RedisBroker:
+    """
+    Relay events through a Redis pub/sub channel shared by all workers.
+
+    Configured by settings.TICKET_EVENT_REDIS_URL and
+    settings.TICKET_EVENT_CHANNEL.
+    """
+
+    def __init__(self, url=None, channel=None):
+        self.url = url or getattr(settings, 'TICKET_EVENT_REDIS_URL', 'redis://localhost:6379/0')
+        self.channel = channel or getattr(settings, 'TICKET_EVENT_CHANNEL', 'kyusitix:ticket-events')
+        self._client = None
+
+    def publish(self, event):
+        if self._client is None:
+            self._client = _import_redis('redis').Redis.from_url(self.url)
+        self._client.publish(self.channel, json.dumps(event))
+
+    @asynccontextmanager
+    async def subscribe(self):
+        client = _import_redis('redis.asyncio').Redis.from_url(self.url)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(self.channel)
+        subscription = Subscription()
+
+        async def pump():
+            async for message in pubsub.listen():
+                if message['type'] == 'message':
+                    subscription.deliver(json.loads(message['data']))
+
+        task = asyncio.create_task(pump())
+        try:
+            yield subscription
+        finally:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+            await pubsub.unsubscribe(self.channel)
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            path = getattr(settings, 'TICKET_EVENT_BROKER', 'tickets.events.InProcessBroker')
+            _broker = import_string(path)()
+        return _broker
+
+
+def _send(events):
+    broker = get_broker()
+    for event in events:
+        try:
+            broker.publish(event)
+        except Exception:
+            # Events are a hint to refetch; never fail the request over one
+            logger.exception('Could not publish ticket event %s', event['type'])
+
+
+def publish_on_commit(events):
+    """
+    Publish events once the current transaction commits (immediately
+    outside one), so subscribers never see changes that were rolled back.
+    """
+    events = list(events)
+    if events:
+        transaction.on_commit(lambda: _send(events))
+
+
+def _event(event_type, ticket_id, state, **extra):
+    return {
+        'type': event_type,
+        'ticket_id': ticket_id,
+        'status': state.status,
+        'priority': state.priority,
+        'department': state.department,
+        'created_by_id': state.created_by_id,
+        'assigned_to_id': state.assigned_to_id,
+        'at': timezone.now().isoformat(),
+        **extra,
+    }
+
+
+def ticket_change_events(ticket_id, old, new):
+    """
+    Events for one ticket going from TicketState old to new (None for
+    "no ticket" on either side).
+    """
+    if old is None and new is None:
+        return []
+    if old is None:
+        return [_event('ticket.created', ticket_id, new)]
+    if new is None:
+        return [_event('ticket.deleted', ticket_id, old)]
+    events = []
+    if old.status != new.status:
+        events.append(_event('ticket.status', ticket_id, new, previous_status=old.status))
+    if old.assigned_to_id != new.assigned_to_id:
+        events.append(_event(
+            'ticket.assigned', ticket_id, new, previous_assigned_to_id=old.assigned_to_id,
+        ))
+    return events
+
+
+def publish_ticket_changes(changes):
+    """
+    Publish the events for (ticket_id, old, new) TicketState triples.
+    """
+    publish_on_commit(
+        event for ticket_id, old, new in changes
+        for event in ticket_change_events(ticket_id, old, new)
+    )
+
+
+def publish_comment(comment, state):
+    """
+    Publish a new comment on a ticket whose TicketState is state.
+    """
+    publish_on_commit([_event(
+        'ticket.comment', comment.ticket_id, state,
+        comment_id=comment.pk, author_id=comment.author_id, is_internal=comment.is_internal,
+    )])
+
+
+def visible_to(event, user_id, is_staff):
+    """
+    Whether a user may receive an event: staff see everything, others
+    only public events on tickets they created or are (or were) assigned.
+    """
+    if is_staff or event['type'] == 'resync':
+        return True
+    if event.get('is_internal'):
+        return False
+    return user_id in (
+        event['created_by_id'], event['assigned_to_id'], event.get('previous_assigned_to_id'),
+    )
+
+
+def format_event(event):
+    return f'event: {event["type"]}\ndata: {json.dumps(event)}\n\n'
+
+
+async def event_stream(user_id, is_staff, heartbeat=None):
+    """
+    Server-Sent Events body: the user's ticket events as they happen, with
+    a comment line every ``heartbeat`` seconds to keep proxies from closing
+    an idle connection.
+    """
+    heartbeat = heartbeat or getattr(settings, 'TICKET_EVENT_HEARTBEAT', HEARTBEAT_SECONDS)
+    async with get_broker().subscribe() as subscription:
+        # Sent straight away so the client knows it is subscribed and can
+        # refetch anything that changed before this point
+        yield f'retry: {RETRY_MILLISECONDS}\nevent: ready\ndata: {{}}\n\n'
+        while True:
+            event = await subscription.get(timeout=heartbeat)
+            if event is None:
+                yield ': heartbeat\n\n'
+            elif visible_to(event, user_id, is_staff):
+                yield format_event(event)
@@ -0,0 +1,295 @@
+"""
+Ticket exports.
+
+Rows are read with values_list() over a server-side cursor, so an export
+holds one chunk of tuples in memory at a time no matter how many tickets
+it covers, and creator/assignee usernames come from the same query.
+
+Large exports run as ExportJobs on a small thread pool in the web process:
+the request only records the job, a worker writes the file under
+TICKET_EXPORT_ROOT (outside MEDIA_ROOT; download_export serves it to the
+job's owner) chunk by chunk and reports progress on the job row.
+Jobs lost with their process (a restart or crash) stop showing signs of
+life and are marked failed once TICKET_EXPORT_TIMEOUT_MINUTES have passed,
+when their status is next read.
+"""
+import csv
+import gzip
+import json
+import os
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .filters import filter_tickets
+from .models import ExportJob, Ticket
+
+EXPORT_CHUNK_SIZE = 2000
+# Minutes without a sign of life after which a queued or running job is
+# taken to be lost
+EXPORT_TIMEOUT_MINUTES = 30
+ACTIVE_STATUSES = ['queued', 'running']
+
+EXPORT_HEADER = [
+    'Ticket ID', 'Title', 'Description', 'Status', 'Priority',
+    'Creator', 'Assignee', 'Department', 'Created At', 'Updated At',
+]
+
+EXPORT_FIELDS = [
+    'id', 'subject', 'description', 'status', 'priority',
+    'created_by__username', 'assigned_to__username', 'department',
+    'created_at', 'updated_at',
+]
+
+_STATUS_LABELS = dict(Ticket.STATUS_CHOICES)
+_PRIORITY_LABELS = dict(Ticket.PRIORITY_CHOICES)
+
+
+def export_rows(tickets, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield one list of display values per ticket in the tickets queryset,
+    in the order of EXPORT_HEADER.
+    """
+    rows = tickets.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    for (pk, subject, description, status, priority,
+         creator, assignee, department, created_at, updated_at) in rows:
+        yield [
+            pk,
+            subject,
+            description,
+            _STATUS_LABELS.get(status, status),
+            _PRIORITY_LABELS.get(priority, priority),
+            creator,
+            assignee or 'Unassigned',
+            department or 'N/A',
+            created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            updated_at.strftime('%Y-%m-%d %H:%M:%S'),
+        ]
+
+
+class Echo:
+    """
+    File-like object whose write() returns what it was given, so csv.writer
+    produces lines for a streaming response instead of buffering them.
+    """
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(tickets):
+    """
+    Yield the CSV export of the tickets queryset line by line.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    for row in export_rows(tickets):
+        yield writer.writerow(row)
+
+
+# Machine-readable column names for the JSON Lines and Parquet formats
+RECORD_FIELDS = [
+    'id', 'subject', 'description', 'status', 'priority',
+    'created_by', 'assigned_to', 'department', 'created_at', 'updated_at',
+]
+
+EXPORT_EXTENSIONS = {'csv': 'csv.gz', 'jsonl': 'jsonl.gz', 'parquet': 'parquet'}
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _records(tickets):
+    rows = tickets.values_list(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for row in rows:
+        yield dict(zip(RECORD_FIELDS, row))
+
+
+def _write_csv(tickets, path, progress):
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_HEADER)
+        for chunk in _chunks(export_rows(tickets), EXPORT_CHUNK_SIZE):
+            writer.writerows(chunk)
+            progress(len(chunk))
+
+
+def _write_jsonl(tickets, path, progress):
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        for chunk in _chunks(_records(tickets), EXPORT_CHUNK_SIZE):
+            f.writelines(
+                json.dumps(record, default=lambda value: value.isoformat()) + '\n'
+                for record in chunk
+            )
+            progress(len(chunk))
+
+
+def _write_parquet(tickets, path, progress):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    timestamp = pa.timestamp('us', tz='UTC')
+    schema = pa.schema([
+        ('id', pa.int64()), ('subject', pa.string()), ('description', pa.string()),
+        ('status', pa.string()), ('priority', pa.string()), ('created_by', pa.string()),
+        ('assigned_to', pa.string()), ('department', pa.string()),
+        ('created_at', timestamp), ('updated_at', timestamp),
+    ])
+    # One row group per chunk keeps memory flat while writing
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for chunk in _chunks(_records(tickets), EXPORT_CHUNK_SIZE):
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+            progress(len(chunk))
+
+
+_WRITERS = {'csv': _write_csv, 'jsonl': _write_jsonl, 'parquet': _write_parquet}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'TICKET_EXPORT_WORKERS', 2),
+                thread_name_prefix='ticket-export',
+            )
+        return _executor
+
+
+def enqueue_export(user, export_format, filters):
+    """
+    Create an ExportJob for the tickets user may see that match filters and
+    start it once the current transaction commits.
+    """
+    job = ExportJob.objects.create(user=user, format=export_format, filters=filters)
+    transaction.on_commit(lambda: _get_executor().submit(run_export_job, job.pk))
+    return job
+
+
+def run_export_job(job_id):
+    """
+    Write the file of a queued ExportJob, recording progress and the outcome
+    on the job.
+    """
+    try:
+        _run_export_job(job_id)
+    finally:
+        # Worker threads keep their own connections; don't leak them
+        connections.close_all()
+
+
+def _run_export_job(job_id):
+    job = ExportJob.objects.select_related('user').get(pk=job_id)
+    tickets = filter_tickets(job.user, job.filters).order_by('-created_at', '-id')
+
+    # Claim the job, unless it was given up on while it waited
+    now = timezone.now()
+    if not ExportJob.objects.filter(pk=job.pk, status='queued').update(
+        status='running', started_at=now, heartbeat_at=now,
+    ):
+        return
+    job.status = 'running'
+    job.started_at = now
+    job.total_rows = tickets.count()
+    job.save(update_fields=['total_rows'])
+
+    # Unguessable, should the export root ever be served directly
+    name = (
+        f'exports/tickets_export_{job.pk}_{job.started_at.strftime("%Y%m%d%H%M%S")}_'
+        f'{secrets.token_urlsafe(16)}.{EXPORT_EXTENSIONS[job.format]}'
+    )
+    path = job.file.storage.path(name)
+    partial_path = f'{path}.part'
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    written = 0
+
+    def progress(rows):
+        nonlocal written
+        written += rows
+        ExportJob.objects.filter(pk=job.pk).update(rows_written=written, heartbeat_at=timezone.now())
+
+    try:
+        _WRITERS[job.format](tickets, partial_path, progress)
+        # Only complete files ever appear under their final name
+        os.replace(partial_path, path)
+    except Exception as e:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        job.status = 'failed'
+        job.error = str(e)
+    else:
+        job.status = 'completed'
+        job.file.name = name
+    job.rows_written = written
+    job.finished_at = timezone.now()
+    # A job given up on as stale meanwhile stays failed
+    finished = ExportJob.objects.filter(pk=job.pk, status='running').update(
+        status=job.status, error=job.error, file=job.file.name, rows_written=written,
+        finished_at=job.finished_at,
+    )
+    if not finished and job.status == 'completed':
+        os.remove(path)
+
+
+def export_timeout():
+    return timedelta(minutes=getattr(settings, 'TICKET_EXPORT_TIMEOUT_MINUTES', EXPORT_TIMEOUT_MINUTES))
+
+
+def stale_jobs(now=None):
+    """
+    Queued or running jobs without a sign of life (being queued, claimed
+    or writing a chunk) within export_timeout(), e.g. because the process
+    running them restarted.
+    """
+    cutoff = (now or timezone.now()) - export_timeout()
+    return ExportJob.objects.filter(status__in=ACTIVE_STATUSES).filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, created_at__lt=cutoff)
+    )
+
+
+def fail_stale_jobs(jobs=None, now=None):
+    """
+    Mark the stale jobs among jobs (default: all) failed. Returns how many
+    were.
+    """
+    now = now or timezone.now()
+    stale = stale_jobs(now)
+    if jobs is not None:
+        stale = stale.filter(pk__in=jobs.values('pk'))
+    return stale.update(
+        status='failed', error='The export was interrupted; please start it again', finished_at=now,
+    )
+
+
+def fail_if_stale(job):
+    """
+    Return job, marked failed first if it is stale.
+    """
+    if job.status in ACTIVE_STATUSES and fail_stale_jobs(ExportJob.objects.filter(pk=job.pk)):
+        job.refresh_from_db()
+    return job
@@ -0,0 +1,78 @@
+"""
+Ticket filtering shared by the tickets list API and exports.
+"""
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Ticket, TicketAttachment, TicketComment
+
+# Query parameters understood by filter_tickets()
+TICKET_FILTER_PARAMS = ['status', 'priority', 'department', 'assigned_to_me', 'my_tickets']
+
+
+def _flag(value):
+    return str(value).lower() == 'true'
+
+
+def filter_tickets(user, params):
+    """
+    Return the tickets visible to user, narrowed by the filter parameters in
+    params (a QueryDict or plain dict, see TICKET_FILTER_PARAMS).
+    """
+    status = params.get('status', '')
+    priority = params.get('priority', '')
+    department = params.get('department', '')
+    assigned_to_me = _flag(params.get('assigned_to_me', 'false'))
+    my_tickets = _flag(params.get('my_tickets', 'false'))
+
+    tickets = Ticket.objects.all()
+
+    # Regular users only see their own tickets or tickets assigned to them
+    if not user.is_staff:
+        tickets = tickets.filter(Q(created_by=user) | Q(assigned_to=user))
+
+    if status:
+        tickets = tickets.filter(status=status)
+    if priority:
+        tickets = tickets.filter(priority=priority)
+    if department:
+        tickets = tickets.filter(department=department)
+    if assigned_to_me:
+        tickets = tickets.filter(assigned_to=user)
+    if my_tickets:
+        tickets = tickets.filter(created_by=user)
+    return tickets
+
+
+def filter_params(params):
+    """
+    Return the filter parameters present in params as a plain dict, e.g. to
+    store them with a background job.
+    """
+    return {key: params[key] for key in TICKET_FILTER_PARAMS if params.get(key) not in (None, '')}
+
+
+def _related_count(model):
+    """
+    Subquery counting the rows of model that point at the outer ticket.
+    """
+    counts = model.objects.filter(ticket=OuterRef('pk')).order_by().values('ticket').annotate(
+        count=Count('pk')
+    ).values('count')
+    return Coalesce(Subquery(counts), 0)
+
+
+def ticket_listing(tickets):
+    """
+    Shape a tickets queryset for serialize_ticket_row(), newest first.
+
+    Only the serialized columns are fetched: both users are joined in and
+    the counts are correlated subqueries, so a page is a single query.
+    """
+    return tickets.order_by('-created_at').select_related('created_by', 'assigned_to').only(
+        'id', 'subject', 'description', 'status', 'priority', 'department',
+        'created_at', 'updated_at', 'created_by__username', 'assigned_to__username',
+    ).annotate(
+        comments_count=_related_count(TicketComment),
+        attachments_count=_related_count(TicketAttachment),
+    )
@@ -0,0 +1,158 @@
+"""
+Ticket history as TicketEvent rows.
+
+Events are derived from the same (old, new) TicketState transitions that
+drive the counters, so every save() (through the post_save handler) and
+every update_tickets() call records what changed, in one bulk_create per
+save or bulk update. Views credit a change to a user, and optionally a
+reason such as re-routing, with attribute_change() before saving.
+"""
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from .models import TicketEvent
+
+User = get_user_model()
+
+
+def attribute_change(ticket, actor, reason=None):
+    """
+    Credit the next save() of ticket to actor in its history; reason (e.g.
+    'routed', 'rerouted') is stored with the events it records.
+    """
+    ticket._history_actor = actor
+    ticket._history_reason = reason
+
+
+def attribution(ticket):
+    """
+    Return the (actor, reason) set by attribute_change().
+    """
+    return getattr(ticket, '_history_actor', None), getattr(ticket, '_history_reason', None)
+
+
+def pop_attribution(ticket):
+    """
+    Return and clear the (actor, reason) set by attribute_change().
+    """
+    actor_and_reason = attribution(ticket)
+    ticket._history_actor = ticket._history_reason = None
+    return actor_and_reason
+
+
+def transition_events(ticket_id, old, new, actor=None, reason=None, at=None):
+    """
+    Unsaved TicketEvents for a ticket going from TicketState old to new
+    (old is None for a new ticket). Deletions record nothing: the events
+    go with the ticket.
+    """
+    if new is None:
+        return []
+    extra = {'reason': reason} if reason else {}
+
+    def event(code, payload):
+        return TicketEvent(
+            ticket_id=ticket_id,
+            code=code,
+            payload={**payload, **extra},
+            actor=actor,
+            created_at=at or timezone.now(),
+        )
+
+    if old is None:
+        return [event(TicketEvent.CREATED, {
+            'status': new.status,
+            'priority': new.priority,
+            'department': new.department,
+            'assigned_to': new.assigned_to_id,
+        })]
+
+    events = []
+    if old.status != new.status:
+        events.append(event(TicketEvent.STATUS_CHANGED, {'from': old.status, 'to': new.status}))
+    if old.assigned_to_id != new.assigned_to_id:
+        events.append(event(TicketEvent.ASSIGNED, {'from': old.assigned_to_id, 'to': new.assigned_to_id}))
+    if (old.department or '') != (new.department or ''):
+        events.append(event(TicketEvent.DEPARTMENT_CHANGED, {'from': old.department, 'to': new.department}))
+    if old.priority != new.priority:
+        events.append(event(TicketEvent.PRIORITY_CHANGED, {'from': old.priority, 'to': new.priority}))
+    return events
+
+
+def record_transitions(transitions, actor=None, reason=None):
+    """
+    Write the events for (ticket_id, old, new) triples in one bulk_create.
+    Returns the events written.
+    """
+    now = timezone.now()
+    events = [
+        event
+        for ticket_id, old, new in transitions
+        for event in transition_events(ticket_id, old, new, actor, reason, at=now)
+    ]
+    if events:
+        TicketEvent.objects.bulk_create(events)
+    return events
+
+
+def _user_label(users, user_id):
+    user = users.get(user_id)
+    if user_id is None:
+        return 'no one'
+    return user.username if user else f'user #{user_id}'
+
+
+def describe(event, users):
+    """
+    One-line description of an event; users maps the user ids in its
+    payload to users.
+    """
+    payload = event.payload
+    if event.code == TicketEvent.CREATED:
+        text = f'Ticket created with priority {payload.get("priority")}'
+        if payload.get('assigned_to'):
+            text += f', assigned to {_user_label(users, payload["assigned_to"])}'
+    else:
+        label = dict(TicketEvent.CODE_CHOICES).get(event.code, event.code)
+        if event.code == TicketEvent.ASSIGNED:
+            old, new = (_user_label(users, payload.get(field)) for field in ('from', 'to'))
+        else:
+            old, new = (payload.get(field) or 'None' for field in ('from', 'to'))
+        # Events converted from old comments may not know the previous value
+        text = f'{label} from {old} to {new}' if 'from' in payload else f'{label} to {new}'
+    if payload.get('reason'):
+        text += f' ({payload["reason"]})'
+    return text
+
+
+def describe_events(events):
+    """
+    Return (event, description) pairs, resolving every user id in the
+    payloads with one query.
+    """
+    user_ids = set()
+    for event in events:
+        if event.code == TicketEvent.ASSIGNED:
+            user_ids.update((event.payload.get('from'), event.payload.get('to')))
+        elif event.code == TicketEvent.CREATED:
+            user_ids.add(event.payload.get('assigned_to'))
+    user_ids.discard(None)
+    users = User.objects.in_bulk(user_ids) if user_ids else {}
+    return [(event, describe(event, users)) for event in events]
+
+
+def serialize_events(events):
+    """
+    Serialize TicketEvents (with actor loaded) for the timeline API.
+    """
+    return [{
+        'id': event.id,
+        'code': event.code,
+        'payload': event.payload,
+        'message': message,
+        'actor': {
+            'id': event.actor.id,
+            'username': event.actor.username,
+        } if event.actor else None,
+        'created_at': event.created_at.isoformat(),
+    } for event, message in describe_events(events)]
@@ -0,0 +1,166 @@
+"""
+EXPLAIN checks for the hot ticket queries, shared by the
+check_ticket_indexes command and the test suite.
+
+Each hot query names the indexes it was designed for; a check fails when
+its plan scans the tickets table or uses none of them. Run the checks
+inside a transaction: prepare_planner() changes session settings with SET
+LOCAL on PostgreSQL.
+"""
+import random
+import re
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Ticket
+from .routing import TicketRouter
+from .sla import due_for_escalation
+from .stats import today_range
+
+User = get_user_model()
+
+SUPPORTED_VENDORS = ('postgresql', 'sqlite')
+
+
+def seed_tickets(count, requesters=50, staff=10):
+    """
+    Insert count throwaway tickets spread over requesters and staff (so a
+    single user's tickets are a small slice, as in production), every
+    status and priority and a few departments. Returns (requester,
+    assignee), one of each.
+    """
+    staff = [
+        User.objects.create_user(username=f'index_check_staff{i}', is_staff=True, role='staff', department='it')
+        for i in range(staff)
+    ]
+    requesters = [User.objects.create_user(username=f'index_check_student{i}') for i in range(requesters)]
+    statuses = [status for status, _ in Ticket.STATUS_CHOICES]
+    priorities = [priority for priority, _ in Ticket.PRIORITY_CHOICES]
+    departments = ['IT', 'Registrar', 'Scholarship', None]
+    now = timezone.now()
+    # Independent random columns, so the planner statistics are realistic
+    rng = random.Random(count)
+
+    tickets = Ticket.objects.bulk_create([
+        Ticket(
+            subject=f'Index check ticket {i}',
+            description='Generated by check_ticket_indexes',
+            status=rng.choice(statuses),
+            priority=rng.choice(priorities),
+            department=rng.choice(departments),
+            created_by=rng.choice(requesters),
+            assigned_to=rng.choice(staff) if rng.random() < 0.7 else None,
+        )
+        for i in range(count)
+    ], batch_size=1000)
+    # Spread the timestamps so "today" is a small slice of the table
+    for i, ticket in enumerate(tickets[::50]):
+        Ticket.objects.filter(pk=ticket.pk).update(
+            created_at=now - timedelta(days=i), updated_at=now - timedelta(days=i)
+        )
+    return requesters[0], staff[0]
+
+
+def hot_queries(requester, assignee):
+    """
+    (name, queryset, indexes) for the queries behind get_tickets_api,
+    get_ticket_stats_api, dashboard_view, TicketRouter._find_assignee and
+    the SLA sweep. The plan must use at least one of indexes.
+    """
+    start, end = today_range()
+    mine = Q(created_by=requester) | Q(assigned_to=requester)
+    return [
+        ('tickets list', Ticket.objects.order_by('-created_at', '-id')[:20], ['ticket_created_idx']),
+        (
+            'tickets list by status',
+            Ticket.objects.filter(status='open').order_by('-created_at')[:20],
+            ['ticket_status_created_idx'],
+        ),
+        (
+            'tickets list by department',
+            Ticket.objects.filter(department='IT').order_by('-created_at')[:20],
+            ['ticket_dept_created_idx'],
+        ),
+        # The assigned_to branch of the OR may use any assignee index
+        (
+            'tickets list for user',
+            Ticket.objects.filter(mine).order_by('-created_at')[:20],
+            ['ticket_creator_created_idx'],
+        ),
+        (
+            'tickets assigned to user by status',
+            Ticket.objects.filter(assigned_to=assignee, status='open'),
+            ['ticket_assignee_status_idx', 'ticket_active_assignee_idx'],
+        ),
+        (
+            'dashboard latest tickets',
+            Ticket.objects.filter(created_by=requester).order_by('-created_at')[:5],
+            ['ticket_creator_created_idx'],
+        ),
+        (
+            'created today',
+            Ticket.objects.filter(created_at__gte=start, created_at__lt=end),
+            ['ticket_created_idx'],
+        ),
+        (
+            'resolved today',
+            Ticket.objects.filter(status='resolved', updated_at__gte=start, updated_at__lt=end),
+            ['ticket_status_updated_idx'],
+        ),
+        (
+            'assignee workload',
+            TicketRouter._candidate_users('it', 'medium'),
+            ['ticket_active_assignee_idx', 'ticket_assignee_status_idx'],
+        ),
+        ('SLA sweep', due_for_escalation(), ['ticket_sla_due_idx']),
+    ]
+
+
+def prepare_planner():
+    """
+    Refresh the planner statistics so it picks indexes as it would on a
+    real table. On PostgreSQL sequential scans are also disabled: small
+    tables are cheaper to scan than to index, so a Seq Scan can then only
+    mean that no usable index exists.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('ANALYZE tickets_ticket')
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        else:
+            cursor.execute('ANALYZE')
+
+
+def scans_tickets(plan):
+    if connection.vendor == 'postgresql':
+        return 'Seq Scan on tickets_ticket' in plan
+    # SQLite: "SCAN tickets_ticket" without "USING ... INDEX" is a full table scan
+    return re.search(r'SCAN (tickets_ticket|active_assigned)\b(?! USING)', plan) is not None
+
+
+def plan_problem(plan, indexes):
+    """
+    Why plan is not acceptable for a query designed for indexes, or None.
+    """
+    if scans_tickets(plan):
+        return 'scans the tickets table'
+    if not any(re.search(rf'\b{re.escape(index)}\b', plan) for index in indexes):
+        return f'uses none of {", ".join(indexes)}'
+    return None
+
+
+def explain_hot_queries(requester, assignee):
+    """
+    EXPLAIN every hot query. Returns (name, plan, problem) triples where
+    problem is None for queries using their index.
+    """
+    prepare_planner()
+    results = []
+    for name, queryset, indexes in hot_queries(requester, assignee):
+        plan = queryset.explain()
+        results.append((name, plan, plan_problem(plan, indexes)))
+    return results
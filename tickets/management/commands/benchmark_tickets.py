@@ -0,0 +1,456 @@
+import asyncio
+import json
+import math
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+from urllib.parse import urlencode
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.urls import reverse
+
+from tickets import urls as ticket_urls
+from tickets.exports import run_export_job
+from tickets.models import ExportJob, Ticket
+from tickets.routing import TicketRouter
+from tickets.seeding import TicketSeeder
+
+User = get_user_model()
+
+# URLs without a request/response benchmark case
+UNBENCHMARKED_URLS = {
+    'ticket_events_stream',  # Streams until the client disconnects
+}
+
+# Endpoints with sync and async (async_<name>) versions, compared under
+# concurrent load: (URL name, needs the ticket id, query parameters)
+CONCURRENCY_CASES = [
+    ('get_tickets_api', False, {}),
+    ('get_ticket_stats_api', False, {}),
+    ('search_tickets_api', False, {'q': 'password'}),
+    ('get_ticket_detail_api', True, {}),
+]
+CONCURRENCY_ROUNDS = 3
+
+
+def unbenchmarked_urls(cases):
+    """
+    Names of the tickets URLs that have no case among cases and are not
+    in UNBENCHMARKED_URLS.
+    """
+    return (
+        {p.name for p in ticket_urls.urlpatterns} - UNBENCHMARKED_URLS
+        - {url_name for _, url_name, *_ in cases}
+    )
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database and measure query counts, p50/p95 latency and '
+        'peak memory of every ticket URL, the dashboard and TicketRouter.route_ticket'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=300, help='Number of users to seed')
+        parser.add_argument('--tickets', type=int, default=20000, help='Number of tickets to seed')
+        parser.add_argument(
+            '--comments-per-ticket', type=float, default=3, help='Average comments per ticket',
+        )
+        parser.add_argument(
+            '--attachments-per-ticket', type=float, default=0.25, help='Average attachments per ticket',
+        )
+        parser.add_argument('--iterations', type=int, default=20, help='Timed runs per benchmark')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the dataset')
+        parser.add_argument(
+            '--concurrency', type=int, default=50,
+            help='Simultaneous requests in the sync vs async ASGI comparison (0 to skip it)',
+        )
+        parser.add_argument(
+            '--output', default='benchmark_report.json', help='Where to write the JSON report',
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true', help='Keep the test database between runs',
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+        self.iterations = options['iterations']
+
+        # Without DEBUG query logging, like production
+        setup_test_environment(debug=False)
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb'],
+        )
+        # The workload ledger and count caches describe the real database
+        cache.clear()
+        try:
+            with tempfile.TemporaryDirectory() as media_root, override_settings(
+                MEDIA_ROOT=media_root, TICKET_EXPORT_ROOT=os.path.join(media_root, 'exports'),
+            ):
+                self.stdout.write(f'Seeding test database {connection.settings_dict["NAME"]}...')
+                started = time.perf_counter()
+                dataset = self.seed(options)
+                self.stdout.write(self.style.SUCCESS(
+                    f'✓ Seeded {dataset["tickets"]} tickets in {time.perf_counter() - started:.1f}s'
+                ))
+                results = self.run_benchmarks()
+                concurrency = (
+                    self.run_concurrency(options['concurrency']) if options['concurrency'] > 0 else None
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+            cache.clear()
+
+        report = {
+            'commit': self.git_commit(),
+            'database': connection.vendor,
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'iterations': self.iterations,
+            'dataset': dataset,
+            'results': results,
+            'concurrency': concurrency,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+        self.stdout.write(self.style.SUCCESS(f'✓ Report written to {options["output"]}'))
+
+    # Dataset
+
+    def seed(self, options):
+        self.seeder = TicketSeeder(
+            users=options['users'],
+            tickets=options['tickets'],
+            comments_per_ticket=options['comments_per_ticket'],
+            attachments_per_ticket=options['attachments_per_ticket'],
+            seed=options['seed'],
+            username_prefix='bench_user',
+        )
+        dataset = self.seeder.run()
+
+        self.staff, self.other_staff = (
+            User.objects.filter(is_staff=True).order_by('pk')[0],
+            User.objects.filter(is_staff=True).order_by('-pk')[0],
+        )
+        self.ticket = (
+            Ticket.objects.filter(comments__isnull=False, attachments__isnull=False)
+            .order_by('-created_at').first()
+            or Ticket.objects.order_by('-created_at').first()
+        )
+        self.student = self.ticket.created_by
+        self.attachment = self.ticket.attachments.first()
+
+        self.export_job = ExportJob.objects.create(user=self.student, format='csv')
+        run_export_job(self.export_job.pk)
+        return dataset
+
+    # Benchmarks
+
+    def cases(self):
+        """
+        (name, URL name, URL args, method, data, user, mutates) for every
+        benchmarked request. POST data that is a dict is sent as a form,
+        anything else as JSON.
+        """
+        ticket = self.ticket.pk
+        staff, student = self.staff, self.student
+        form = {
+            'subject': 'Cannot access the portal',
+            'description': 'My password stopped working after the last system update.',
+            'priority': 'medium',
+            'department': 'IT',
+        }
+        some_tickets = list(Ticket.objects.order_by('-created_at').values_list('pk', flat=True)[:50])
+        return [
+            ('ticket_list', 'ticket_list', [], 'get', None, staff, False),
+            ('ticket_detail', 'ticket_detail', [ticket], 'get', None, staff, False),
+            ('create_ticket [form]', 'create_ticket', [], 'get', None, student, False),
+            ('create_ticket [submit]', 'create_ticket', [], 'post', form, student, True),
+            ('update_ticket', 'update_ticket', [ticket], 'post', form, student, True),
+            ('delete_attachment', 'delete_attachment', [self.attachment.pk if self.attachment else 0],
+             'post', {}, staff, True),
+            ('reroute_ticket', 'reroute_ticket', [ticket], 'post', {}, staff, True),
+            ('get_tickets_api [staff]', 'get_tickets_api', [], 'get', {}, staff, False),
+            ('get_tickets_api [student]', 'get_tickets_api', [], 'get', {}, student, False),
+            ('get_tickets_api [filtered]', 'get_tickets_api', [], 'get',
+             {'status': 'open', 'priority': 'high'}, staff, False),
+            ('get_tickets_api [page 200]', 'get_tickets_api', [], 'get', {'page': 200}, staff, False),
+            ('get_tickets_api [cursor]', 'get_tickets_api', [], 'get',
+             {'cursor': '', 'include_count': 'true'}, staff, False),
+            ('get_ticket_stats_api [staff]', 'get_ticket_stats_api', [], 'get', None, staff, False),
+            ('get_ticket_stats_api [student]', 'get_ticket_stats_api', [], 'get', None, student, False),
+            ('search_tickets_api [staff]', 'search_tickets_api', [], 'get', {'q': 'password'}, staff, False),
+            ('search_tickets_api [student]', 'search_tickets_api', [], 'get', {'q': 'pass'}, student, False),
+            ('submit_ticket_api', 'submit_ticket_api', [], 'post', json.dumps(form), student, True),
+            ('submit_tickets_batch_api [50]', 'submit_tickets_batch_api', [], 'post',
+             json.dumps({'tickets': [form] * 50}), student, True),
+            ('bulk_update_tickets_api', 'bulk_update_tickets_api', [], 'post',
+             json.dumps({'ticket_ids': some_tickets, 'action': 'close'}), staff, True),
+            ('export_tickets_csv [staff]', 'export_tickets_csv', [], 'get', None, staff, False),
+            ('export_tickets_csv [student]', 'export_tickets_csv', [], 'get', None, student, False),
+            ('export_tickets_csv [queue job]', 'export_tickets_csv', [], 'post',
+             json.dumps({'format': 'jsonl'}), student, True),
+            ('export_job_status_api', 'export_job_status_api', [self.export_job.pk], 'get', None, student, False),
+            ('download_export', 'download_export', [self.export_job.pk], 'get', None, student, False),
+            ('get_departments_api', 'get_departments_api', [], 'get', None, staff, False),
+            ('get_users_api', 'get_users_api', [], 'get', None, staff, False),
+            ('get_ticket_detail_api [staff]', 'get_ticket_detail_api', [ticket], 'get', None, staff, False),
+            ('get_ticket_detail_api [student]', 'get_ticket_detail_api', [ticket], 'get', None, student, False),
+            ('get_ticket_timeline_api', 'get_ticket_timeline_api', [ticket], 'get', None, staff, False),
+            ('get_ticket_trends_api', 'get_ticket_trends_api', [], 'get', None, staff, False),
+            ('add_comment_api', 'add_comment_api', [ticket], 'post',
+             json.dumps({'content': 'Any update on this?'}), student, True),
+            ('update_ticket_status_api', 'update_ticket_status_api', [ticket], 'post',
+             json.dumps({'status': 'resolved'}), staff, True),
+            ('assign_ticket_api', 'assign_ticket_api', [ticket], 'post',
+             json.dumps({'assignee_id': self.other_staff.pk}), staff, True),
+            ('async_get_tickets_api', 'async_get_tickets_api', [], 'get', {}, staff, False),
+            ('async_get_ticket_stats_api', 'async_get_ticket_stats_api', [], 'get', None, staff, False),
+            ('async_search_tickets_api', 'async_search_tickets_api', [], 'get', {'q': 'password'}, staff, False),
+            ('async_get_ticket_detail_api', 'async_get_ticket_detail_api', [ticket], 'get', None, staff, False),
+        ]
+
+    def run_benchmarks(self):
+        cases = self.cases()
+        missing = unbenchmarked_urls(cases)
+        if missing:
+            raise CommandError(f'No benchmark case for tickets URLs: {", ".join(sorted(missing))}')
+
+        clients = {}
+        for user in (self.staff, self.student):
+            clients[user.pk] = Client(raise_request_exception=False)
+            clients[user.pk].force_login(user)
+
+        results = {}
+        for name, url_name, args, method, data, user, mutates in cases:
+            path = reverse(f'tickets:{url_name}', args=args)
+            client = clients[user.pk]
+            results[name] = self.measure(
+                name, lambda: self.request(client, method, path, data), rollback=mutates,
+            )
+
+        results['dashboard_view [staff]'] = self.measure(
+            'dashboard_view [staff]',
+            lambda: self.request(clients[self.staff.pk], 'get', reverse('dashboard:dashboard'), None),
+        )
+        results['dashboard_view [student]'] = self.measure(
+            'dashboard_view [student]',
+            lambda: self.request(clients[self.student.pk], 'get', reverse('dashboard:dashboard'), None),
+        )
+
+        rng = self.seeder.rng
+        rules = list(TicketRouter.get_rules().values())
+        samples = []
+        for _ in range(100):
+            subject, description = self.seeder.ticket_text(rng.choice(rules)['keywords'])
+            samples.append(Ticket(
+                subject=subject, description=description, priority=rng.choice(['low', 'medium', 'high', 'urgent']),
+            ))
+        samples = iter(samples * (self.iterations // len(samples) + 3))
+        results['TicketRouter.route_ticket'] = self.measure(
+            'TicketRouter.route_ticket', lambda: TicketRouter.route_ticket(next(samples)) and None,
+        )
+        return results
+
+    def request(self, client, method, path, data):
+        if method == 'get':
+            response = client.get(path, data)
+        elif isinstance(data, dict):
+            response = client.post(path, data)
+        else:
+            response = client.post(path, data, content_type='application/json')
+        # Streaming responses do their work while being consumed
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response.status_code
+
+    def measure(self, name, func, rollback=False):
+        def run():
+            if not rollback:
+                return func()
+            with transaction.atomic():
+                result = func()
+                transaction.set_rollback(True)
+            return result
+
+        # First run on cold caches, counted separately. Each request
+        # clears the query log, so it has to start out empty too.
+        reset_queries()
+        with CaptureQueriesContext(connection) as cold:
+            status = run()
+        # Read now: the captured queries are sliced lazily from the log
+        cold_queries = len(cold)
+
+        timings = []
+        for _ in range(self.iterations):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        reset_queries()
+        with CaptureQueriesContext(connection) as warm:
+            run()
+        warm_queries = len(warm)
+
+        tracemalloc.start()
+        try:
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        result = {
+            'status': status,
+            'queries': warm_queries,
+            'queries_cold': cold_queries,
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'mean_ms': round(sum(timings) / len(timings), 2),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+        style = self.style.SUCCESS if status is None or status < 500 else self.style.ERROR
+        self.stdout.write(style(
+            f'{name:<34} {result["queries"]:>4} queries  p50 {result["p50_ms"]:>8.2f}ms  '
+            f'p95 {result["p95_ms"]:>8.2f}ms  {result["peak_memory_kb"]:>9.1f}KB'
+        ))
+        return result
+
+    # Concurrency
+
+    def run_concurrency(self, concurrency):
+        """
+        Send bursts of concurrent requests through Django's ASGI handler (what
+        uvicorn or daphne would call) to the sync and async version of each
+        read endpoint.
+        """
+        app = get_asgi_application()
+        client = Client()
+        client.force_login(self.staff)
+        cookie = f'{client.cookies["sessionid"].key}={client.cookies["sessionid"].value}'
+
+        self.stdout.write(f'Concurrency: {concurrency} simultaneous requests x {CONCURRENCY_ROUNDS} rounds')
+        results = {}
+        for url_name, with_ticket, params in CONCURRENCY_CASES:
+            args = [self.ticket.pk] if with_ticket else []
+            for prefix in ('', 'async_'):
+                name = f'{prefix}{url_name}'
+                path = reverse(f'tickets:{name}', args=args)
+                results[name] = asyncio.run(self.burst(app, path, params, cookie, concurrency))
+                result = results[name]
+                style = self.style.SUCCESS if not result['errors'] else self.style.ERROR
+                self.stdout.write(style(
+                    f'{name:<34} {result["requests_per_second"]:>8.1f} req/s  '
+                    f'p50 {result["p50_ms"]:>8.2f}ms  p95 {result["p95_ms"]:>8.2f}ms  '
+                    f'{result["peak_threads"]:>4} threads'
+                ))
+        return results
+
+    async def burst(self, app, path, params, cookie, concurrency):
+        latencies = []
+        statuses = []
+
+        async def one():
+            started = time.perf_counter()
+            statuses.append(await self.asgi_get(app, path, params, cookie))
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        peak_threads = threading.active_count()
+        running = True
+
+        async def sample_threads():
+            nonlocal peak_threads
+            while running:
+                peak_threads = max(peak_threads, threading.active_count())
+                await asyncio.sleep(0.001)
+
+        # Warm up connections and caches before timing
+        await asyncio.gather(*(one() for _ in range(concurrency)))
+        latencies.clear()
+        statuses.clear()
+
+        sampler = asyncio.create_task(sample_threads())
+        started = time.perf_counter()
+        for _ in range(CONCURRENCY_ROUNDS):
+            await asyncio.gather(*(one() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        running = False
+        await sampler
+
+        return {
+            'concurrency': concurrency,
+            'requests': len(latencies),
+            'errors': sum(1 for status in statuses if status >= 500),
+            'requests_per_second': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'peak_threads': peak_threads,
+        }
+
+    async def asgi_get(self, app, path, params, cookie):
+        """
+        Run one GET through an ASGI application and return its status code.
+        """
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': urlencode(params).encode(),
+            'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0),
+            'server': ('testserver', 80),
+        }
+        received = False
+        status = None
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # The client never disconnects; the handler cancels this wait
+            await asyncio.Event().wait()
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+
+        await app(scope, receive, send)
+        return status
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
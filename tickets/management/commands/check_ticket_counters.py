@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tickets.counters import find_discrepancies, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Compare the ticket counter rollups with the tickets table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Rebuild the counters if any discrepancy is found',
+        )
+
+    def handle(self, *args, **options):
+        discrepancies = find_discrepancies()
+        if not discrepancies:
+            self.stdout.write(self.style.SUCCESS('✓ Ticket counters are consistent'))
+            return
+
+        for key, stored, expected in discrepancies:
+            self.stdout.write(f'{key}: stored {stored}, expected {expected}')
+
+        if options['fix']:
+            rebuild_counters()
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ Rebuilt counters ({len(discrepancies)} discrepancies fixed)'
+            ))
+            return
+
+        raise CommandError(f'{len(discrepancies)} ticket counter discrepancies found')
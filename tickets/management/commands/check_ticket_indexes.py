@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from tickets.index_checks import SUPPORTED_VENDORS, User, explain_hot_queries, seed_tickets
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot ticket queries and fail if any of them scans the tickets table or misses its index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Insert this many throwaway tickets first (rolled back afterwards)',
+        )
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Print the full query plan of every query',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in SUPPORTED_VENDORS:
+            raise CommandError(f'Unsupported database backend: {connection.vendor}')
+
+        with transaction.atomic():
+            if options['seed']:
+                requester, assignee = seed_tickets(options['seed'])
+            else:
+                requester = User.objects.filter(is_staff=False).order_by('pk').first()
+                assignee = User.objects.filter(is_staff=True).order_by('pk').first() or requester
+            if requester is None:
+                raise CommandError('No requesters found; use --seed to create sample data')
+
+            failures = []
+            for name, plan, problem in explain_hot_queries(requester, assignee):
+                if problem:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f'✗ {name}: {problem}'))
+                    self.stdout.write(plan)
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'✓ {name}'))
+                    if options['verbose_plans']:
+                        self.stdout.write(plan)
+
+            # Never keep the seeded rows or the session settings
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f'{len(failures)} hot queries do not use their index: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('All hot ticket queries use an index'))
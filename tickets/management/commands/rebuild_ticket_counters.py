@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from tickets.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the ticket counter rollups from scratch from the tickets table'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding ticket counters...')
+        ticket_rows, user_rows = rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Wrote {ticket_rows} ticket counter rows and {user_rows} user counter rows'
+        ))
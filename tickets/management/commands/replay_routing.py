@@ -0,0 +1,90 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tickets.models import Ticket
+from tickets.replay import BATCH_SIZE, corrected_tickets, numpy_available, replay_routing
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay keyword routing over the ticket history and report agreement with the '
+        'departments tickets ended up in, a confusion matrix and throughput'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rules',
+            help='JSON file with a rule set to evaluate, shaped like TicketRouter.ROUTING_RULES '
+                 '(default: the current rules)',
+        )
+        parser.add_argument(
+            '--corrected-only',
+            action='store_true',
+            help='Only replay tickets whose department a person changed',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Tickets scored per batch (default: {BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--output',
+            help='Also write the full report as JSON to this file',
+        )
+
+    def handle(self, *args, **options):
+        if not numpy_available():
+            raise CommandError('replay_routing requires numpy (pip install numpy)')
+
+        rules = None
+        if options['rules']:
+            try:
+                with open(options['rules'], encoding='utf-8') as f:
+                    rules = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Could not read rules from {options["rules"]}: {e}')
+            if not isinstance(rules, dict) or not all(
+                isinstance(rule, dict) and isinstance(rule.get('keywords'), list) for rule in rules.values()
+            ):
+                raise CommandError('Rules must map each department to {"keywords": [...]}')
+
+        tickets = Ticket.objects.all()
+        if options['corrected_only']:
+            tickets = corrected_tickets(tickets)
+
+        def progress(processed):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {processed} tickets replayed')
+
+        report = replay_routing(tickets, rules, batch_size=options['batch_size'], progress=progress)
+
+        self.stdout.write(
+            f'Replayed {report.compared + report.unlabelled} tickets in {report.elapsed:.2f}s '
+            f'({report.throughput:,.0f} tickets/s; matching {report.match_seconds:.2f}s, '
+            f'scoring {report.score_seconds:.2f}s)'
+        )
+        if report.unlabelled:
+            self.stdout.write(f'{report.unlabelled} tickets without a department were not compared')
+
+        self.stdout.write('')
+        self.stdout.write(f'{"Department":<26} {"tickets":>8} {"precision":>10} {"recall":>8}')
+        for label, (count, precision, recall) in report.per_department().items():
+            self.stdout.write(f'{label:<26} {count:>8} {precision:>10.1%} {recall:>8.1%}')
+
+        self.stdout.write('')
+        self.stdout.write('Confusion matrix (rows: stored department, columns: replayed routing)')
+        width = max(6, len(str(report.confusion.max())) + 1)
+        self.stdout.write(' ' * 26 + ''.join(f'{i:>{width}}' for i in range(len(report.labels))))
+        for i, (label, row) in enumerate(zip(report.labels, report.confusion)):
+            self.stdout.write(f'{i:>2} {label[:22]:<23}' + ''.join(f'{n:>{width}}' for n in row))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report.as_dict(), f, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Agreement {report.agreement:.1%} ({report.agreed} of {report.compared} tickets)'
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from tickets.analytics import update_rollups
+
+
+class Command(BaseCommand):
+    help = 'Update the hourly and daily ticket activity rollups with the changes since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Rebuild every bucket instead of only those changed since the last run',
+        )
+
+    def handle(self, *args, **options):
+        hours, days = update_rollups(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Recomputed {hours} hourly and {days} daily activity buckets'
+        ))
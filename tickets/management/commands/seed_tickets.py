@@ -0,0 +1,88 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tickets.models import Ticket
+from tickets.seeding import (
+    DEFAULT_DEPARTMENT_WEIGHTS, FAN_OUT_DISTRIBUTIONS, TicketSeeder, parse_weights,
+)
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic users, tickets, comments and attachment metadata in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=300, help='Number of seed users (reused if present)')
+        parser.add_argument('--tickets', type=int, default=20000, help='Number of tickets to create')
+        parser.add_argument(
+            '--comments-per-ticket', type=float, default=3, help='Average number of comments per ticket',
+        )
+        parser.add_argument(
+            '--comment-distribution',
+            choices=FAN_OUT_DISTRIBUTIONS,
+            default='poisson',
+            help='How the number of comments varies between tickets',
+        )
+        parser.add_argument(
+            '--attachments-per-ticket', type=float, default=0.25, help='Average number of attachments per ticket',
+        )
+        parser.add_argument(
+            '--status-weights',
+            help='Relative status frequencies, e.g. "open=30,in_progress=20,resolved=50"',
+        )
+        parser.add_argument(
+            '--priority-weights',
+            help='Relative priority frequencies, e.g. "low=1,medium=2,high=1,urgent=0.2"',
+        )
+        parser.add_argument(
+            '--department-weights',
+            help='Relative department frequencies by routing label, e.g. "IT=5,Registrar=2,none=1"',
+        )
+        parser.add_argument('--days', type=int, default=365, help='Spread tickets over this many past days')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create batch')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; same seed, same data')
+        parser.add_argument(
+            '--username-prefix', default='seed_user', help='Seed users are named <prefix>_<n>',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['tickets'] < 0 or options['days'] < 1:
+            raise CommandError('--batch-size and --days must be positive and --tickets not negative')
+
+        try:
+            weights = {
+                'status_weights': self.weights(options['status_weights'], [s for s, _ in Ticket.STATUS_CHOICES]),
+                'priority_weights': self.weights(options['priority_weights'], [p for p, _ in Ticket.PRIORITY_CHOICES]),
+                'department_weights': self.weights(options['department_weights'], list(DEFAULT_DEPARTMENT_WEIGHTS)),
+            }
+            seeder = TicketSeeder(
+                users=options['users'],
+                tickets=options['tickets'],
+                comments_per_ticket=options['comments_per_ticket'],
+                comment_distribution=options['comment_distribution'],
+                attachments_per_ticket=options['attachments_per_ticket'],
+                days=options['days'],
+                batch_size=options['batch_size'],
+                seed=options['seed'],
+                username_prefix=options['username_prefix'],
+                progress=self.progress,
+                **weights,
+            )
+            self.started = time.perf_counter()
+            summary = seeder.run()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Seeded {summary["tickets"]} tickets, {summary["comments"]} comments and '
+            f'{summary["attachments"]} attachments for {summary["users"]} users in {elapsed:.1f}s'
+        ))
+
+    def weights(self, spec, allowed):
+        return parse_weights(spec, allowed) if spec else None
+
+    def progress(self, created, total):
+        elapsed = time.perf_counter() - self.started
+        rate = created / elapsed if elapsed else 0
+        self.stdout.write(f'  {created}/{total} tickets ({rate:,.0f}/s)')
@@ -0,0 +1,76 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from tickets.sla import sweep, warning_window
+
+
+class Command(BaseCommand):
+    help = 'Escalate tickets that are past or close to their SLA deadline'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep sweeping every --interval seconds until interrupted',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=60,
+            help='Seconds between sweeps with --loop (default: 60)',
+        )
+        parser.add_argument(
+            '--warn-minutes',
+            type=int,
+            help='Also escalate tickets due within this many minutes '
+                 '(default: settings.TICKET_SLA_WARNING_MINUTES or 30)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Escalate at most this many tickets per sweep, most overdue first',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the tickets that would be escalated without changing them',
+        )
+
+    def handle(self, *args, **options):
+        warning = (
+            timedelta(minutes=options['warn_minutes'])
+            if options['warn_minutes'] is not None else warning_window()
+        )
+        if not options['loop']:
+            self.sweep_once(warning, options)
+            return
+
+        self.stdout.write(f'Sweeping every {options["interval"]}s, press Ctrl+C to stop')
+        try:
+            while True:
+                # A long-running process must not keep a stale connection
+                close_old_connections()
+                self.sweep_once(warning, options)
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped')
+
+    def sweep_once(self, warning, options):
+        escalated = sweep(warning=warning, limit=options['limit'], dry_run=options['dry_run'])
+        breached = sum(1 for _, is_breached in escalated if is_breached)
+
+        if options['verbosity'] > 1 or options['dry_run']:
+            for ticket, is_breached in escalated:
+                # Escalated tickets have moved on to the urgent deadline
+                outcome = (
+                    f'due {ticket.sla_due_at:%Y-%m-%d %H:%M}' if options['dry_run']
+                    else f'assigned to {ticket.assigned_to or "nobody"}'
+                )
+                self.stdout.write(f'#{ticket.pk} {"breached" if is_breached else "at risk"}, {outcome}')
+        verb = 'Would escalate' if options['dry_run'] else 'Escalated'
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {verb} {len(escalated)} tickets ({breached} breached, {len(escalated) - breached} at risk)'
+        ))
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_counters(apps, schema_editor):
+    Ticket = apps.get_model('tickets', 'Ticket')
+    TicketCounter = apps.get_model('tickets', 'TicketCounter')
+    TicketUserCounter = apps.get_model('tickets', 'TicketUserCounter')
+
+    ticket_counts = {}
+    user_counts = {}
+    for status, priority, department, created_by_id, assigned_to_id in Ticket.objects.values_list(
+        'status', 'priority', 'department', 'created_by_id', 'assigned_to_id'
+    ).iterator():
+        key = (status, priority, department or '')
+        ticket_counts[key] = ticket_counts.get(key, 0) + 1
+        for user_id, field in ((created_by_id, 'created'), (assigned_to_id, 'assigned')):
+            if user_id is not None:
+                counts = user_counts.setdefault((user_id, status, priority), {'created': 0, 'assigned': 0, 'involved': 0})
+                counts[field] += 1
+        for user_id in {created_by_id, assigned_to_id} - {None}:
+            user_counts[(user_id, status, priority)]['involved'] += 1
+
+    TicketCounter.objects.bulk_create([
+        TicketCounter(status=status, priority=priority, department=department, count=count)
+        for (status, priority, department), count in ticket_counts.items()
+    ], batch_size=1000)
+    TicketUserCounter.objects.bulk_create([
+        TicketUserCounter(user_id=user_id, status=status, priority=priority, **counts)
+        for (user_id, status, priority), counts in user_counts.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0002_add_missing_status_and_update_models'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('open', 'Open'), ('in_progress', 'In Progress'), ('on_hold', 'On Hold'), ('resolved', 'Resolved'), ('closed', 'Closed')], max_length=20)),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('urgent', 'Urgent')], max_length=20)),
+                ('department', models.CharField(blank=True, default='', max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('status', 'priority', 'department'), name='unique_ticket_counter')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TicketUserCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('open', 'Open'), ('in_progress', 'In Progress'), ('on_hold', 'On Hold'), ('resolved', 'Resolved'), ('closed', 'Closed')], max_length=20)),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('urgent', 'Urgent')], max_length=20)),
+                ('created', models.IntegerField(default=0)),
+                ('assigned', models.IntegerField(default=0)),
+                ('involved', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ticket_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'status', 'priority'), name='unique_ticket_user_counter')],
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:31
+
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+
+def create_search_index(apps, schema_editor):
+    # GIN indexes and tsvector values only exist on PostgreSQL; other
+    # databases use the in-process fallback index in tickets.search
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Ticket = apps.get_model('tickets', 'Ticket')
+    TicketComment = apps.get_model('tickets', 'TicketComment')
+
+    schema_editor.execute(
+        'CREATE INDEX ticket_search_idx ON tickets_ticket USING gin (search_vector)'
+    )
+    comment_text = TicketComment.objects.filter(
+        ticket=OuterRef('pk'), is_internal=False
+    ).order_by().values('ticket').annotate(
+        text=StringAgg('content', delimiter=' ')
+    ).values('text')
+    Ticket.objects.update(search_vector=(
+        SearchVector('subject', weight='A', config='english')
+        + SearchVector('description', weight='B', config='english')
+        + SearchVector(Coalesce(Subquery(comment_text), Value(''), output_field=TextField()), weight='C', config='english')
+    ))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS ticket_search_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0004_ticket_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:42
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def backfill_last_activity(apps, schema_editor):
+    Ticket = apps.get_model('tickets', 'Ticket')
+    TicketComment = apps.get_model('tickets', 'TicketComment')
+    TicketAttachment = apps.get_model('tickets', 'TicketAttachment')
+
+    def latest(model, field):
+        return Subquery(
+            model.objects.filter(ticket=OuterRef('pk')).order_by().values('ticket')
+            .annotate(latest=Max(field)).values('latest')
+        )
+
+    Ticket.objects.update(last_activity_at=Greatest(
+        F('updated_at'),
+        Coalesce(latest(TicketComment, 'created_at'), F('updated_at')),
+        Coalesce(latest(TicketAttachment, 'uploaded_at'), F('updated_at')),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0006_export_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='last_activity_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_last_activity, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['last_activity_at'], name='ticket_activity_idx'),
+        ),
+    ]
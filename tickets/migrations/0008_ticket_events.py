@@ -0,0 +1,239 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:00
+
+import re
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce, Now
+
+# The system comments the views used to write for ticket changes. Each
+# shape is (pattern, is_internal, written by staff only), as the views wrote
+# it: anything else is an ordinary comment and is left alone.
+USERNAME = r'[\w.@+-]+'
+STATUS = re.compile(r'Status changed from "(?P<old>[^"]*)" to "(?P<new>[^"]*)"')
+ASSIGNED = re.compile(rf'Ticket assigned from "(?P<old>{USERNAME}|no one)" to "(?P<new>{USERNAME})"')
+UNASSIGNED = re.compile(rf'Ticket unassigned from "(?P<old>{USERNAME})"')
+ASSIGNMENT = re.compile(rf'Changed assignment from (?P<old>{USERNAME}|no one) to (?P<new>{USERNAME}|no one)\.')
+DEPARTMENT = re.compile(r'Changed department from (?P<old>.*) to (?P<new>.*)\.')
+REROUTED = re.compile(rf'Ticket was re-routed to department: (?P<department>.*), assignee: (?P<assignee>{USERNAME})\.')
+
+SHAPES = [
+    ('Status changed from "', STATUS, True, False),
+    ('Ticket assigned from "', ASSIGNED, True, True),
+    ('Ticket unassigned from "', UNASSIGNED, True, True),
+    ('Changed assignment from ', ASSIGNMENT, False, True),
+    ('Changed department from ', DEPARTMENT, False, True),
+    ('Ticket was re-routed to department: ', REROUTED, False, True),
+]
+
+
+def parse_comment(content):
+    """
+    Return [(code, payload)] for a system comment, where user fields hold
+    usernames (or None), or None if content is an ordinary comment.
+    """
+    def user(name):
+        return None if name in ('no one', 'None') else name
+
+    def department(name):
+        return '' if name == 'None' else name
+
+    if match := STATUS.fullmatch(content):
+        return [('status_changed', {'from': match['old'], 'to': match['new']})]
+    if match := ASSIGNED.fullmatch(content):
+        return [('assigned', {'from': user(match['old']), 'to': user(match['new'])})]
+    if match := UNASSIGNED.fullmatch(content):
+        return [('assigned', {'from': user(match['old']), 'to': None})]
+    if match := ASSIGNMENT.fullmatch(content):
+        return [('assigned', {'from': user(match['old']), 'to': user(match['new'])})]
+    if match := DEPARTMENT.fullmatch(content):
+        return [('department_changed', {'from': department(match['old']), 'to': department(match['new'])})]
+    if match := REROUTED.fullmatch(content):
+        # The comment did not say what the ticket was routed from, and
+        # "None" meant that part was left unchanged
+        events = []
+        if department(match['department']):
+            events.append(('department_changed', {'to': match['department'], 'reason': 'rerouted'}))
+        if user(match['assignee']):
+            events.append(('assigned', {'to': user(match['assignee']), 'reason': 'rerouted'}))
+        return events
+    return None
+
+
+def is_internal(content):
+    return any(pattern.fullmatch(content) and internal for _, pattern, internal, _ in SHAPES)
+
+
+def touch_tickets(apps, schema_editor, ticket_ids):
+    """
+    The tickets' comments changed: invalidate cached responses and, on
+    PostgreSQL, recompute the search data that includes comment text.
+    """
+    Ticket = apps.get_model('tickets', 'Ticket')
+    TicketComment = apps.get_model('tickets', 'TicketComment')
+
+    tickets = Ticket.objects.filter(pk__in=ticket_ids)
+    tickets.update(last_activity_at=Now())
+    if schema_editor.connection.vendor == 'postgresql':
+        from django.contrib.postgres.aggregates import StringAgg
+        from django.contrib.postgres.search import SearchVector
+
+        comment_text = TicketComment.objects.filter(
+            ticket=OuterRef('pk'), is_internal=False
+        ).order_by().values('ticket').annotate(
+            text=StringAgg('content', delimiter=' ')
+        ).values('text')
+        tickets.update(search_vector=(
+            SearchVector('subject', weight='A', config='english')
+            + SearchVector('description', weight='B', config='english')
+            + SearchVector(Coalesce(Subquery(comment_text), Value(''), output_field=TextField()), weight='C', config='english')
+        ))
+
+
+def comments_to_events(apps, schema_editor):
+    TicketComment = apps.get_model('tickets', 'TicketComment')
+    TicketEvent = apps.get_model('tickets', 'TicketEvent')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    shapes = models.Q()
+    for prefix, _, internal, staff_only in SHAPES:
+        shape = models.Q(content__startswith=prefix, is_internal=internal)
+        if staff_only:
+            shape &= models.Q(author__is_staff=True)
+        shapes |= shape
+    candidates = TicketComment.objects.filter(shapes).order_by('created_at', 'id')
+
+    converted = []
+    for comment in candidates.iterator():
+        parsed = parse_comment(comment.content)
+        if parsed:
+            converted.append((comment, parsed))
+    if not converted:
+        return
+
+    usernames = {
+        payload[field]
+        for _, parsed in converted
+        for code, payload in parsed if code == 'assigned'
+        for field in ('from', 'to') if payload.get(field)
+    }
+    user_ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+
+    events = []
+    for comment, parsed in converted:
+        for code, payload in parsed:
+            if code == 'assigned':
+                # Usernames to ids, as the views record them
+                payload = payload | {
+                    field: user_ids.get(payload[field]) for field in ('from', 'to') if payload.get(field)
+                }
+            events.append(TicketEvent(
+                ticket_id=comment.ticket_id,
+                code=code,
+                # Kept so that unapplying restores the comment as written
+                payload=payload | {'comment': comment.content},
+                actor_id=comment.author_id,
+                created_at=comment.created_at,
+            ))
+    TicketEvent.objects.bulk_create(events, batch_size=1000)
+
+    TicketComment.objects.filter(pk__in=[comment.pk for comment, _ in converted]).delete()
+    touch_tickets(apps, schema_editor, {comment.ticket_id for comment, _ in converted})
+
+
+def events_to_comments(apps, schema_editor):
+    """
+    Write the history back as the comments the old views expect: converted
+    events as their original comment, later ones in the shape the views
+    wrote for them. Events without an actor (comments need an author) and
+    kinds the views never commented on are dropped with the table.
+    """
+    TicketComment = apps.get_model('tickets', 'TicketComment')
+    TicketEvent = apps.get_model('tickets', 'TicketEvent')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    events = list(TicketEvent.objects.filter(
+        actor__isnull=False, code__in=['status_changed', 'assigned', 'department_changed'],
+    ).order_by('created_at', 'id'))
+    if not events:
+        return
+    user_ids = {
+        event.payload.get(field)
+        for event in events if event.code == 'assigned' and 'comment' not in event.payload
+        for field in ('from', 'to')
+    }
+    usernames = dict(User.objects.filter(pk__in=user_ids - {None}).values_list('id', 'username'))
+
+    def username(user_id):
+        if user_id is None:
+            return 'no one'
+        return usernames.get(user_id, f'user #{user_id}')
+
+    def comment_for(event):
+        payload = event.payload
+        if 'comment' in payload:
+            return payload['comment'], is_internal(payload['comment'])
+        old, new = payload.get('from'), payload.get('to')
+        if payload.get('reason') == 'rerouted':
+            if event.code == 'assigned':
+                return f'Ticket was re-routed to department: None, assignee: {username(new)}.', False
+            return f'Ticket was re-routed to department: {new or "None"}, assignee: None.', False
+        if event.code == 'status_changed':
+            return f'Status changed from "{old}" to "{new}"', True
+        if event.code == 'assigned':
+            if new is None:
+                return f'Ticket unassigned from "{username(old)}"', True
+            return f'Ticket assigned from "{username(old)}" to "{username(new)}"', True
+        return f'Changed department from {old or "None"} to {new or "None"}.', False
+
+    comments, written = [], set()
+    for event in events:
+        content, internal = comment_for(event)
+        # A re-route comment became up to two events
+        key = (event.ticket_id, event.actor_id, event.created_at, content)
+        if key in written:
+            continue
+        written.add(key)
+        comments.append(TicketComment(
+            ticket_id=event.ticket_id,
+            author_id=event.actor_id,
+            content=content,
+            is_internal=internal,
+            created_at=event.created_at,
+        ))
+    times = [comment.created_at for comment in comments]
+    comments = TicketComment.objects.bulk_create(comments, batch_size=1000)
+    # auto_now_add replaced the times on insert
+    for comment, created_at in zip(comments, times):
+        comment.created_at = created_at
+    TicketComment.objects.bulk_update(comments, ['created_at'], batch_size=1000)
+    touch_tickets(apps, schema_editor, {comment.ticket_id for comment in comments})
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0007_ticket_last_activity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(choices=[('created', 'Created'), ('status_changed', 'Status changed'), ('assigned', 'Assignment changed'), ('department_changed', 'Department changed'), ('priority_changed', 'Priority changed')], max_length=32)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='tickets.ticket')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['ticket', 'created_at', 'id'], name='ticket_event_timeline_idx')],
+            },
+        ),
+        migrations.RunPython(comments_to_events, events_to_comments),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:04
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, DateTimeField, F, OuterRef, Subquery, Value, When
+
+# priority: (first response, resolution) in minutes
+DEFAULT_POLICIES = {
+    'urgent': (60, 8 * 60),
+    'high': (4 * 60, 24 * 60),
+    'medium': (8 * 60, 3 * 24 * 60),
+    'low': (24 * 60, 7 * 24 * 60),
+}
+DONE_STATUSES = ['resolved', 'closed']
+
+
+def seed_policies_and_backfill(apps, schema_editor):
+    SLAPolicy = apps.get_model('tickets', 'SLAPolicy')
+    Ticket = apps.get_model('tickets', 'Ticket')
+    TicketComment = apps.get_model('tickets', 'TicketComment')
+
+    SLAPolicy.objects.bulk_create([
+        SLAPolicy(priority=priority, first_response_minutes=first_response, resolution_minutes=resolution)
+        for priority, (first_response, resolution) in DEFAULT_POLICIES.items()
+    ])
+
+    # Same rules as tickets.sla.rebuild_sla(): the first public comment by
+    # someone other than the creator, and the last update of done tickets
+    first_reply = TicketComment.objects.filter(
+        ticket=OuterRef('pk'), is_internal=False,
+    ).exclude(author=OuterRef('created_by')).order_by('created_at').values('created_at')[:1]
+    Ticket.objects.update(
+        first_response_at=Subquery(first_reply),
+        resolved_at=Case(
+            When(status__in=DONE_STATUSES, then=F('updated_at')),
+            default=Value(None),
+            output_field=DateTimeField(),
+        ),
+    )
+    deadlines = []
+    for priority, (first_response, resolution) in DEFAULT_POLICIES.items():
+        deadlines += [
+            When(priority=priority, first_response_at__isnull=True,
+                 then=F('created_at') + Value(timedelta(minutes=first_response))),
+            When(priority=priority, then=F('created_at') + Value(timedelta(minutes=resolution))),
+        ]
+    Ticket.objects.update(sla_due_at=Case(
+        When(status__in=DONE_STATUSES, then=Value(None)),
+        *deadlines,
+        default=Value(None),
+        output_field=DateTimeField(),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0008_ticket_events'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SLAPolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('urgent', 'Urgent')], max_length=20, unique=True)),
+                ('first_response_minutes', models.PositiveIntegerField(help_text='Minutes until a first response is due')),
+                ('resolution_minutes', models.PositiveIntegerField(help_text='Minutes until resolution is due')),
+            ],
+            options={
+                'verbose_name': 'SLA policy',
+                'verbose_name_plural': 'SLA policies',
+            },
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='first_response_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='resolved_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='sla_due_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='sla_escalated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('sla_due_at__isnull', False), ('sla_escalated_at__isnull', True)), fields=['sla_due_at'], name='ticket_sla_due_idx'),
+        ),
+        migrations.RunPython(seed_policies_and_backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The rules tickets.routing shipped with, by department code, in tie order
+DEFAULT_RULES = [
+    ('it', [
+        'password', 'login', 'portal', 'system', 'network', 'computer',
+        'internet', 'wifi', 'email', 'account', 'access', 'website',
+        'technology', 'software', 'hardware', 'server', 'database',
+    ]),
+    ('academic_affairs', [
+        'grade', 'academic', 'course', 'curriculum', 'transcript',
+        'enrollment', 'class', 'schedule', 'professor', 'instructor',
+        'exam', 'assignment', 'study', 'academic record',
+    ]),
+    ('registrar', [
+        'registration', 'transcript', 'certificate', 'diploma',
+        'enrollment', 'records', 'official document', 'verification',
+        'certification', 'student record',
+    ]),
+    ('finance', [
+        'tuition', 'payment', 'fee', 'billing', 'invoice', 'receipt',
+        'financial', 'money', 'scholarship', 'financial aid',
+        'accounting', 'refund',
+    ]),
+    ('student_affairs', [
+        'student life', 'organization', 'club', 'event', 'activity',
+        'counseling', 'guidance', 'discipline', 'student services',
+        'extracurricular', 'student affairs',
+    ]),
+    ('alumni_affairs', [
+        'alumni', 'graduate', 'alumni database', 'alumni update',
+        'alumni contact', 'alumni information',
+    ]),
+    ('scholarship', [
+        'scholarship', 'financial aid', 'grant', 'scholarship application',
+        'scholarship requirements', 'scholarship status',
+    ]),
+]
+
+
+def seed_rules(apps, schema_editor):
+    RoutingRule = apps.get_model('tickets', 'RoutingRule')
+    RoutingKeyword = apps.get_model('tickets', 'RoutingKeyword')
+
+    for position, (department, keywords) in enumerate(DEFAULT_RULES):
+        rule = RoutingRule.objects.create(department=department, position=position)
+        RoutingKeyword.objects.bulk_create([RoutingKeyword(rule=rule, keyword=keyword) for keyword in keywords])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0010_ticket_activity_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoutingRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(choices=[('academic_affairs', 'Academic Affairs'), ('registrar', 'Registrar'), ('it', 'IT'), ('finance', 'Finance (Accounting)'), ('alumni_affairs', 'Alumni Affairs'), ('student_affairs', 'Student Affairs (OSAS)'), ('scholarship', 'Scholarship'), ('computer_science', 'Computer Science'), ('information_technology', 'Information Technology')], max_length=100, unique=True)),
+                ('position', models.PositiveIntegerField(default=0, help_text='Rules earlier in order win ties')),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['position', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RoutingKeyword',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(max_length=100)),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='keywords', to='tickets.routingrule')),
+            ],
+            options={
+                'ordering': ['id'],
+                'constraints': [models.UniqueConstraint(fields=('rule', 'keyword'), name='unique_routing_keyword')],
+            },
+        ),
+        migrations.RunPython(seed_rules, migrations.RunPython.noop),
+    ]
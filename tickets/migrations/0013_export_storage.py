@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:39
+
+import os
+import shutil
+
+import tickets.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+def _move_exports(apps, to_private):
+    # Export files were written under MEDIA_ROOT, which may be served
+    # without a login; move them to (or back from) TICKET_EXPORT_ROOT
+    ExportJob = apps.get_model('tickets', 'ExportJob')
+    storage = tickets.models.export_storage()
+    for name in ExportJob.objects.exclude(file='').values_list('file', flat=True).iterator():
+        public, private = os.path.join(settings.MEDIA_ROOT, name), storage.path(name)
+        source, target = (public, private) if to_private else (private, public)
+        if os.path.exists(source):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(source, target)
+
+
+def move_exports_out_of_media(apps, schema_editor):
+    _move_exports(apps, to_private=True)
+
+
+def move_exports_into_media(apps, schema_editor):
+    _move_exports(apps, to_private=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0012_export_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='file',
+            field=models.FileField(blank=True, storage=tickets.models.export_storage, upload_to='exports/'),
+        ),
+        migrations.RunPython(move_exports_out_of_media, move_exports_into_media),
+    ]
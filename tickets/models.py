@@ -1,6 +1,12 @@
 
-from django.db import models
+import os
+
+from django.contrib.postgres.search import SearchVectorField
+from django.core.files.storage import FileSystemStorage
+from django.db import models, transaction
 from django.conf import settings
+from django.utils import timezone
+from users.models import CustomUser
 
 class Ticket(models.Model):
     STATUS_CHOICES = [
@@ -11,6 +17,12 @@ class Ticket(models.Model):
         ('closed', 'Closed'),
     ]
     
+    # Statuses that still need work (count towards workload and urgency)
+    ACTIVE_STATUSES = ['open', 'in_progress']
+    
+    # Left out of a plain save() of a loaded ticket (see save())
+    SEPARATELY_SAVED_FIELDS = ['search_vector', 'first_response_at', 'sla_due_at', 'sla_escalated_at']
+    
     PRIORITY_CHOICES = [
         ('low', 'Low'),
         ('medium', 'Medium'),
@@ -37,12 +49,71 @@ class Ticket(models.Model):
     department = models.CharField(max_length=100, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Last change to the ticket or its comments/attachments; drives the
+    # ETags of the read APIs (comment/attachment signals bump it)
+    last_activity_at = models.DateTimeField(auto_now=True)
+    # Subject, description and public comments for full-text search on
+    # PostgreSQL (GIN-indexed, see migration 0005); maintained by tickets.search
+    search_vector = SearchVectorField(null=True, editable=False)
+    # SLA tracking (see tickets.sla): when staff first responded, when the
+    # ticket was resolved or closed, and the deadline of the next SLA
+    # target still pending, which the sla_sweep command scans
+    first_response_at = models.DateTimeField(null=True, blank=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    sla_due_at = models.DateTimeField(null=True, blank=True, editable=False)
+    sla_escalated_at = models.DateTimeField(null=True, blank=True, editable=False)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Ticket list, newest first (also the keyset pagination order)
+            models.Index(fields=['-created_at', '-id'], name='ticket_created_idx'),
+            # Ticket list filtered by status / department
+            models.Index(fields=['status', '-created_at'], name='ticket_status_created_idx'),
+            models.Index(fields=['department', '-created_at'], name='ticket_dept_created_idx'),
+            # "My tickets" / "assigned to me" listings and the dashboard
+            models.Index(fields=['created_by', '-created_at'], name='ticket_creator_created_idx'),
+            models.Index(fields=['assigned_to', 'status'], name='ticket_assignee_status_idx'),
+            # Tickets resolved today
+            models.Index(fields=['status', 'updated_at'], name='ticket_status_updated_idx'),
+            # Latest activity, for conditional GETs over all tickets
+            models.Index(fields=['last_activity_at'], name='ticket_activity_idx'),
+            # Assignee workload: only active tickets are ever counted
+            models.Index(
+                fields=['assigned_to'],
+                condition=models.Q(status__in=['open', 'in_progress']),
+                name='ticket_active_assignee_idx',
+            ),
+            # SLA sweep: only tickets with a pending, unescalated deadline
+            models.Index(
+                fields=['sla_due_at'],
+                condition=models.Q(sla_due_at__isnull=False, sla_escalated_at__isnull=True),
+                name='ticket_sla_due_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.subject} ({self.get_status_display()})"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            # These are only written by tickets.search and tickets.sla;
+            # saving the copies loaded on this instance would undo changes
+            # made since, e.g. by the signal handlers of a comment added
+            # meanwhile
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.SEPARATELY_SAVED_FIELDS
+                and field.attname not in deferred
+            ]
+        # Signal handlers keep the counter rollups in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
 
 class TicketComment(models.Model):
     ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='comments')
@@ -68,3 +139,275 @@ class TicketAttachment(models.Model):
     
     def __str__(self):
         return f"Attachment {self.filename} for {self.ticket}"
+
+class SLAPolicy(models.Model):
+    """
+    Response and resolution targets for tickets of one priority, counted
+    from when the ticket was created.
+    """
+    priority = models.CharField(max_length=20, choices=Ticket.PRIORITY_CHOICES, unique=True)
+    first_response_minutes = models.PositiveIntegerField(help_text="Minutes until a first response is due")
+    resolution_minutes = models.PositiveIntegerField(help_text="Minutes until resolution is due")
+    
+    class Meta:
+        verbose_name = 'SLA policy'
+        verbose_name_plural = 'SLA policies'
+    
+    def __str__(self):
+        return f"SLA for {self.get_priority_display()} tickets"
+
+class RoutingRule(models.Model):
+    """
+    Keywords that send tickets to a department, read by tickets.routing.
+    
+    The department with the most keyword hits in a ticket wins; ties go to
+    the rule with the lowest position. Tickets are filed under the
+    department's name, staff are matched on its code.
+    """
+    department = models.CharField(max_length=100, choices=CustomUser.DEPARTMENT_CHOICES, unique=True)
+    position = models.PositiveIntegerField(default=0, help_text="Rules earlier in order win ties")
+    is_active = models.BooleanField(default=True)
+    # Also bumped when a keyword changes; routing.py watches it
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['position', 'id']
+    
+    def __str__(self):
+        return self.get_department_display()
+
+class RoutingKeyword(models.Model):
+    """
+    A word or phrase that counts towards its rule's department. Matched
+    case-insensitively on whole words.
+    """
+    rule = models.ForeignKey(RoutingRule, on_delete=models.CASCADE, related_name='keywords')
+    keyword = models.CharField(max_length=100)
+    
+    class Meta:
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['rule', 'keyword'], name='unique_routing_keyword'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        # Ticket text is lowercased before matching
+        self.keyword = ' '.join(self.keyword.lower().split())
+        super().save(*args, **kwargs)
+    
+    def __str__(self):
+        return self.keyword
+
+class TicketCounter(models.Model):
+    """
+    Number of tickets per status, priority and department.
+    Maintained by tickets.counters on every ticket change.
+    """
+    status = models.CharField(max_length=20, choices=Ticket.STATUS_CHOICES)
+    priority = models.CharField(max_length=20, choices=Ticket.PRIORITY_CHOICES)
+    department = models.CharField(max_length=100, blank=True, default='')
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['status', 'priority', 'department'],
+                name='unique_ticket_counter',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.status}/{self.priority}/{self.department or '-'}: {self.count}"
+
+class TicketUserCounter(models.Model):
+    """
+    Number of tickets per user, status and priority that the user created,
+    is assigned, or is involved in (either, counted once).
+    Maintained by tickets.counters on every ticket change.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='ticket_counters'
+    )
+    status = models.CharField(max_length=20, choices=Ticket.STATUS_CHOICES)
+    priority = models.CharField(max_length=20, choices=Ticket.PRIORITY_CHOICES)
+    created = models.IntegerField(default=0)
+    assigned = models.IntegerField(default=0)
+    involved = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'status', 'priority'],
+                name='unique_ticket_user_counter',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} {self.status}/{self.priority}: {self.involved}"
+
+class TicketActivityRollup(models.Model):
+    """
+    Tickets created and resolved per hour or day, department and priority.
+    Maintained incrementally by tickets.analytics (the
+    rollup_ticket_activity command); only non-zero rows are stored.
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    GRANULARITY_CHOICES = [
+        (HOUR, 'Hour'),
+        (DAY, 'Day'),
+    ]
+    
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    # Start of the hour (UTC) or day (TIME_ZONE) the counts cover
+    bucket = models.DateTimeField()
+    department = models.CharField(max_length=100, blank=True, default='')
+    priority = models.CharField(max_length=20, choices=Ticket.PRIORITY_CHOICES)
+    created = models.IntegerField(default=0)
+    resolved = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            # Also the index trend queries read: granularity, then time
+            models.UniqueConstraint(
+                fields=['granularity', 'bucket', 'department', 'priority'],
+                name='unique_ticket_activity_rollup',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.granularity} {self.bucket:%Y-%m-%d %H:%M} {self.department or '-'}/{self.priority}"
+
+class RollupWatermark(models.Model):
+    """
+    How far an incremental rollup has processed its source data.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    processed_until = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.name}: {self.processed_until}"
+
+class ExportStorage(FileSystemStorage):
+    """
+    Export files, under TICKET_EXPORT_ROOT rather than MEDIA_ROOT: they
+    hold whole ticket tables and are only served by download_export, which
+    checks the job's owner.
+    """
+    @property
+    def base_location(self):
+        return getattr(settings, 'TICKET_EXPORT_ROOT', os.path.join(settings.BASE_DIR, 'private'))
+    
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+    
+    def url(self, name):
+        raise ValueError('Export files have no public URL; use download_export')
+
+def export_storage():
+    return ExportStorage()
+
+class ExportJob(models.Model):
+    """
+    A ticket export run in the background by tickets.exports.
+    """
+    FORMAT_CHOICES = [
+        ('csv', 'CSV (gzip)'),
+        ('jsonl', 'JSON Lines (gzip)'),
+        ('parquet', 'Parquet'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='export_jobs'
+    )
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv')
+    filters = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    total_rows = models.IntegerField(null=True, blank=True)
+    rows_written = models.IntegerField(default=0)
+    file = models.FileField(upload_to='exports/', storage=export_storage, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Last sign of life from the worker running the job (see
+    # tickets.exports.stale_jobs)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Export #{self.id} ({self.format}) - {self.status}"
+    
+    @property
+    def progress(self):
+        """Fraction of rows written, between 0 and 1."""
+        if self.status == 'completed':
+            return 1.0
+        if not self.total_rows:
+            return 0.0
+        return min(self.rows_written / self.total_rows, 1.0)
+
+class TicketEvent(models.Model):
+    """
+    One entry in a ticket's append-only history, written by tickets.history.
+    
+    The payload holds only what the code needs, e.g. {"from": "open",
+    "to": "closed"} or user ids for assignments; names are resolved when
+    the timeline is read.
+    """
+    CREATED = 'created'
+    STATUS_CHANGED = 'status_changed'
+    ASSIGNED = 'assigned'
+    DEPARTMENT_CHANGED = 'department_changed'
+    PRIORITY_CHANGED = 'priority_changed'
+    
+    CODE_CHOICES = [
+        (CREATED, 'Created'),
+        (STATUS_CHANGED, 'Status changed'),
+        (ASSIGNED, 'Assignment changed'),
+        (DEPARTMENT_CHANGED, 'Department changed'),
+        (PRIORITY_CHANGED, 'Priority changed'),
+    ]
+    
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='events')
+    code = models.CharField(max_length=32, choices=CODE_CHOICES)
+    payload = models.JSONField(default=dict, blank=True)
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True
+    )
+    # A default rather than auto_now_add so converted history keeps its time
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            # A ticket's timeline, in order
+            models.Index(fields=['ticket', 'created_at', 'id'], name='ticket_event_timeline_idx'),
+            # Status changes over time, for the activity rollups
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(code='status_changed'),
+                name='ticket_event_status_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_code_display()} on ticket #{self.ticket_id}"
@@ -0,0 +1,135 @@
+"""
+Keyset (cursor) pagination for ticket listings.
+
+Offset pagination needs a COUNT(*) and skips over every earlier row, so deep
+pages get slower as the backlog grows. A cursor instead records the
+(created_at, id) of the last ticket served and the next page starts right
+after it, which costs the same at any depth.
+"""
+import base64
+import hashlib
+import json
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db.models import Q, Subquery
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(created_at, pk):
+    """
+    Return an opaque, URL-safe cursor for the given (created_at, id) position.
+    """
+    raw = json.dumps([created_at.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Return the (created_at, id) position stored in a cursor.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, pk = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid pagination cursor')
+
+
+def _keyset_rows(queryset, cursor, per_page):
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+    # One extra row tells whether there is a next page without counting
+    return queryset[:per_page + 1]
+
+
+def _keyset_result(tickets, per_page):
+    if len(tickets) <= per_page:
+        return tickets, None
+
+    tickets = tickets[:per_page]
+    return tickets, encode_cursor(tickets[-1].created_at, tickets[-1].id)
+
+
+def keyset_page(queryset, cursor, per_page):
+    """
+    Return (tickets, next_cursor) for the page that follows cursor, newest
+    first. next_cursor is None on the last page.
+    """
+    return _keyset_result(list(_keyset_rows(queryset, cursor, per_page)), per_page)
+
+
+async def akeyset_page(queryset, cursor, per_page):
+    """
+    Async version of keyset_page().
+    """
+    tickets = [ticket async for ticket in _keyset_rows(queryset, cursor, per_page)]
+    return _keyset_result(tickets, per_page)
+
+
+def _count_key(queryset):
+    sql, params = queryset.order_by().query.sql_with_params()
+    digest = hashlib.md5(f'{sql}|{params}'.encode(), usedforsecurity=False).hexdigest()
+    return f'tickets:count:{digest}'
+
+
+def cached_count(queryset, timeout=60):
+    """
+    Return queryset.count(), reusing the result for the same query for up to
+    timeout seconds. Good enough for "about N tickets" in a paginated UI.
+    """
+    key = _count_key(queryset)
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout)
+    return count
+
+
+async def acached_count(queryset, timeout=60):
+    """
+    Async version of cached_count(), sharing its cache entries.
+    """
+    key = _count_key(queryset)
+    count = await cache.aget(key)
+    if count is None:
+        count = await queryset.acount()
+        await cache.aset(key, count, timeout)
+    return count
+
+
+DEFAULT_COMMENT_PAGE = 50
+MAX_COMMENT_PAGE = 200
+
+
+def comment_page_params(params, prefix='comments_'):
+    """
+    Return (after, limit) from the comments_after and comments_limit
+    parameters (``after`` and ``limit`` with prefix=''); raises ValueError
+    if either is not a number.
+    """
+    after = int(params[f'{prefix}after']) if params.get(f'{prefix}after') else None
+    limit = min(max(int(params.get(f'{prefix}limit', DEFAULT_COMMENT_PAGE)), 1), MAX_COMMENT_PAGE)
+    return after, limit
+
+
+def comments_after(comments, after, limit):
+    """
+    Narrow comments (ordered by created_at, id) to the limit + 1 that follow
+    comment id after (from the start if None); the extra one tells whether
+    there are more. Works for any such queryset, e.g. ticket events.
+    """
+    if after is not None:
+        # Resume right after the given comment, in the same order
+        anchor = comments.model.objects.filter(id=after).values('created_at')[:1]
+        comments = comments.filter(
+            Q(created_at__gt=Subquery(anchor)) | Q(created_at=Subquery(anchor), id__gt=after)
+        )
+    return comments[:limit + 1]
@@ -0,0 +1,209 @@
+"""
+Offline evaluation of routing rules against the ticket history.
+
+replay_routing() re-routes stored tickets in batches and compares the
+outcome with the department each ticket ended up in. A batch becomes a
+tickets x keywords matrix of hit counts (from the same one-pass
+KeywordMatcher the router uses), multiplied by a keywords x departments
+weight matrix; the best column of each row is the department
+TicketRouter.route_ticket() would pick, with rule order breaking ties and
+IT when nothing matches. NumPy is only needed here and is imported when a
+replay runs.
+"""
+import time
+from itertools import islice
+
+from users.models import CustomUser
+
+from .models import Ticket, TicketEvent
+from .routing import KeywordMatcher, TicketRouter
+
+DEFAULT_DEPARTMENT = 'IT'
+BATCH_SIZE = 5000
+# Label for tickets filed under a department the rules do not know
+OTHER = '(other)'
+
+
+def numpy_available():
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def weight_matrix(matcher):
+    """
+    keywords x departments matrix with 1 where a keyword belongs to a
+    department's rules.
+    """
+    import numpy as np
+
+    weights = np.zeros((len(matcher.keywords), len(matcher.departments)), dtype=np.int32)
+    column = {department: j for j, department in enumerate(matcher.departments)}
+    for i, departments in matcher.keyword_departments.items():
+        for department in departments:
+            weights[i, column[department]] = 1
+    return weights
+
+
+def department_labels(rules):
+    """
+    Map the ways a department is written on tickets (the rule label, or a
+    CustomUser department code or name, in any case) to the rule label.
+    """
+    aliases = {label.casefold(): label for label in rules}
+    for code, name in CustomUser.DEPARTMENT_CHOICES:
+        label = aliases.get(name.casefold())
+        if label:
+            aliases[code.casefold()] = label
+    return aliases
+
+
+def corrected_tickets(tickets):
+    """
+    Narrow tickets to those whose department a person changed, according
+    to their history, as opposed to keeping the routed one.
+    """
+    corrections = TicketEvent.objects.filter(
+        code=TicketEvent.DEPARTMENT_CHANGED, actor__isnull=False,
+    ).exclude(payload__reason__in=['routed', 'rerouted'])
+    return tickets.filter(pk__in=corrections.values('ticket_id'))
+
+
+class ReplayReport:
+    """
+    Agreement and confusion matrix of a replay. Rows of the confusion
+    matrix are the departments tickets ended up in, columns the replayed
+    routing, both in ``labels`` order.
+    """
+
+    def __init__(self, labels, confusion, unlabelled, match_seconds, score_seconds, elapsed):
+        self.labels = labels
+        self.confusion = confusion
+        self.unlabelled = unlabelled
+        self.match_seconds = match_seconds
+        self.score_seconds = score_seconds
+        self.elapsed = elapsed
+
+    @property
+    def compared(self):
+        return int(self.confusion.sum())
+
+    @property
+    def agreed(self):
+        return int(self.confusion.trace())
+
+    @property
+    def agreement(self):
+        return self.agreed / self.compared if self.compared else 0.0
+
+    @property
+    def throughput(self):
+        total = self.compared + self.unlabelled
+        return total / self.elapsed if self.elapsed else 0.0
+
+    def per_department(self):
+        """
+        Return {label: (tickets, precision, recall)} for every label.
+        """
+        actual = self.confusion.sum(axis=1)
+        predicted = self.confusion.sum(axis=0)
+        diagonal = self.confusion.diagonal()
+        return {
+            label: (
+                int(actual[i]),
+                diagonal[i] / predicted[i] if predicted[i] else 0.0,
+                diagonal[i] / actual[i] if actual[i] else 0.0,
+            )
+            for i, label in enumerate(self.labels)
+        }
+
+    def as_dict(self):
+        return {
+            'compared': self.compared,
+            'agreed': self.agreed,
+            'agreement': self.agreement,
+            'unlabelled': self.unlabelled,
+            'labels': self.labels,
+            'confusion': self.confusion.tolist(),
+            'per_department': {
+                label: {'tickets': tickets, 'precision': precision, 'recall': recall}
+                for label, (tickets, precision, recall) in self.per_department().items()
+            },
+            'seconds': {
+                'total': self.elapsed,
+                'matching': self.match_seconds,
+                'scoring': self.score_seconds,
+            },
+            'tickets_per_second': self.throughput,
+        }
+
+
+def replay_routing(tickets=None, rules=None, batch_size=BATCH_SIZE, progress=None):
+    """
+    Route tickets (default: all) with rules (default: the router's
+    current rules) and compare with their stored departments. Tickets
+    without a department are counted as unlabelled. Returns a ReplayReport.
+    """
+    import numpy as np
+
+    rules = TicketRouter.get_rules() if rules is None else rules
+    tickets = Ticket.objects.all() if tickets is None else tickets
+    progress = progress or (lambda processed: None)
+
+    matcher = KeywordMatcher(rules)
+    weights = weight_matrix(matcher)
+    labels = list(matcher.departments)
+    if DEFAULT_DEPARTMENT not in labels:
+        labels.append(DEFAULT_DEPARTMENT)
+    labels.append(OTHER)
+    index = {label: i for i, label in enumerate(labels)}
+    default_column = index[DEFAULT_DEPARTMENT]
+    aliases = department_labels(rules)
+
+    confusion = np.zeros((len(labels), len(labels)), dtype=np.int64)
+    unlabelled = 0
+    processed = 0
+    match_seconds = score_seconds = 0.0
+    started = time.perf_counter()
+
+    rows = tickets.order_by().values_list('subject', 'description', 'department').iterator(
+        chunk_size=batch_size
+    )
+    while batch := list(islice(rows, batch_size)):
+        match_started = time.perf_counter()
+        hit_rows, hit_columns, hit_counts = [], [], []
+        actual = np.empty(len(batch), dtype=np.int64)
+        for row, (subject, description, department) in enumerate(batch):
+            for column, count in matcher.keyword_counts(f'{subject} {description}'.lower()).items():
+                hit_rows.append(row)
+                hit_columns.append(column)
+                hit_counts.append(count)
+            if department:
+                actual[row] = index[aliases.get(department.strip().casefold(), OTHER)]
+            else:
+                actual[row] = -1
+
+        score_started = time.perf_counter()
+        counts = np.zeros((len(batch), len(matcher.keywords)), dtype=np.int32)
+        counts[hit_rows, hit_columns] = hit_counts
+        scores = counts @ weights
+        # argmax returns the first best column, i.e. the earliest rule
+        predicted = scores.argmax(axis=1) if scores.shape[1] else np.zeros(len(batch), dtype=np.int64)
+        predicted[scores.max(axis=1, initial=0) == 0] = default_column
+
+        labelled = actual >= 0
+        unlabelled += int((~labelled).sum())
+        confusion += np.bincount(
+            actual[labelled] * len(labels) + predicted[labelled], minlength=len(labels) ** 2,
+        ).reshape(len(labels), len(labels))
+
+        match_seconds += score_started - match_started
+        score_seconds += time.perf_counter() - score_started
+        processed += len(batch)
+        progress(processed)
+
+    return ReplayReport(
+        labels, confusion, unlabelled, match_seconds, score_seconds, time.perf_counter() - started,
+    )
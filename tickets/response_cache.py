@@ -0,0 +1,101 @@
+"""
+Versioned cache for lookup API responses.
+
+Every cached payload is stored under the current version number of the
+data it depends on ("tickets" or "users"). Changing that data bumps the
+version, which retires all payloads built from it at once without having
+to know their keys; they simply expire from the cache.
+
+Versions only reach every worker through a cache they all share (Redis,
+Memcached, the database cache). With a per-process backend, such as the
+local-memory cache Django uses when CACHES is not configured, a bump is
+only seen by the worker that made the change, so payloads are then kept
+for LOCAL_RESPONSE_TIMEOUT seconds at most.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY_PREFIX = 'tickets:response-version:'
+RESPONSE_KEY_PREFIX = 'tickets:response:'
+RESPONSE_TIMEOUT = 300  # seconds
+# Upper bound on how stale other workers may be without a shared cache
+LOCAL_RESPONSE_TIMEOUT = 5  # seconds
+
+# Backends whose entries live in (and are only visible to) one process
+PER_PROCESS_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def _initial_version():
+    # Versions start from the clock so one lost from the cache is never
+    # reissued while responses cached under it may still be around
+    return int(time.time() * 1000)
+
+
+def get_version(namespace):
+    key = f'{VERSION_KEY_PREFIX}{namespace}'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace):
+    """
+    Invalidate every cached response built from namespace's data.
+    """
+    key = f'{VERSION_KEY_PREFIX}{namespace}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), timeout=None)
+
+
+def bump_version_on_commit(namespace):
+    """
+    Bump once the current transaction commits, so a concurrent request
+    cannot cache data from before the change under the new version.
+    """
+    transaction.on_commit(lambda: bump_version(namespace))
+
+
+def cache_is_shared():
+    """
+    Whether the default cache is shared between worker processes.
+    """
+    return settings.CACHES['default']['BACKEND'] not in PER_PROCESS_BACKENDS
+
+
+def response_timeout(timeout=RESPONSE_TIMEOUT):
+    """
+    How long to keep a payload: timeout with a shared cache, otherwise no
+    longer than TICKET_LOCAL_RESPONSE_TIMEOUT (default
+    LOCAL_RESPONSE_TIMEOUT) seconds.
+    """
+    if cache_is_shared():
+        return timeout
+    return min(timeout, getattr(settings, 'TICKET_LOCAL_RESPONSE_TIMEOUT', LOCAL_RESPONSE_TIMEOUT))
+
+
+def cached_payload(name, namespaces, params, build, timeout=RESPONSE_TIMEOUT):
+    """
+    Return build() for the given response name and request params, reusing
+    a cached result while the versions of namespaces are unchanged (and
+    for at most response_timeout(timeout) seconds).
+    """
+    versions = [get_version(namespace) for namespace in namespaces]
+    digest = hashlib.md5(repr((versions, params)).encode(), usedforsecurity=False).hexdigest()
+    key = f'{RESPONSE_KEY_PREFIX}{name}:{digest}'
+
+    payload = cache.get(key)
+    if payload is None:
+        payload = build()
+        cache.set(key, payload, response_timeout(timeout))
+    return payload
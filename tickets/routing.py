@@ -1,20 +1,224 @@
 
 """
 Ticket routing system to automatically assign tickets to departments and users
-based on predefined rules.
+based on rules kept in the database (RoutingRule, editable in the admin).
 """
 from django.conf import settings
-from django.db.models import Q
+from django.db.models import BooleanField, Case, Count, FilteredRelation, Max, Q, Value, When
+from django.utils import timezone
 from users.models import CustomUser
-from .models import Ticket
+from .models import RoutingRule, Ticket
+from .response_cache import bump_version_on_commit, get_version
+from .workload import workload_ledger
 import re
+import threading
+import time
+
+_WORD_BOUNDARY = re.compile(r'\b')
+
+# Seconds a process routes with its compiled rules before asking the
+# database whether they changed
+RULES_CHECK_INTERVAL = 30
+
+# Department codes by code and name, casefolded
+_DEPARTMENT_CODES = {
+    alias.casefold(): code
+    for code, name in CustomUser.DEPARTMENT_CHOICES
+    for alias in (code, name)
+}
+
+
+def department_code(department):
+    """
+    CustomUser department code for a department code or name as stored on
+    tickets ('IT' -> 'it'); unknown departments are returned unchanged.
+    """
+    if not department:
+        return department
+    return _DEPARTMENT_CODES.get(department.strip().casefold(), department)
+
+
+def _trie_pattern(node):
+    """
+    Render a character trie as a regex that prefers the longest branch.
+    """
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in node.items() if char]
+    if not branches:
+        return ''
+    pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    return f'(?:{pattern})?' if '' in node else pattern
+
+
+class KeywordMatcher:
+    """
+    Scores departments against a block of text in a single regex pass.
+
+    Every keyword is compiled into one trie-shaped regex inside a zero-width
+    lookahead, so overlapping keywords ('financial' and 'financial aid') are
+    all seen at each word boundary. Per-keyword counts are identical to running
+    ``re.findall(r'\b' + re.escape(keyword) + r'\b', text)`` once per keyword.
+    """
+
+    def __init__(self, rules):
+        self.departments = list(rules)
+        self.keywords = []
+        self.keyword_departments = {}  # keyword index -> department names
+
+        keyword_index = {}
+        for dept_name, dept_rules in rules.items():
+            for keyword in dept_rules['keywords']:
+                if keyword not in keyword_index:
+                    keyword_index[keyword] = len(self.keywords)
+                    self.keywords.append(keyword)
+                self.keyword_departments.setdefault(keyword_index[keyword], []).append(dept_name)
+
+        # The keywords are folded into a prefix trie whose optional branches
+        # are greedy, so the lookahead captures the longest keyword matching
+        # at a position; shorter keywords matching there are prefixes of it
+        # and are looked up in ``_implied`` instead of rescanning.
+        trie = {}
+        for keyword in self.keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = {}
+        self._pattern = re.compile(r'\b(?=(' + _trie_pattern(trie) + r')\b)') if trie else None
+
+        self._implied = [
+            [j for j, other in enumerate(self.keywords)
+             if keyword.startswith(other)
+             and (len(other) == len(keyword) or _WORD_BOUNDARY.match(keyword, len(other)))]
+            for keyword in self.keywords
+        ]
+        self._lengths = [len(keyword) for keyword in self.keywords]
+        self._keyword_index = keyword_index
+
+    def keyword_counts(self, text):
+        """
+        Return {keyword index: occurrences} for every keyword found in text.
+        """
+        counts = {}
+        if self._pattern is None:
+            return counts
+
+        # findall() never counts overlapping hits of the same keyword, so a
+        # keyword only counts again once the scan is past its previous hit.
+        next_start = {}
+        keyword_index = self._keyword_index
+        for match in self._pattern.finditer(text):
+            start = match.start()
+            for i in self._implied[keyword_index[match.group(1)]]:
+                if start >= next_start.get(i, 0):
+                    counts[i] = counts.get(i, 0) + 1
+                    next_start[i] = start + self._lengths[i]
+        return counts
+
+    def score(self, text):
+        """
+        Return {department: score} for departments with at least one keyword
+        hit, in rule order.
+        """
+        scores = dict.fromkeys(self.departments, 0)
+        for i, count in self.keyword_counts(text).items():
+            for dept_name in self.keyword_departments[i]:
+                scores[dept_name] += count
+        return {dept_name: score for dept_name, score in scores.items() if score > 0}
+
+
+def load_rules():
+    """
+    Active rules from the database, in order, shaped like
+    TicketRouter.ROUTING_RULES: keyed by department name, with the
+    department's code added.
+    """
+    names = dict(CustomUser.DEPARTMENT_CHOICES)
+    rules = {}
+    for rule in RoutingRule.objects.filter(is_active=True).prefetch_related('keywords'):
+        name = names.get(rule.department, rule.department)
+        rules[name] = {
+            'keywords': [keyword.keyword for keyword in rule.keywords.all()],
+            'department': name,
+            'code': rule.department,
+        }
+    return rules
+
+
+def rules_changed():
+    """
+    Mark the rules as changed once the current transaction commits, for
+    every process sharing the cache. Called by the RoutingRule and
+    RoutingKeyword signal handlers.
+    """
+    bump_version_on_commit('routing')
+
+
+def touch_rule(rule_id):
+    # Keyword edits move their rule's updated_at, which CompiledRules watches
+    RoutingRule.objects.filter(pk=rule_id).update(updated_at=timezone.now())
+
+
+class CompiledRules:
+    """
+    This process's routing rules and their KeywordMatcher, compiled once
+    per change to the rules.
+
+    Whether the rules changed is read from the database (the latest
+    updated_at and number of RoutingRule rows, one aggregate query) every
+    RULES_CHECK_INTERVAL seconds, and right away when the 'routing'
+    response_cache version moves. Rule edits bump that version, so where
+    the cache is shared every worker recompiles on its next ticket; with a
+    per-process cache the other workers follow within the interval.
+
+    While there are no RoutingRule rows TicketRouter.ROUTING_RULES is used.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Recompile on next use.
+        """
+        self._fingerprint = None
+        self._compiled = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def get(self):
+        """
+        Return (rules, matcher), recompiling if the rules changed.
+        """
+        version = get_version('routing')
+        with self._lock:
+            now = time.monotonic()
+            if (
+                self._compiled is not None and version == self._version
+                and now - self._checked_at < RULES_CHECK_INTERVAL
+            ):
+                return self._compiled
+
+            state = RoutingRule.objects.aggregate(changed=Max('updated_at'), count=Count('pk'))
+            fingerprint = (state['changed'], state['count'])
+            if self._compiled is None or fingerprint != self._fingerprint:
+                rules = load_rules() if state['count'] else TicketRouter.ROUTING_RULES
+                self._compiled = (rules, KeywordMatcher(rules))
+                self._fingerprint = fingerprint
+            self._version = version
+            self._checked_at = now
+            return self._compiled
+
 
 class TicketRouter:
     """
     Rule-based router for assigning tickets to appropriate departments and users.
     """
     
-    # Define routing rules based on keywords and content
+    # Ticket statuses that count towards an assignee's workload
+    ACTIVE_STATUSES = Ticket.ACTIVE_STATUSES
+    
+    # Built-in rules, used until the RoutingRule table has rows (migration
+    # 0011 seeds it with these) and by the demo data seeder
     ROUTING_RULES = {
         'IT': {
             'keywords': [
@@ -78,19 +282,8 @@ class TicketRouter:
         Analyze ticket content and return recommended department and assignee.
         Returns tuple: (department, assigned_user)
         """
-        content = f"{ticket.subject} {ticket.description}".lower()
-        
         # Score each department based on keyword matches
-        department_scores = {}
-        
-        for dept_name, rules in cls.ROUTING_RULES.items():
-            score = 0
-            for keyword in rules['keywords']:
-                # Count occurrences of each keyword
-                score += len(re.findall(r'\b' + re.escape(keyword) + r'\b', content))
-            
-            if score > 0:
-                department_scores[dept_name] = score
+        department_scores = cls.score_departments(f"{ticket.subject} {ticket.description}")
         
         # Get the department with the highest score
         if department_scores:
@@ -104,43 +297,81 @@ class TicketRouter:
         # Default to IT if no matches found
         return 'IT', cls._find_assignee('IT', ticket.priority)
     
+    @classmethod
+    def compile_rules(cls):
+        """
+        Rebuild the keyword matcher now rather than when the rules are next
+        checked, e.g. after modifying ROUTING_RULES in place.
+        """
+        compiled_rules.invalidate()
+        return cls.get_matcher()
+    
+    @classmethod
+    def get_rules(cls):
+        """
+        Return the rules currently in effect, keyed by department name.
+        """
+        return compiled_rules.get()[0]
+    
+    @classmethod
+    def get_matcher(cls):
+        """
+        Return the compiled matcher for the current rules.
+        """
+        return compiled_rules.get()[1]
+    
+    @classmethod
+    def score_departments(cls, text):
+        """
+        Return {department: keyword hit count} for the given text.
+        """
+        return cls.get_matcher().score(text.lower())
+    
+    @classmethod
+    def _candidate_users(cls, department, priority='medium'):
+        """
+        Return eligible assignees annotated with their active ticket count,
+        best candidate first.
+
+        Department faculty/staff rank ahead of the admin fallback pool, which
+        only comes into play when the department has nobody. For urgent
+        tickets admins rank first within whichever pool is used.
+        """
+        # Users store department codes, tickets and rules department names
+        in_department = Q(department=department_code(department)) & ~Q(role='student')
+        ordering = ['-in_department']
+        if priority == 'urgent':
+            ordering.append('-is_staff')
+        ordering += ['active_tickets', 'pk']
+        
+        return CustomUser.objects.filter(
+            in_department | Q(is_staff=True),
+            is_active=True,
+        ).annotate(
+            in_department=Case(
+                When(in_department, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            ),
+            # Joining only active tickets lets the partial
+            # ticket_active_assignee_idx index serve the count
+            active_assigned=FilteredRelation(
+                'assigned_tickets',
+                condition=Q(assigned_tickets__status__in=cls.ACTIVE_STATUSES),
+            ),
+        ).annotate(
+            active_tickets=Count('active_assigned'),
+        ).order_by(*ordering)
+    
     @classmethod
     def _find_assignee(cls, department, priority='medium'):
         """
         Find the best assignee in the given department.
         Prioritizes faculty/staff members and considers workload.
         """
-        # Get users in the department
-        users = CustomUser.objects.filter(
-            department=department,
-            is_active=True
-        ).exclude(role='student')  # Exclude students from assignment
-        
-        if not users.exists():
-            # Fallback to admin users if no department staff found
-            users = CustomUser.objects.filter(
-                is_staff=True,
-                is_active=True
-            )
-        
-        if not users.exists():
-            return None
-        
-        # For urgent tickets, prefer admin users
-        if priority == 'urgent':
-            admin_users = users.filter(is_staff=True)
-            if admin_users.exists():
-                users = admin_users
-        
-        # Simple round-robin assignment based on current ticket count
-        # In a real system, you might want more sophisticated load balancing
-        user_workloads = []
-        for user in users:
-            active_tickets = user.assigned_tickets.filter(
-                status__in=['open', 'in_progress']
-            ).count()
-            user_workloads.append((user, active_tickets))
-        
-        # Sort by workload (ascending) and return user with least active tickets
-        user_workloads.sort(key=lambda x: x[1])
-        return user_workloads[0][0] if user_workloads else None
+        # Least loaded user from the best available pool, served from the
+        # workload ledger instead of counting tickets on every call
+        return workload_ledger.least_loaded(department_code(department), priority)
+
+
+compiled_rules = CompiledRules()
@@ -0,0 +1,248 @@
+"""
+Full-text ticket search.
+
+On PostgreSQL every ticket carries a ``search_vector`` tsvector built from
+its subject (weight A), description (B) and non-internal comments (C),
+backed by a GIN index and refreshed whenever that text changes. Other
+databases (SQLite in development and tests) use an in-process inverted
+index over the same text with the same weighting.
+"""
+import bisect
+import re
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+from .models import Ticket, TicketComment
+
+SEARCH_CONFIG = 'english'
+
+_TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+def _uses_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def search_vector_expression():
+    """
+    Expression computing a ticket's search_vector, usable in update().
+    """
+    comment_text = TicketComment.objects.filter(
+        ticket=OuterRef('pk'), is_internal=False
+    ).order_by().values('ticket').annotate(
+        text=StringAgg('content', delimiter=' ')
+    ).values('text')
+    return (
+        SearchVector('subject', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+        + SearchVector(Coalesce(Subquery(comment_text), Value(''), output_field=TextField()), weight='C', config=SEARCH_CONFIG)
+    )
+
+
+class SimpleSearchIndex:
+    """
+    In-process inverted index used when PostgreSQL is not available.
+
+    Built lazily from the database on first search and kept current by
+    refresh(). It is per process, so it is meant for development and test
+    runs rather than multi-worker deployments.
+    """
+
+    WEIGHTS = {'subject': 1.0, 'description': 0.4, 'comments': 0.2}
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._postings = defaultdict(dict)  # token -> {ticket id: score}
+        self._tokens = {}  # ticket id -> tokens indexed for it
+        self._vocabulary = []  # sorted tokens, for prefix lookups
+
+    def _documents(self, ticket_ids=None):
+        tickets = Ticket.objects.order_by()
+        comments = TicketComment.objects.filter(is_internal=False).order_by()
+        if ticket_ids is not None:
+            tickets = tickets.filter(pk__in=ticket_ids)
+            comments = comments.filter(ticket_id__in=ticket_ids)
+
+        documents = {
+            pk: {'subject': subject, 'description': description, 'comments': []}
+            for pk, subject, description in tickets.values_list('pk', 'subject', 'description').iterator()
+        }
+        for ticket_id, content in comments.values_list('ticket_id', 'content').iterator():
+            if ticket_id in documents:
+                documents[ticket_id]['comments'].append(content)
+        return documents
+
+    def _add(self, ticket_id, document):
+        scores = defaultdict(float)
+        for field, weight in self.WEIGHTS.items():
+            text = ' '.join(document[field]) if field == 'comments' else document[field]
+            for token in tokenize(text):
+                scores[token] += weight
+        for token, score in scores.items():
+            if token not in self._postings:
+                bisect.insort(self._vocabulary, token)
+            self._postings[token][ticket_id] = score
+        self._tokens[ticket_id] = set(scores)
+
+    def _remove(self, ticket_id):
+        for token in self._tokens.pop(ticket_id, ()):
+            postings = self._postings[token]
+            postings.pop(ticket_id, None)
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+
+    def _ensure_built(self):
+        if not self._built:
+            for ticket_id, document in self._documents().items():
+                self._add(ticket_id, document)
+            self._built = True
+
+    def reset(self):
+        """
+        Forget everything indexed so far; the next search rebuilds the index.
+        """
+        with self._lock:
+            self._built = False
+            self._postings.clear()
+            self._tokens.clear()
+            self._vocabulary.clear()
+
+    def refresh(self, ticket_ids):
+        """
+        Re-index the given tickets; tickets that no longer exist are dropped.
+        """
+        with self._lock:
+            if not self._built:
+                return
+            documents = self._documents(ticket_ids)
+            for ticket_id in ticket_ids:
+                self._remove(ticket_id)
+                if ticket_id in documents:
+                    self._add(ticket_id, documents[ticket_id])
+
+    def _prefix_scores(self, prefix):
+        scores = defaultdict(float)
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            for ticket_id, score in self._postings[token].items():
+                scores[ticket_id] += score
+        return scores
+
+    def search(self, query):
+        """
+        Return ticket ids containing every query term (as a word prefix),
+        best match first.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            self._ensure_built()
+            totals = None
+            for term in terms:
+                scores = self._prefix_scores(term)
+                if totals is None:
+                    totals = scores
+                else:
+                    totals = {pk: totals[pk] + scores[pk] for pk in totals if pk in scores}
+                if not totals:
+                    return []
+        return sorted(totals, key=lambda pk: (-totals[pk], -pk))
+
+
+simple_index = SimpleSearchIndex()
+
+
+def refresh_search_index(ticket_ids):
+    """
+    Bring the search data of the given tickets up to date.
+    """
+    ticket_ids = list(ticket_ids)
+    if not ticket_ids:
+        return
+    if _uses_postgres():
+        Ticket.objects.filter(pk__in=ticket_ids).update(search_vector=search_vector_expression())
+    else:
+        simple_index.refresh(ticket_ids)
+
+
+def rebuild_search_index():
+    """
+    Recompute the search data of every ticket, e.g. after bulk_create(),
+    which bypasses the signals that normally keep it current.
+    """
+    if _uses_postgres():
+        Ticket.objects.update(search_vector=search_vector_expression())
+    else:
+        simple_index.reset()
+
+
+def _postgres_matches(tickets, terms):
+    # Every term must match; the last one may still be being typed
+    search_query = SearchQuery(
+        ' & '.join(f'{term}:*' for term in terms), search_type='raw', config=SEARCH_CONFIG
+    )
+    return tickets.filter(search_vector=search_query).annotate(
+        rank=SearchRank(F('search_vector'), search_query)
+    ).order_by('-rank', '-created_at')
+
+
+def _in_rank_order(tickets, ranked_ids):
+    position = {pk: i for i, pk in enumerate(ranked_ids)}
+    tickets.sort(key=lambda ticket: position[ticket.pk])
+    return tickets
+
+
+def search_tickets(tickets, query, limit=20):
+    """
+    Return up to limit tickets from the tickets queryset matching query,
+    best match first, with created_by loaded.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return []
+    tickets = tickets.select_related('created_by')
+
+    if _uses_postgres():
+        return list(_postgres_matches(tickets, terms)[:limit])
+
+    ranked_ids = simple_index.search(query)
+    if not ranked_ids:
+        return []
+    visible = list(tickets.filter(pk__in=ranked_ids))
+    return _in_rank_order(visible, ranked_ids)[:limit]
+
+
+async def asearch_tickets(tickets, query, limit=20):
+    """
+    Async version of search_tickets().
+    """
+    terms = tokenize(query)
+    if not terms:
+        return []
+    tickets = tickets.select_related('created_by')
+
+    if _uses_postgres():
+        return [ticket async for ticket in _postgres_matches(tickets, terms)[:limit]]
+
+    # The in-process index may load itself from the database first
+    ranked_ids = await sync_to_async(simple_index.search)(query)
+    if not ranked_ids:
+        return []
+    visible = [ticket async for ticket in tickets.filter(pk__in=ranked_ids)]
+    return _in_rank_order(visible, ranked_ids)[:limit]
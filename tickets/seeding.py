@@ -0,0 +1,275 @@
+"""
+Synthetic ticket data for capacity tests and benchmarks.
+
+Everything is written with bulk_create in fixed-size batches, so memory use
+does not grow with the number of tickets, and generated from a single
+random.Random(seed), so the same options always produce the same data.
+bulk_create skips model signals; the counter rollups, search data, SLA
+timers and activity rollups are rebuilt once at the end instead.
+"""
+import math
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .counters import rebuild_counters
+from .models import Ticket, TicketAttachment, TicketComment
+from .response_cache import bump_version_on_commit
+from .routing import TicketRouter
+from .analytics import update_rollups
+from .search import rebuild_search_index
+from .sla import rebuild_sla
+from .workload import workload_ledger
+
+User = get_user_model()
+
+DEFAULT_STATUS_WEIGHTS = {'open': 30, 'in_progress': 20, 'on_hold': 5, 'resolved': 25, 'closed': 20}
+DEFAULT_PRIORITY_WEIGHTS = {'low': 25, 'medium': 45, 'high': 20, 'urgent': 10}
+# Keyed by the routing department labels stored on tickets; '' is "no department"
+DEFAULT_DEPARTMENT_WEIGHTS = {**{label: 10 for label in TicketRouter.ROUTING_RULES}, '': 8}
+
+FAN_OUT_DISTRIBUTIONS = ['poisson', 'geometric', 'fixed']
+
+ROLE_WEIGHTS = {'student': 70, 'faculty': 15, 'alumni': 15}
+
+
+def parse_weights(spec, allowed):
+    """
+    Parse "key=weight,key=weight" into a dict, checking keys against allowed.
+    'none' stands for the empty key.
+    """
+    weights = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        key, sep, weight = item.rpartition('=')
+        key = '' if key.lower() == 'none' else key.strip()
+        if not sep or key not in allowed:
+            raise ValueError(f'Invalid weight "{item}"; expected one of {", ".join(k or "none" for k in allowed)}')
+        try:
+            weights[key] = float(weight)
+        except ValueError:
+            raise ValueError(f'Invalid weight "{item}"')
+        if weights[key] < 0:
+            raise ValueError(f'Invalid weight "{item}"')
+    if not any(weights.values()):
+        raise ValueError('At least one weight must be positive')
+    return weights
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """
+    Let bulk_create store the given created/updated timestamps instead of
+    overwriting them with now() for auto_now/auto_now_add fields.
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class TicketSeeder:
+    """
+    Generates users, tickets, comments and attachment metadata.
+
+    Tickets are spread evenly over the last ``days`` days, oldest first, and
+    their text is built from the routing keywords of their department so the
+    router and search behave as they would on real data. Roughly one user in
+    ten is staff; tickets that left "open" are assigned to one of them.
+    """
+
+    def __init__(self, users=300, tickets=20000, comments_per_ticket=3,
+                 comment_distribution='poisson', attachments_per_ticket=0.25,
+                 status_weights=None, priority_weights=None, department_weights=None,
+                 days=365, batch_size=5000, seed=42, username_prefix='seed_user', progress=None):
+        if comment_distribution not in FAN_OUT_DISTRIBUTIONS:
+            raise ValueError(f'Unknown comment distribution: {comment_distribution}')
+        self.user_count = users
+        self.ticket_count = tickets
+        self.comments_per_ticket = comments_per_ticket
+        self.comment_distribution = comment_distribution
+        self.attachments_per_ticket = attachments_per_ticket
+        self.status_weights = status_weights or DEFAULT_STATUS_WEIGHTS
+        self.priority_weights = priority_weights or DEFAULT_PRIORITY_WEIGHTS
+        self.department_weights = department_weights or DEFAULT_DEPARTMENT_WEIGHTS
+        self.days = days
+        self.batch_size = batch_size
+        self.seed = seed
+        self.username_prefix = username_prefix
+        self.progress = progress or (lambda created, total: None)
+        self.rng = random.Random(seed)
+
+    def run(self):
+        """
+        Generate the whole dataset and return a summary of what was created.
+        """
+        staff, requesters = self.create_users()
+        summary = {'users': len(staff) + len(requesters), 'staff': len(staff), 'seed': self.seed}
+        summary.update(self.create_tickets(staff, requesters))
+
+        # bulk_create skips the signals that maintain these
+        rebuild_counters()
+        rebuild_search_index()
+        rebuild_sla()
+        # Seeded tickets are backdated, behind any rollup watermark
+        update_rollups(full=True)
+        workload_ledger.reconcile()
+        return summary
+
+    def create_users(self):
+        """
+        Create the seed users that do not exist yet; return the ids of the
+        staff users and of everyone else.
+        """
+        departments = [code for code, _ in User.DEPARTMENT_CHOICES]
+        roles = list(ROLE_WEIGHTS)
+        role_weights = list(ROLE_WEIGHTS.values())
+        password = make_password('seed')
+
+        usernames = [f'{self.username_prefix}_{i}' for i in range(self.user_count)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        new_users = []
+        for i, username in enumerate(usernames):
+            # Draw for every user so the data does not depend on what exists
+            is_staff = i % 10 == 0
+            role = 'staff' if is_staff else self.rng.choices(roles, role_weights)[0]
+            department = self.rng.choice(departments) if is_staff or self.rng.random() < 0.3 else None
+            if username not in existing:
+                new_users.append(User(
+                    username=username,
+                    email=f'{username}@example.com',
+                    password=password,
+                    is_staff=is_staff,
+                    role=role,
+                    department=department,
+                ))
+        User.objects.bulk_create(new_users, batch_size=self.batch_size)
+        # bulk_create sends no signals; retire cached user listings
+        bump_version_on_commit('users')
+
+        staff, requesters = [], []
+        for pk, is_staff in User.objects.filter(username__in=usernames).order_by('pk').values_list('pk', 'is_staff'):
+            (staff if is_staff else requesters).append(pk)
+        if not staff or not requesters:
+            raise ValueError('At least 2 users are needed (one staff, one requester)')
+        return staff, requesters
+
+    def create_tickets(self, staff, requesters):
+        statuses, status_weights = zip(*self.status_weights.items())
+        priorities, priority_weights = zip(*self.priority_weights.items())
+        departments, department_weights = zip(*self.department_weights.items())
+        rules = TicketRouter.ROUTING_RULES
+        any_keywords = [keyword for rule in rules.values() for keyword in rule['keywords']]
+
+        now = timezone.now()
+        start = now - timedelta(days=self.days)
+        step = (now - start) / max(self.ticket_count, 1)
+        counts = {'tickets': 0, 'comments': 0, 'attachments': 0}
+
+        with explicit_timestamps(Ticket, TicketComment, TicketAttachment):
+            for batch_start in range(0, self.ticket_count, self.batch_size):
+                batch_end = min(batch_start + self.batch_size, self.ticket_count)
+                tickets = []
+                for i in range(batch_start, batch_end):
+                    department = self.rng.choices(departments, department_weights)[0]
+                    keywords = rules[department]['keywords'] if department else any_keywords
+                    status = self.rng.choices(statuses, status_weights)[0]
+                    subject, description = self.ticket_text(keywords)
+                    created_at = start + step * i
+                    updated_at = min(created_at + timedelta(minutes=self.rng.randrange(4320)), now)
+                    tickets.append(Ticket(
+                        subject=subject,
+                        description=description,
+                        status=status,
+                        priority=self.rng.choices(priorities, priority_weights)[0],
+                        department=rules[department]['department'] if department else None,
+                        created_by_id=self.rng.choice(requesters),
+                        assigned_to_id=(
+                            self.rng.choice(staff) if status != 'open' or self.rng.random() < 0.5 else None
+                        ),
+                        created_at=created_at,
+                        updated_at=updated_at,
+                        last_activity_at=updated_at,
+                    ))
+
+                with transaction.atomic():
+                    Ticket.objects.bulk_create(tickets, batch_size=self.batch_size)
+                    comments, attachments = self.ticket_children(tickets, any_keywords, now)
+                    TicketComment.objects.bulk_create(comments, batch_size=self.batch_size)
+                    TicketAttachment.objects.bulk_create(attachments, batch_size=self.batch_size)
+
+                counts['tickets'] += len(tickets)
+                counts['comments'] += len(comments)
+                counts['attachments'] += len(attachments)
+                self.progress(batch_end, self.ticket_count)
+        return counts
+
+    def ticket_children(self, tickets, keywords, now):
+        comments = []
+        attachments = []
+        for ticket in tickets:
+            span = max((now - ticket.created_at).total_seconds(), 1)
+            for _ in range(self.fan_out(self.comments_per_ticket, self.comment_distribution)):
+                assignee = ticket.assigned_to_id
+                author = assignee if assignee and self.rng.random() < 0.5 else ticket.created_by_id
+                comments.append(TicketComment(
+                    ticket_id=ticket.pk,
+                    author_id=author,
+                    content=self.ticket_text(keywords)[1],
+                    is_internal=author == assignee and self.rng.random() < 0.2,
+                    created_at=ticket.created_at + timedelta(seconds=self.rng.random() * span),
+                ))
+            for _ in range(self.fan_out(self.attachments_per_ticket, 'poisson')):
+                name = f'seed_{ticket.pk}_{self.rng.randrange(10 ** 6)}.pdf'
+                attachments.append(TicketAttachment(
+                    ticket_id=ticket.pk,
+                    file=f'ticket_attachments/{name}',
+                    filename=name,
+                    file_type='application/pdf',
+                    file_size=self.rng.randrange(10_000, 2_000_000),
+                    uploaded_by_id=ticket.created_by_id,
+                    uploaded_at=ticket.created_at,
+                ))
+        return comments, attachments
+
+    def ticket_text(self, keywords):
+        words = self.rng.sample(keywords, min(3, len(keywords)))
+        subject = f'{words[0].capitalize()} {" ".join(words[1:])} issue'[:64]
+        description = (
+            f'Hello, I have a problem with my {words[0]}. '
+            f'It seems related to the {" and ".join(words[1:]) or words[0]}. '
+            'Could someone please look into it as soon as possible? Thank you.'
+        )
+        return subject, description
+
+    def fan_out(self, mean, distribution):
+        """
+        Number of children for one ticket, averaging mean.
+        """
+        if mean <= 0:
+            return 0
+        if distribution == 'fixed':
+            # Exact mean over many tickets, e.g. 2.5 -> 2 or 3
+            return int(mean) + (self.rng.random() < mean - int(mean))
+        if distribution == 'geometric':
+            # Long tail: most tickets get few comments, a few get many
+            p = 1 / (mean + 1)
+            return int(math.log(1 - self.rng.random()) / math.log(1 - p))
+        # Poisson, by multiplying uniforms (fine for small means)
+        limit, count, product = math.exp(-mean), 0, self.rng.random()
+        while product > limit:
+            count += 1
+            product *= self.rng.random()
+        return count
@@ -0,0 +1,106 @@
+"""
+JSON shapes of tickets, comments and attachments, shared by the sync and
+async API views so both return exactly the same payloads.
+"""
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def serialize_ticket_row(ticket):
+    """
+    Serialize a ticket as listed by get_tickets_api.
+    """
+    return {
+        'id': ticket.id,
+        'subject': ticket.subject,
+        'description': ticket.description,
+        'status': ticket.status,
+        'priority': ticket.priority,
+        'department': ticket.department,
+        'created_by': ticket.created_by.username,
+        'assigned_to': ticket.assigned_to.username if ticket.assigned_to else None,
+        'created_at': ticket.created_at.isoformat(),
+        'updated_at': ticket.updated_at.isoformat(),
+        'comments_count': ticket.comments_count,
+        'attachments_count': ticket.attachments_count,
+    }
+
+
+def serialize_ticket_detail(ticket):
+    """
+    Serialize a ticket for get_ticket_detail_api, without its comments and
+    attachments. created_by and assigned_to must be loaded.
+    """
+    return {
+        'id': ticket.id,
+        'subject': ticket.subject,
+        'description': ticket.description,
+        'status': ticket.status,
+        'priority': ticket.priority,
+        'department': ticket.department,
+        'created_by': {
+            'id': ticket.created_by.id,
+            'username': ticket.created_by.username,
+            'email': ticket.created_by.email,
+        },
+        'assigned_to': {
+            'id': ticket.assigned_to.id,
+            'username': ticket.assigned_to.username,
+            'email': ticket.assigned_to.email,
+        } if ticket.assigned_to else None,
+        'created_at': ticket.created_at.isoformat(),
+        'updated_at': ticket.updated_at.isoformat(),
+        'sla': {
+            'first_response_at': _isoformat(ticket.first_response_at),
+            'resolved_at': _isoformat(ticket.resolved_at),
+            'due_at': _isoformat(ticket.sla_due_at),
+            'escalated_at': _isoformat(ticket.sla_escalated_at),
+        },
+    }
+
+
+def serialize_comment(comment):
+    """
+    Serialize a comment with its author (which must be loaded).
+    """
+    return {
+        'id': comment.id,
+        'content': comment.content,
+        'author': {
+            'id': comment.author.id,
+            'username': comment.author.username,
+        },
+        'created_at': comment.created_at.isoformat(),
+        'is_internal': comment.is_internal,
+    }
+
+
+def serialize_attachment(attachment):
+    """
+    Serialize an attachment with its uploader (which must be loaded).
+    """
+    return {
+        'id': attachment.id,
+        'filename': attachment.filename,
+        'file_type': attachment.file_type,
+        'file_size': attachment.file_size,
+        'uploaded_by': attachment.uploaded_by.username,
+        'uploaded_at': attachment.uploaded_at.isoformat(),
+        'url': attachment.file.url if attachment.file else None,
+    }
+
+
+def serialize_search_result(ticket):
+    """
+    Serialize a ticket as returned by search_tickets_api.
+    """
+    return {
+        'id': ticket.id,
+        'subject': ticket.subject,
+        'status': ticket.status,
+        'priority': ticket.priority,
+        'created_by': ticket.created_by.username,
+        'created_at': ticket.created_at.isoformat(),
+    }
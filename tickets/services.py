@@ -0,0 +1,165 @@
+"""
+Ticket creation shared by the single and batch submission APIs.
+
+create_tickets() validates and routes every item first, then inserts all
+valid tickets with one bulk_create inside a transaction. bulk_create sends
+no model signals, so the work they would do (counters, history, search
+data, live events, cached responses) is done here once for the whole batch.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils.html import escape
+
+from .counters import record_ticket_changes, state_of
+from .events import publish_ticket_changes
+from .history import record_transitions
+from .models import Ticket
+from .response_cache import bump_version_on_commit
+from .routing import TicketRouter
+from .search import refresh_search_index
+from .sla import get_policies, sla_deadline
+from .workload import workload_ledger
+
+User = get_user_model()
+
+SUBJECT_MAX_LENGTH = 255
+DESCRIPTION_MAX_LENGTH = 2000
+PRIORITIES = [priority for priority, _ in Ticket.PRIORITY_CHOICES]
+
+
+def max_batch_size():
+    return getattr(settings, 'TICKET_BATCH_MAX_SIZE', 500)
+
+
+def clean_ticket_data(data, submitter, creators):
+    """
+    Validate one submitted ticket.
+
+    Returns (fields, errors): the Ticket field values, or a dict of
+    field name -> message when the item is invalid. Staff may submit on
+    behalf of another user with ``created_by_id``; creators maps the ids
+    submitted in the batch to users.
+    """
+    if not isinstance(data, dict):
+        return None, {'ticket': 'Expected an object'}
+
+    errors = {}
+    subject = data.get('subject')
+    description = data.get('description')
+    if not subject or not isinstance(subject, str):
+        errors['subject'] = 'Subject is required'
+    if not description or not isinstance(description, str):
+        errors['description'] = 'Description is required'
+    if not errors:
+        # Sanitize input, limiting length
+        subject = escape(subject[:SUBJECT_MAX_LENGTH])
+        description = escape(description[:DESCRIPTION_MAX_LENGTH])
+        if len(subject) > SUBJECT_MAX_LENGTH:
+            errors['subject'] = f'Subject is too long once escaped (max {SUBJECT_MAX_LENGTH} characters)'
+
+    priority = data.get('priority', 'medium')
+    if priority not in PRIORITIES:
+        errors['priority'] = f'Invalid priority; expected one of {", ".join(PRIORITIES)}'
+
+    department = data.get('department', '')
+    if not isinstance(department, str):
+        errors['department'] = 'Department must be a string'
+
+    created_by = submitter
+    if data.get('created_by_id') is not None:
+        if not submitter.is_staff:
+            errors['created_by_id'] = 'Only staff can submit tickets for other users'
+        else:
+            created_by = creators.get(data['created_by_id'])
+            if created_by is None:
+                errors['created_by_id'] = 'Unknown user'
+
+    if errors:
+        return None, errors
+    return {
+        'subject': subject,
+        'description': description,
+        'priority': priority,
+        'department': department,
+        'created_by': created_by,
+    }, None
+
+
+def create_tickets(submitter, items, all_or_nothing=False):
+    """
+    Validate, route and insert tickets submitted by submitter.
+
+    Tickets created by non-staff users are routed like single submissions:
+    department from the keywords, least loaded assignee, "in_progress"
+    once assigned. Invalid items are skipped, or with all_or_nothing
+    nothing is inserted if any item is invalid.
+
+    Returns one result per item, in order: {'index', 'success', and either
+    'ticket' (the created Ticket) or 'errors'}.
+    """
+    creator_ids = {
+        item['created_by_id'] for item in items
+        if isinstance(item, dict) and isinstance(item.get('created_by_id'), int)
+    }
+    creators = User.objects.in_bulk(creator_ids) if creator_ids and submitter.is_staff else {}
+
+    results = []
+    tickets = []
+    for index, data in enumerate(items):
+        fields, errors = clean_ticket_data(data, submitter, creators)
+        if errors:
+            results.append({'index': index, 'success': False, 'errors': errors})
+            continue
+        ticket = Ticket(**fields)
+        results.append({'index': index, 'success': True, 'ticket': ticket})
+        tickets.append(ticket)
+
+    if all_or_nothing and len(tickets) < len(items):
+        for result in results:
+            if result['success']:
+                del result['ticket']
+                result.update(success=False, errors={'ticket': 'Not created: other tickets in the batch are invalid'})
+        return results
+
+    # Route before inserting so each ticket is written once. Each pick is
+    # recorded straight away so the rest of the batch sees the new load.
+    routed = []
+    for ticket in tickets:
+        if ticket.created_by.is_staff:
+            continue
+        department, assigned_user = TicketRouter.route_ticket(ticket)
+        if department:
+            ticket.department = department
+        if assigned_user:
+            ticket.assigned_to = assigned_user
+            ticket.status = 'in_progress'
+            workload_ledger.record_change(None, None, assigned_user.id, ticket.status)
+            routed.append(ticket)
+
+    # bulk_create skips the pre_save handler that starts the SLA clock
+    policies = get_policies()
+    for ticket in tickets:
+        ticket.sla_due_at = sla_deadline(ticket, policies)
+
+    try:
+        with transaction.atomic():
+            Ticket.objects.bulk_create(tickets)
+            # bulk_create sends no signals; do what they would have done
+            states = [(ticket.pk, state_of(ticket)) for ticket in tickets]
+            record_ticket_changes([(None, state) for _, state in states])
+            refresh_search_index([pk for pk, _ in states])
+            record_transitions([(pk, None, state) for pk, state in states], submitter)
+            publish_ticket_changes([(pk, None, state) for pk, state in states])
+            bump_version_on_commit('tickets')
+    except Exception:
+        # Nothing was created; give the routed assignees their load back
+        workload_ledger.record_changes(
+            (ticket.assigned_to_id, ticket.status, None, None) for ticket in routed
+        )
+        raise
+
+    for ticket in tickets:
+        # Fresh snapshot for the signal handlers if the ticket is saved later
+        ticket._search_text = (ticket.subject, ticket.description)
+    return results
@@ -0,0 +1,158 @@
+"""
+Model signal handlers for the tickets app.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .counters import STATE_FIELDS, TicketState, record_ticket_changes, state_of
+from .events import publish_comment, publish_ticket_changes
+from .history import attribution, pop_attribution, record_transitions
+from .models import RoutingKeyword, RoutingRule, SLAPolicy, Ticket, TicketAttachment, TicketComment
+from .response_cache import bump_version_on_commit
+from .routing import rules_changed, touch_rule
+from .search import refresh_search_index
+from .sla import loaded_sla, policies_changed, record_first_response, update_sla
+from .workload import workload_ledger
+
+
+def _stored_state(ticket, lock=False):
+    tickets = Ticket.objects.select_for_update() if lock else Ticket.objects
+    row = tickets.filter(pk=ticket.pk).values_list(*STATE_FIELDS).first()
+    return TicketState(*row) if row else None
+
+
+@receiver(post_init, sender=Ticket)
+def remember_ticket_state(sender, instance, **kwargs):
+    # Snapshot as loaded so the next save knows what changed
+    instance._sla_state = loaded_sla(instance)
+    instance._search_text = (instance.__dict__.get('subject'), instance.__dict__.get('description'))
+
+
+@receiver(pre_save, sender=Ticket)
+@receiver(pre_delete, sender=Ticket)
+def load_ticket_state(sender, instance, **kwargs):
+    # The row being replaced, not the state the instance was loaded with:
+    # another save may have changed it since. Locked until the save (or
+    # delete) commits, so concurrent saves apply their changes in turn.
+    instance._counter_state = _stored_state(instance, lock=True) if instance.pk else None
+
+
+@receiver(pre_save, sender=Ticket)
+def track_sla(sender, instance, raw=False, **kwargs):
+    # Runs after load_ticket_state, so the loaded status is known
+    if not raw:
+        old_state = instance._counter_state
+        actor, _ = attribution(instance)
+        update_sla(instance, old_state.status if old_state else None, actor, instance._sla_state)
+        instance._sla_state = loaded_sla(instance)
+
+
+@receiver(post_save, sender=Ticket)
+def record_ticket_change(sender, instance, created, raw=False, **kwargs):
+    # Counters, history and live events all need the state before this save
+    if raw:
+        return
+    old_state = None if created else instance._counter_state
+    new_state = state_of(instance) or _stored_state(instance)
+    record_ticket_changes([(old_state, new_state)])
+    actor, reason = pop_attribution(instance)
+    record_transitions([(instance.pk, old_state, new_state)], actor, reason)
+    publish_ticket_changes([(instance.pk, old_state, new_state)])
+
+
+@receiver(post_delete, sender=Ticket)
+def record_ticket_removal(sender, instance, **kwargs):
+    record_ticket_changes([(instance._counter_state, None)])
+    publish_ticket_changes([(instance.pk, instance._counter_state, None)])
+
+
+@receiver(post_save, sender=Ticket)
+def update_ticket_search(sender, instance, created, raw=False, **kwargs):
+    search_text = (instance.__dict__.get('subject'), instance.__dict__.get('description'))
+    if not raw and (created or search_text != instance._search_text):
+        refresh_search_index([instance.pk])
+    instance._search_text = search_text
+
+
+@receiver(post_delete, sender=Ticket)
+def remove_ticket_from_search(sender, instance, **kwargs):
+    refresh_search_index([instance.pk])
+
+
+@receiver(post_save, sender=TicketComment)
+@receiver(post_delete, sender=TicketComment)
+def update_comment_search(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_search_index([instance.ticket_id])
+
+
+@receiver(post_save, sender=TicketComment)
+def announce_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        # The ticket is usually cached on the comment; otherwise one query
+        ticket = instance.ticket
+        publish_comment(instance, state_of(ticket) or _stored_state(ticket))
+
+
+@receiver(post_save, sender=TicketComment)
+def track_first_response(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_first_response(instance)
+
+
+@receiver(post_save, sender=SLAPolicy)
+@receiver(post_delete, sender=SLAPolicy)
+def reschedule_sla(sender, **kwargs):
+    transaction.on_commit(policies_changed)
+
+
+@receiver(post_save, sender=RoutingKeyword)
+@receiver(post_delete, sender=RoutingKeyword)
+def touch_routing_rule(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch_rule(instance.rule_id)
+
+
+@receiver(post_save, sender=RoutingRule)
+@receiver(post_delete, sender=RoutingRule)
+@receiver(post_save, sender=RoutingKeyword)
+@receiver(post_delete, sender=RoutingKeyword)
+def recompile_routing_rules(sender, raw=False, **kwargs):
+    # Workers compare the rules with the database once the version moves
+    if not raw:
+        rules_changed()
+
+
+@receiver(post_save, sender=TicketComment)
+@receiver(post_delete, sender=TicketComment)
+@receiver(post_save, sender=TicketAttachment)
+@receiver(post_delete, sender=TicketAttachment)
+def touch_ticket_activity(sender, instance, raw=False, **kwargs):
+    # New, edited or removed comments/attachments change the ticket's ETag
+    if not raw:
+        Ticket.objects.filter(pk=instance.ticket_id).update(last_activity_at=timezone.now())
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_delete, sender=Ticket)
+def invalidate_ticket_responses(sender, **kwargs):
+    bump_version_on_commit('tickets')
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_user_responses(sender, update_fields=None, **kwargs):
+    # Logins only touch last_login, which no cached response includes
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        bump_version_on_commit('users')
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def refresh_assignee_pools(sender, update_fields=None, **kwargs):
+    # Deactivated users or users who changed department must not be picked
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        workload_ledger.users_changed()
@@ -0,0 +1,296 @@
+"""
+SLA timers and breach detection.
+
+Each priority has an SLAPolicy: minutes from creation until a first
+response is due, and until the ticket should be resolved. A ticket's
+sla_due_at holds the deadline of the target it has yet to meet (first
+response, then resolution) and is cleared once it is resolved or closed,
+so finding the tickets near or past breach is a range scan of a partial
+index rather than a pass over every open ticket.
+
+- update_sla() keeps the fields right on every save (from a pre_save
+  handler), from the stored row rather than the copy the instance
+  loaded; bulk updates and policy changes go through refresh_sla().
+- A first response is the first public comment, or status change, by
+  anyone other than the ticket's creator.
+- sweep() (the sla_sweep command) escalates tickets due within the
+  warning window once: they become urgent and go to the assignee
+  TicketRouter picks for urgent tickets, admins first.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DateTimeField, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .history import attribute_change
+from .models import SLAPolicy, Ticket, TicketComment
+from .response_cache import bump_version, cached_payload
+from .routing import TicketRouter
+from .workload import workload_ledger
+
+# Statuses that stop the clock
+DONE_STATUSES = ['resolved', 'closed']
+# Written by this module only; a plain Ticket.save() leaves them out
+SLA_FIELDS = ('first_response_at', 'sla_due_at', 'sla_escalated_at')
+WARNING_MINUTES = 30
+
+
+def get_policies():
+    """
+    Return {priority: (first response, resolution) timedeltas}, cached
+    until a policy changes.
+    """
+    minutes = cached_payload('sla_policies', ['sla'], None, lambda: {
+        priority: (first_response, resolution)
+        for priority, first_response, resolution in SLAPolicy.objects.values_list(
+            'priority', 'first_response_minutes', 'resolution_minutes'
+        )
+    })
+    return {
+        priority: (timedelta(minutes=first_response), timedelta(minutes=resolution))
+        for priority, (first_response, resolution) in minutes.items()
+    }
+
+
+def counts_as_response(created_by_id, actor):
+    return actor is not None and actor.pk != created_by_id
+
+
+def sla_deadline(ticket, policies=None):
+    """
+    Deadline of the next SLA target ticket has to meet, or None when it is
+    done or its priority has no policy.
+    """
+    if ticket.status in DONE_STATUSES:
+        return None
+    policy = (get_policies() if policies is None else policies).get(ticket.priority)
+    if policy is None:
+        return None
+    first_response, resolution = policy
+    start = ticket.created_at or timezone.now()
+    return start + (first_response if ticket.first_response_at is None else resolution)
+
+
+def loaded_sla(ticket):
+    """
+    The SLA fields of ticket as loaded (None for deferred ones), for
+    update_sla() to tell which were changed on the instance since.
+    """
+    return {field: ticket.__dict__.get(field) for field in SLA_FIELDS}
+
+
+def update_sla(ticket, old_status=None, actor=None, loaded=None):
+    """
+    Bring ticket's SLA fields up to date before it is saved. old_status is
+    its status as stored (None for a new ticket), actor whoever made the
+    change and loaded the fields as loaded_sla() took them.
+
+    For a stored ticket the fields are re-read under a row lock: ones not
+    changed on the instance take the stored values, since a first
+    response may have been recorded since it was loaded, and the result
+    is written here, as Ticket.save() leaves them out of a plain save.
+    """
+    stored = None
+    if old_status is not None:
+        stored = Ticket.objects.select_for_update().filter(pk=ticket.pk).values(*SLA_FIELDS).first()
+    if stored is not None:
+        for field in SLA_FIELDS:
+            if loaded is None or ticket.__dict__.get(field) == loaded[field]:
+                setattr(ticket, field, stored[field])
+
+    now = timezone.now()
+    if (
+        old_status is not None and old_status != ticket.status
+        and ticket.first_response_at is None
+        and counts_as_response(ticket.created_by_id, actor)
+    ):
+        ticket.first_response_at = now
+    if ticket.status in DONE_STATUSES:
+        ticket.resolved_at = ticket.resolved_at or now
+    else:
+        ticket.resolved_at = None
+    ticket.sla_due_at = sla_deadline(ticket)
+
+    if stored is not None:
+        changed = {field: getattr(ticket, field) for field in SLA_FIELDS if getattr(ticket, field) != stored[field]}
+        if changed:
+            Ticket.objects.filter(pk=ticket.pk).update(**changed)
+
+
+def record_first_response(comment):
+    """
+    Record comment as its ticket's first response if it is one.
+    """
+    ticket = comment.ticket
+    if (
+        ticket.first_response_at is not None or comment.is_internal
+        or comment.author_id == ticket.created_by_id
+    ):
+        return
+    # Also update the instance the caller may still save
+    ticket.first_response_at = comment.created_at
+    ticket.sla_due_at = sla_deadline(ticket)
+    Ticket.objects.filter(pk=ticket.pk, first_response_at__isnull=True).update(
+        first_response_at=ticket.first_response_at, sla_due_at=ticket.sla_due_at,
+    )
+
+
+def sla_due_expression(policies=None):
+    """
+    Expression computing sla_due_at from a ticket's own columns, usable
+    in update().
+    """
+    policies = get_policies() if policies is None else policies
+    deadlines = []
+    for priority, (first_response, resolution) in policies.items():
+        deadlines += [
+            When(priority=priority, first_response_at__isnull=True, then=F('created_at') + Value(first_response)),
+            When(priority=priority, then=F('created_at') + Value(resolution)),
+        ]
+    return Case(
+        When(status__in=DONE_STATUSES, then=Value(None)),
+        *deadlines,
+        default=Value(None),
+        output_field=DateTimeField(),
+    )
+
+
+def refresh_sla(tickets):
+    """
+    Recompute the deadlines of a queryset of tickets with one UPDATE.
+    """
+    return tickets.update(sla_due_at=sla_due_expression())
+
+
+def rebuild_sla():
+    """
+    Recompute every ticket's SLA fields from its status, comments and
+    timestamps, e.g. after bulk_create(), which bypasses update_sla().
+    Tickets resolved before are taken to have been resolved when last
+    updated.
+    """
+    first_reply = TicketComment.objects.filter(
+        ticket=OuterRef('pk'), is_internal=False,
+    ).exclude(author=OuterRef('created_by')).order_by('created_at').values('created_at')[:1]
+    Ticket.objects.update(
+        first_response_at=Coalesce(F('first_response_at'), Subquery(first_reply)),
+        resolved_at=Case(
+            When(status__in=DONE_STATUSES, then=Coalesce(F('resolved_at'), F('updated_at'))),
+            default=Value(None),
+            output_field=DateTimeField(),
+        ),
+    )
+    refresh_sla(Ticket.objects.all())
+
+
+def policies_changed():
+    """
+    Drop the cached policies and move every open ticket's deadline.
+    """
+    bump_version('sla')
+    refresh_sla(Ticket.objects.exclude(status__in=DONE_STATUSES))
+
+
+def bulk_sla_changes(changes):
+    """
+    Extra update() values keeping resolved_at right for a bulk update
+    setting changes.
+    """
+    if 'status' not in changes:
+        return {}
+    if changes['status'] in DONE_STATUSES:
+        return {'resolved_at': Coalesce(F('resolved_at'), Value(timezone.now()))}
+    return {'resolved_at': None}
+
+
+def record_bulk_changes(changes, actor=None):
+    """
+    After a bulk update of (ticket_id, old, new) TicketStates: record the
+    first responses it made and recompute the deadlines that moved.
+    """
+    moved = [
+        (ticket_id, old, new) for ticket_id, old, new in changes
+        if old.status != new.status or old.priority != new.priority
+    ]
+    if not moved:
+        return
+    responded = [
+        ticket_id for ticket_id, old, new in moved
+        if old.status != new.status and counts_as_response(old.created_by_id, actor)
+    ]
+    if responded:
+        Ticket.objects.filter(pk__in=responded, first_response_at__isnull=True).update(
+            first_response_at=timezone.now()
+        )
+    refresh_sla(Ticket.objects.filter(pk__in=[ticket_id for ticket_id, _, _ in moved]))
+
+
+def warning_window():
+    return timedelta(minutes=getattr(settings, 'TICKET_SLA_WARNING_MINUTES', WARNING_MINUTES))
+
+
+def due_for_escalation(now=None, warning=None):
+    """
+    Unescalated tickets whose deadline is past or within warning of now,
+    most overdue first.
+    """
+    now = now or timezone.now()
+    warning = warning_window() if warning is None else warning
+    return Ticket.objects.filter(
+        sla_due_at__lte=now + warning, sla_escalated_at__isnull=True,
+    ).order_by('sla_due_at', 'pk')
+
+
+def escalate(ticket, now=None):
+    """
+    Make ticket urgent and hand it to the best urgent assignee for its
+    department; it keeps its assignee if nobody is available. Returns
+    whether the deadline had already passed.
+    """
+    now = now or timezone.now()
+    old_assignee_id, old_status = ticket.assigned_to_id, ticket.status
+    breached = ticket.sla_due_at <= now
+
+    ticket.priority = 'urgent'
+    assignee = TicketRouter._find_assignee(ticket.department or 'IT', 'urgent')
+    if assignee:
+        ticket.assigned_to = assignee
+        if ticket.status == 'open':
+            ticket.status = 'in_progress'
+    ticket.sla_escalated_at = now
+    attribute_change(ticket, None, reason='sla_breached' if breached else 'sla_at_risk')
+    ticket.save()
+    workload_ledger.record_change(old_assignee_id, old_status, ticket.assigned_to_id, ticket.status)
+    return breached
+
+
+def sweep(now=None, warning=None, limit=None, dry_run=False):
+    """
+    Escalate the tickets due_for_escalation(). Returns (ticket, breached)
+    pairs for the tickets escalated (or, with dry_run, that would be).
+
+    Each ticket is locked and re-checked before it is escalated, so
+    sweepers running side by side never escalate a ticket twice.
+    """
+    now = now or timezone.now()
+    warning = warning_window() if warning is None else warning
+    tickets = due_for_escalation(now, warning)
+    if limit:
+        tickets = tickets[:limit]
+
+    escalated = []
+    for ticket in tickets:
+        if dry_run:
+            escalated.append((ticket, ticket.sla_due_at <= now))
+            continue
+        with transaction.atomic():
+            # Skip tickets another sweeper holds or that changed since
+            ticket = due_for_escalation(now, warning).select_for_update(skip_locked=True).filter(
+                pk=ticket.pk
+            ).first()
+            if ticket is not None:
+                escalated.append((ticket, escalate(ticket, now)))
+    return escalated
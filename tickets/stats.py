@@ -0,0 +1,106 @@
+"""
+Ticket statistics shared by the dashboard and the stats API.
+
+Status and priority breakdowns are read from the TicketCounter and
+TicketUserCounter rollups (see tickets.counters); only the time-based
+"today" figures are counted from the tickets table.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Ticket, TicketCounter, TicketUserCounter
+
+
+def today_range():
+    """
+    Return the (start, end) datetimes of the current day in the active
+    time zone, for index-friendly range filters instead of ``__date``.
+    """
+    today = timezone.localdate()
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(today, time.min), tz)
+    end = timezone.make_aware(datetime.combine(today + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def _rollup_rows(user):
+    if user is None:
+        return TicketCounter.objects.values('status', 'priority').annotate(count=Sum('count'))
+    return TicketUserCounter.objects.filter(user=user)
+
+
+def _tally(user, relation):
+    """
+    Return (stats, add) where add(row) folds one _rollup_rows() row in.
+    """
+    stats = {status: 0 for status, _ in Ticket.STATUS_CHOICES}
+    stats.update(urgent=0, total=0)
+    if user is not None:
+        stats.update(my_tickets=0, assigned_to_me=0)
+
+    def count(status, priority, n):
+        stats[status] += n
+        stats['total'] += n
+        if priority == 'urgent' and status in Ticket.ACTIVE_STATUSES:
+            stats['urgent'] += n
+
+    def add(row):
+        if user is None:
+            count(row['status'], row['priority'], row['count'])
+        else:
+            count(row.status, row.priority, getattr(row, relation))
+            stats['my_tickets'] += row.created
+            stats['assigned_to_me'] += row.assigned
+
+    return stats, add
+
+
+def rollup_stats(user=None, relation='involved'):
+    """
+    Count tickets per status, plus urgent and total, from the counters.
+
+    Without user the counts cover all tickets. With user they cover the
+    tickets the user is involved in (created or is assigned), or only those
+    they created / are assigned with relation='created' / 'assigned', and
+    my_tickets and assigned_to_me are added.
+    """
+    stats, add = _tally(user, relation)
+    for row in _rollup_rows(user):
+        add(row)
+    return stats
+
+
+async def arollup_stats(user=None, relation='involved'):
+    """
+    Async version of rollup_stats().
+    """
+    stats, add = _tally(user, relation)
+    async for row in _rollup_rows(user):
+        add(row)
+    return stats
+
+
+def _today_counts():
+    start, end = today_range()
+    return {
+        'created_today': Count('id', filter=Q(created_at__gte=start, created_at__lt=end)),
+        'resolved_today': Count('id', filter=Q(
+            status='resolved', updated_at__gte=start, updated_at__lt=end
+        )),
+    }
+
+
+def today_stats(tickets):
+    """
+    Count the given tickets created today and resolved today in one query.
+    """
+    return tickets.order_by().aggregate(**_today_counts())
+
+
+async def atoday_stats(tickets):
+    """
+    Async version of today_stats().
+    """
+    return await tickets.order_by().aaggregate(**_today_counts())
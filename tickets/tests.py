@@ -0,0 +1,1441 @@
+import csv
+import gzip
+import importlib
+import json
+import random
+import re
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.management.base import OutputWrapper
+from django.db import connection, transaction
+from django.db.models import Q
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ticketing_system.instrumentation import RequestMetricsMiddleware, metrics_registry
+from users.models import CustomUser
+
+from .analytics import WATERMARK_OVERLAP, last_updated, update_rollups
+from .counters import find_discrepancies
+from .events import EVENT_QUEUE_SIZE, InProcessBroker, event_stream
+from .history import attribute_change
+from .exports import _run_export_job, export_timeout
+from .index_checks import SUPPORTED_VENDORS, explain_hot_queries, seed_tickets
+from .management.commands import benchmark_tickets
+from .models import (
+    ExportJob, RoutingKeyword, RoutingRule, Ticket, TicketActivityRollup, TicketAttachment, TicketComment,
+    TicketEvent,
+)
+from .response_cache import LOCAL_RESPONSE_TIMEOUT, RESPONSE_TIMEOUT, cache_is_shared, response_timeout
+from .replay import numpy_available, replay_routing
+from .routing import KeywordMatcher, TicketRouter
+from .search import search_tickets
+from .seeding import TicketSeeder
+from .sla import escalate, sweep
+from .workload import workload_ledger
+
+
+def make_user(username, role='student', department=None, **fields):
+    return CustomUser.objects.create_user(
+        username=username, email=f'{username}@example.com', password=None,
+        role=role, department=department, **fields,
+    )
+
+
+def findall_scores(rules, text):
+    """
+    Department scores as routing computed them before KeywordMatcher: one
+    findall() per keyword.
+    """
+    scores = {}
+    for dept_name, dept_rules in rules.items():
+        score = sum(
+            len(re.findall(r'\b' + re.escape(keyword) + r'\b', text))
+            for keyword in dept_rules['keywords']
+        )
+        if score > 0:
+            scores[dept_name] = score
+    return scores
+
+
+class KeywordMatcherParityTests(SimpleTestCase):
+    """KeywordMatcher must score exactly like the per-keyword findall() scan."""
+
+    rules = TicketRouter.ROUTING_RULES
+
+    def assertParity(self, rules, text):
+        self.assertEqual(KeywordMatcher(rules).score(text), findall_scores(rules, text), text)
+
+    def test_built_in_rules(self):
+        for text in [
+            'i forgot my password and cannot login to the portal',
+            'tuition payment receipt for the refund of my fee',
+            'need my transcript and enrollment certificate from the registrar',
+            'alumni database update for a graduate',
+            'nothing relevant here',
+            '',
+        ]:
+            self.assertParity(self.rules, text)
+
+    def test_shared_prefix_keywords(self):
+        # 'financial' and 'financial aid' both count, in two departments
+        for text in [
+            'financial aid',
+            'financial aid and financial records',
+            'financial aidx is not financial aid',
+            'scholarship application status for the scholarship',
+            'alumni contact, alumni information and the alumni update',
+            'student records and student record requests',
+        ]:
+            self.assertParity(self.rules, text)
+
+    def test_repeated_and_overlapping_hits(self):
+        rules = {
+            'A': {'keywords': ['aa', 'a a', 'a'], 'department': 'A'},
+            'B': {'keywords': ['a a a', 'aa aa'], 'department': 'B'},
+        }
+        for text in ['a a a a a', 'aa aa aa', 'a aa a aa a', 'aaa a-a a.a', 'a' * 50]:
+            self.assertParity(rules, text)
+
+    def test_custom_rules(self):
+        rules = {
+            'Library': {'keywords': ['book', 'books', 'book loan', 'late fee', 'e-book'], 'department': 'Library'},
+            'Finance': {'keywords': ['fee', 'late fee', 'c++ course', 'fee.'], 'department': 'Finance'},
+            'Empty': {'keywords': [], 'department': 'Empty'},
+        }
+        for text in [
+            'my book loan has a late fee',
+            'e-book books book. book-loan',
+            'the c++ course fee. is due',
+            'fee fee. fee.fee',
+        ]:
+            self.assertParity(rules, text)
+
+    def test_randomised_texts(self):
+        rng = random.Random(1)
+        keywords = [keyword for rule in self.rules.values() for keyword in rule['keywords']]
+        words = keywords + ['the', 'my', 'a', 'x', 'financial', 'aid', 'student', 'record']
+        separators = [' ', ' ', ', ', '.', '-', '']
+        for _ in range(500):
+            text = ''.join(rng.choice(words) + rng.choice(separators) for _ in range(rng.randrange(1, 30)))
+            self.assertParity(self.rules, text)
+
+    def test_no_keywords(self):
+        self.assertEqual(KeywordMatcher({}).score('password'), {})
+        self.assertEqual(KeywordMatcher({'A': {'keywords': [], 'department': 'A'}}).score('a'), {})
+
+
+class AssigneeQueryCountTests(TestCase):
+    """Picking an assignee costs the same queries whatever the department size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        requester = make_user('requester')
+        cls.registrar = [make_user(f'registrar{i}', 'staff', 'registrar') for i in range(2)]
+        cls.academic = [make_user(f'academic{i}', 'faculty', 'academic_affairs') for i in range(40)]
+        for i, user in enumerate(cls.academic):
+            for _ in range(i % 3):
+                Ticket.objects.create(
+                    subject='Exam', description='Grade', created_by=requester, assigned_to=user,
+                )
+
+    def setUp(self):
+        cache.clear()
+        workload_ledger.reconcile()
+        TicketRouter.compile_rules()
+
+    def assignee_queries(self, department, priority='medium'):
+        workload_ledger.reconcile()
+        with CaptureQueriesContext(connection) as context:
+            assignee = TicketRouter._find_assignee(department, priority)
+        return assignee, len(context.captured_queries)
+
+    def test_small_and_large_departments(self):
+        registrar, small = self.assignee_queries('Registrar')
+        academic, large = self.assignee_queries('Academic Affairs')
+        self.assertEqual(small, large)
+        self.assertEqual(small, 1)
+        self.assertIn(registrar, self.registrar)
+        # Least loaded first: every third academic has no tickets
+        self.assertEqual(academic, self.academic[0])
+
+    def test_urgent_and_repeat_picks(self):
+        self.assignee_queries('Academic Affairs', 'urgent')
+        # The pool is reused until the ledger reconciles
+        with self.assertNumQueries(0):
+            TicketRouter._find_assignee('Academic Affairs', 'urgent')
+
+    def test_route_ticket(self):
+        for subject in ['Transcript request for my diploma', 'Exam grade for my course']:
+            workload_ledger.reconcile()
+            with self.assertNumQueries(1):
+                TicketRouter.route_ticket(Ticket(subject=subject, description='', priority='medium'))
+
+
+class WorkloadLedgerTests(TestCase):
+    """The ledger's cached pools must follow changes to the candidate users."""
+
+    def setUp(self):
+        cache.clear()
+        workload_ledger.reconcile()
+        self.user = make_user('registrar', 'staff', 'registrar')
+
+    def test_deactivated_user_is_not_picked(self):
+        self.assertEqual(TicketRouter._find_assignee('Registrar'), self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertIsNone(TicketRouter._find_assignee('Registrar'))
+
+    def test_user_moving_department(self):
+        self.assertEqual(TicketRouter._find_assignee('Registrar'), self.user)
+        self.assertIsNone(TicketRouter._find_assignee('Scholarship'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.department = 'scholarship'
+            self.user.save()
+        self.assertIsNone(TicketRouter._find_assignee('Registrar'))
+        self.assertEqual(TicketRouter._find_assignee('Scholarship'), self.user)
+
+    def test_logins_keep_the_pools(self):
+        TicketRouter._find_assignee('Registrar')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            TicketRouter._find_assignee('Registrar')
+
+
+class TicketListQueryCountTests(TestCase):
+    """A page of the tickets API costs the same queries whatever its size."""
+
+    # Session, user, the ETag aggregate, the count and the page
+    PAGE_QUERIES = 5
+    # Cursor pages skip the count
+    CURSOR_QUERIES = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user('staff', 'staff', 'it', is_staff=True)
+        cls.student = make_user('student')
+        other = make_user('other')
+        assignees = [make_user(f'agent{i}', 'staff', 'it') for i in range(5)]
+        for i in range(120):
+            ticket = Ticket.objects.create(
+                subject=f'Ticket {i}', description='Cannot login', department='IT',
+                created_by=cls.student if i % 2 else other, assigned_to=assignees[i % 5] if i % 3 else None,
+            )
+            TicketComment.objects.create(ticket=ticket, author=cls.staff, content='Looking into it')
+
+    def assertListingQueries(self, queries, **params):
+        for user, visible in [(self.staff, 120), (self.student, 60)]:
+            self.client.force_login(user)
+            for per_page in [1, 5, 20, 100]:
+                with self.subTest(user=user.username, per_page=per_page), self.assertNumQueries(queries):
+                    response = self.client.get(
+                        reverse('tickets:get_tickets_api'), {'per_page': per_page, **params},
+                    )
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.json()['tickets']), min(per_page, visible))
+
+    def test_page_sizes(self):
+        self.assertListingQueries(self.PAGE_QUERIES)
+
+    def test_cursor_page_sizes(self):
+        self.assertListingQueries(self.CURSOR_QUERIES, cursor='')
+
+    def test_filtered_pages(self):
+        self.assertListingQueries(self.PAGE_QUERIES, status='open', department='IT')
+
+
+class CounterTests(TestCase):
+    """Counters stay exact, and bulk changes update them set-based."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user('staff', 'staff', 'it', is_staff=True)
+        requesters = [make_user(f'requester{i}') for i in range(30)]
+        agents = [make_user(f'agent{i}', 'staff', 'it') for i in range(10)]
+        for i in range(120):
+            Ticket.objects.create(
+                subject=f'Ticket {i}', description='Cannot login', department=['IT', 'Registrar', ''][i % 3],
+                priority=['low', 'medium', 'high'][i % 3], created_by=requesters[i % 30],
+                assigned_to=agents[i % 10] if i % 2 else None,
+            )
+        cls.agent = agents[1]
+
+    def bulk_update(self, tickets, action, **data):
+        self.client.force_login(self.staff)
+        ticket_ids = list(tickets.values_list('pk', flat=True))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                reverse('tickets:bulk_update_tickets_api'),
+                json.dumps({'ticket_ids': ticket_ids, 'action': action, **data}),
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['updated_count'], len(ticket_ids))
+        return len(context.captured_queries)
+
+    def test_bulk_update_queries_do_not_grow(self):
+        small = self.bulk_update(Ticket.objects.order_by('pk')[:20], 'close')
+        large = self.bulk_update(Ticket.objects.order_by('pk')[20:80], 'close')
+        self.assertEqual(small, large)
+        small = self.bulk_update(Ticket.objects.order_by('pk')[:20], 'assign', assignee_id=self.agent.pk)
+        large = self.bulk_update(Ticket.objects.order_by('pk')[20:80], 'assign', assignee_id=self.agent.pk)
+        self.assertEqual(small, large)
+        self.assertEqual(find_discrepancies(), [])
+
+    def test_single_changes(self):
+        ticket = Ticket.objects.filter(assigned_to__isnull=False).first()
+        ticket.status = 'in_progress'
+        ticket.priority = 'urgent'
+        ticket.save()
+        ticket.assigned_to = None
+        ticket.department = 'Scholarship'
+        ticket.save()
+        Ticket.objects.filter(department='Registrar').first().delete()
+        self.assertEqual(find_discrepancies(), [])
+
+    def test_stale_instances(self):
+        # As two requests that loaded the ticket before either saved it
+        ticket = Ticket.objects.filter(assigned_to__isnull=False, status='open').first()
+        first, second = Ticket.objects.get(pk=ticket.pk), Ticket.objects.get(pk=ticket.pk)
+        first.status = 'on_hold'
+        first.save()
+        second.status = 'closed'
+        second.assigned_to = None
+        second.save()
+        stale = Ticket.objects.get(pk=ticket.pk)
+        Ticket.objects.get(pk=ticket.pk).delete()
+        stale.delete()
+        self.assertEqual(find_discrepancies(), [])
+
+    def test_deleted_user(self):
+        # The user's tickets and counters go with them
+        Ticket.objects.filter(assigned_to=self.agent).first().created_by.delete()
+        self.assertEqual(find_discrepancies(), [])
+
+
+class HotQueryIndexTests(TestCase):
+    """Every hot ticket query is planned on the index designed for it."""
+
+    def test_hot_queries_use_their_index(self):
+        if connection.vendor not in SUPPORTED_VENDORS:
+            self.skipTest(f'No plan checks for {connection.vendor}')
+        requester, assignee = seed_tickets(3000)
+        for name, plan, problem in explain_hot_queries(requester, assignee):
+            with self.subTest(query=name):
+                self.assertIsNone(problem, plan)
+
+    def test_check_command_exit_status(self):
+        if connection.vendor not in SUPPORTED_VENDORS:
+            self.skipTest(f'No plan checks for {connection.vendor}')
+        with self.assertRaisesMessage(CommandError, 'No requesters found'):
+            call_command('check_ticket_indexes', stdout=StringIO())
+
+        out = StringIO()
+        call_command('check_ticket_indexes', seed=3000, stdout=out)
+        self.assertIn('All hot ticket queries use an index', out.getvalue())
+        # The seeded rows are rolled back
+        self.assertFalse(Ticket.objects.exists())
+
+        scan = [('open tickets', 'SCAN tickets_ticket', 'scans the tickets table')]
+        target = 'tickets.management.commands.check_ticket_indexes.explain_hot_queries'
+        with mock.patch(target, return_value=scan):
+            with self.assertRaisesMessage(CommandError, '1 hot queries do not use their index: open tickets'):
+                call_command('check_ticket_indexes', seed=10, stdout=StringIO())
+
+
+class SearchVectorTests(TestCase):
+    """Saving a ticket never writes back the search_vector loaded with it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user('staff', 'staff', 'it', is_staff=True)
+        cls.student = make_user('student')
+        cls.ticket = Ticket.objects.create(subject='Portal', description='Cannot login', created_by=cls.student)
+
+    def test_save_leaves_search_vector_alone(self):
+        ticket = Ticket.objects.get(pk=self.ticket.pk)
+        ticket.status = 'in_progress'
+        with CaptureQueriesContext(connection) as context:
+            ticket.save()
+        updates = [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE "tickets_ticket"')]
+        self.assertTrue(updates)
+        self.assertNotIn('search_vector', updates[0])
+        self.assertEqual(Ticket.objects.get(pk=ticket.pk).status, 'in_progress')
+
+    def test_deferred_fields_stay_deferred(self):
+        ticket = Ticket.objects.only('pk', 'status').get(pk=self.ticket.pk)
+        ticket.status = 'on_hold'
+        ticket.save()
+        ticket = Ticket.objects.get(pk=self.ticket.pk)
+        self.assertEqual((ticket.status, ticket.subject), ('on_hold', 'Portal'))
+
+    def test_comment_then_status_change_stays_searchable(self):
+        # add_comment_api: the comment refreshes the search data, then the
+        # ticket loaded before it moves from open to in progress
+        self.client.force_login(self.staff)
+        response = self.client.post(
+            reverse('tickets:add_comment_api', args=[self.ticket.pk]),
+            json.dumps({'content': 'Reset the xylophone credentials'}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Ticket.objects.get(pk=self.ticket.pk).status, 'in_progress')
+        self.assertEqual(search_tickets(Ticket.objects.all(), 'xylophone'), [self.ticket])
+
+
+class ExportJobTests(TestCase):
+    """Export requests are validated, and jobs lost with their process end up failed."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('student')
+        Ticket.objects.create(subject='Portal', description='Cannot login', created_by=cls.user)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        media_root, export_root = tempfile.TemporaryDirectory(), tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.addCleanup(export_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name, TICKET_EXPORT_ROOT=export_root.name))
+
+    def queue(self, body):
+        return self.client.post(
+            reverse('tickets:export_tickets_csv'), json.dumps(body), content_type='application/json',
+        )
+
+    def test_invalid_requests(self):
+        for body in [[], 'csv', {'filters': []}, {'filters': 'open'}, {'filters': 3}, {'filters': {'status': ['open']}}]:
+            with self.subTest(body=body):
+                self.assertEqual(self.queue(body).status_code, 400)
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_export_runs(self):
+        response = self.queue({'format': 'jsonl', 'filters': {'status': 'open'}})
+        self.assertEqual(response.status_code, 202)
+        job = ExportJob.objects.get()
+        self.assertEqual(job.filters, {'status': 'open'})
+        _run_export_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_written), ('completed', 1))
+
+    def test_only_the_owner_downloads(self):
+        self.queue({'format': 'csv'})
+        job = ExportJob.objects.get()
+        _run_export_job(job.pk)
+        job.refresh_from_db()
+        # Stored outside MEDIA_ROOT, under a name that cannot be guessed
+        self.assertFalse(job.file.path.startswith(settings.MEDIA_ROOT))
+        self.assertTrue(job.file.path.startswith(settings.TICKET_EXPORT_ROOT))
+        self.assertNotRegex(job.file.name, rf'tickets_export_{job.pk}_\d+\.csv\.gz$')
+
+        url = reverse('tickets:download_export', args=[job.pk])
+        self.client.force_login(make_user('other'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Cannot login', gzip.decompress(b''.join(response.streaming_content)))
+
+    def test_stale_jobs_fail_when_read(self):
+        long_ago = timezone.now() - export_timeout() - timedelta(minutes=1)
+        queued = ExportJob.objects.create(user=self.user)
+        running = ExportJob.objects.create(user=self.user, status='running', started_at=long_ago, heartbeat_at=long_ago)
+        fresh = ExportJob.objects.create(user=self.user, status='running', heartbeat_at=timezone.now())
+        ExportJob.objects.filter(pk=queued.pk).update(created_at=long_ago)
+
+        for job, status in [(queued, 'failed'), (running, 'failed'), (fresh, 'running')]:
+            response = self.client.get(reverse('tickets:export_job_status_api', args=[job.pk]))
+            self.assertEqual(response.json()['status'], status)
+
+        # A lost job that reaches a worker after all is not run
+        _run_export_job(queued.pk)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'failed')
+
+
+class ResponseCacheTests(SimpleTestCase):
+    """Cached payloads outlive their version bumps only briefly without a shared cache."""
+
+    def test_per_process_cache_uses_short_timeout(self):
+        self.assertFalse(cache_is_shared())
+        self.assertEqual(response_timeout(), LOCAL_RESPONSE_TIMEOUT)
+        with self.settings(TICKET_LOCAL_RESPONSE_TIMEOUT=2):
+            self.assertEqual(response_timeout(), 2)
+
+    def test_shared_cache_uses_full_timeout(self):
+        with tempfile.TemporaryDirectory() as location, self.settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location,
+        }}):
+            self.assertTrue(cache_is_shared())
+            self.assertEqual(response_timeout(), RESPONSE_TIMEOUT)
+
+
+class TrendsPermissionTests(TestCase):
+    """The trends API checks for staff before answering a conditional GET."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user('staff', 'staff', 'it', is_staff=True)
+        cls.student = make_user('student')
+        Ticket.objects.create(subject='Portal', description='Cannot login', created_by=cls.student)
+        update_rollups(full=True)
+
+    def test_conditional_get(self):
+        url = reverse('tickets:get_ticket_trends_api')
+        self.client.force_login(self.staff)
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, headers={'if-modified-since': last_modified}).status_code, 304)
+
+        self.client.force_login(self.student)
+        response = self.client.get(url, headers={'if-modified-since': last_modified})
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('Last-Modified', response)
+
+
+class RollupTests(TestCase):
+    """Incremental rollup runs catch up to what a full rebuild computes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = make_user('student')
+        now = timezone.now()
+        for i in range(6):
+            ticket = Ticket.objects.create(
+                subject=f'Portal {i}', description='Cannot login', department='IT',
+                priority=['low', 'high'][i % 2], created_by=cls.student,
+            )
+            backdated = now - timedelta(days=i * 3, hours=i)
+            Ticket.objects.filter(pk=ticket.pk).update(created_at=backdated, last_activity_at=backdated)
+
+    def rollups(self):
+        return list(TicketActivityRollup.objects.order_by(
+            'granularity', 'bucket', 'department', 'priority',
+        ).values_list('granularity', 'bucket', 'department', 'priority', 'created', 'resolved'))
+
+    def test_incremental_matches_full(self):
+        full_counts = update_rollups(full=True)
+        watermark = last_updated()
+        self.assertEqual(sum(row[4] for row in self.rollups() if row[0] == TicketActivityRollup.DAY), 6)
+
+        Ticket.objects.create(subject='Wifi', description='Slow', priority='urgent', created_by=self.student)
+        old = Ticket.objects.order_by('created_at').first()
+        old.status = 'resolved'
+        old.save()
+        # Committed late with an earlier timestamp, still within the overlap
+        Ticket.objects.filter(subject='Portal 3').update(
+            department='Registrar', last_activity_at=watermark - WATERMARK_OVERLAP / 2,
+        )
+
+        counts = update_rollups()
+        self.assertLess(counts, full_counts)
+        self.assertGreater(last_updated(), watermark)
+        incremental = self.rollups()
+        update_rollups(full=True)
+        self.assertEqual(incremental, self.rollups())
+
+    def test_nothing_changed(self):
+        update_rollups(full=True)
+        before = self.rollups()
+        Ticket.objects.update(last_activity_at=last_updated() - 2 * WATERMARK_OVERLAP)
+        self.assertEqual(update_rollups(), (0, 0))
+        self.assertEqual(self.rollups(), before)
+
+
+class AsyncViewParityTests(TestCase):
+    """The async APIs answer exactly like their sync counterparts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user('staff', 'staff', 'it', is_staff=True)
+        cls.student = make_user('student')
+        other = make_user('other')
+        for i in range(30):
+            ticket = Ticket.objects.create(
+                subject=f'Portal login {i}', description='Cannot reset my password',
+                status=['open', 'in_progress', 'resolved'][i % 3], department='IT',
+                created_by=cls.student if i % 2 else other, assigned_to=cls.staff if i % 3 else None,
+            )
+            TicketComment.objects.create(ticket=ticket, author=cls.staff, content='Checking the portal')
+        cls.own_ticket = Ticket.objects.filter(created_by=cls.student).first()
+        cls.other_ticket = Ticket.objects.exclude(created_by=cls.student).first()
+
+    def setUp(self):
+        cache.clear()
+
+    def requests(self):
+        return [
+            ('get_tickets_api', [], {}),
+            ('get_tickets_api', [], {'page': 2, 'per_page': 5, 'status': 'open'}),
+            ('get_tickets_api', [], {'cursor': '', 'per_page': 5, 'include_count': 'true'}),
+            ('get_tickets_api', [], {'cursor': 'not-a-cursor'}),
+            ('get_ticket_stats_api', [], {}),
+            ('search_tickets_api', [], {'q': 'portal'}),
+            ('search_tickets_api', [], {'q': ''}),
+            ('get_ticket_detail_api', [self.own_ticket.pk], {}),
+            ('get_ticket_detail_api', [self.other_ticket.pk], {}),
+            ('get_ticket_detail_api', [0], {}),
+        ]
+
+    def get(self, name, args, params, **headers):
+        return self.client.get(reverse(f'tickets:{name}', args=args), params, headers=headers)
+
+    def test_same_responses(self):
+        for user in [self.staff, self.student]:
+            self.client.force_login(user)
+            for name, args, params in self.requests():
+                with self.subTest(user=user.username, view=name, args=args, params=params):
+                    sync = self.get(name, args, params)
+                    async_ = self.get(f'async_{name}', args, params)
+                    self.assertEqual(async_.status_code, sync.status_code)
+                    self.assertEqual(async_.get('ETag'), sync.get('ETag'))
+                    if sync['Content-Type'] == 'application/json':
+                        self.assertEqual(async_.json(), sync.json())
+                    else:
+                        self.assertEqual(async_.content, sync.content)
+
+    def test_same_conditional_responses(self):
+        for user in [self.staff, self.student]:
+            self.client.force_login(user)
+            for name, args, params in self.requests():
+                etag = self.get(name, args, params).get('ETag')
+                if etag is None:
+                    continue
+                with self.subTest(user=user.username, view=name, args=args, params=params):
+                    sync = self.get(name, args, params, if_none_match=etag)
+                    async_ = self.get(f'async_{name}', args, params, if_none_match=etag)
+                    self.assertEqual(sync.status_code, 304)
+                    self.assertEqual(async_.status_code, 304)
+                    self.assertEqual(async_.get('ETag'), etag)
+
+
+class TicketEventMigrationTests(TestCase):
+    """Migration 0008 converts only the system comments, and unapplying it restores them."""
+
+    migration = importlib.import_module('tickets.migrations.0008_ticket_events')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user('staff', 'staff', 'it', is_staff=True)
+        cls.student = make_user('student')
+        cls.ticket = Ticket.objects.create(subject='Portal', description='Cannot login', created_by=cls.student)
+
+    def comment(self, author, content, is_internal=False):
+        return TicketComment.objects.create(
+            ticket=self.ticket, author=author, content=content, is_internal=is_internal,
+        )
+
+    def comments(self):
+        return sorted(
+            (comment.author_id, comment.content, comment.is_internal, comment.created_at)
+            for comment in TicketComment.objects.all()
+        )
+
+    def test_round_trip(self):
+        system = [
+            self.comment(self.student, 'Status changed from "open" to "closed"', True),
+            self.comment(self.staff, 'Ticket assigned from "no one" to "staff"', True),
+            self.comment(self.staff, 'Changed department from IT to Registrar.'),
+            self.comment(self.staff, 'Ticket was re-routed to department: IT, assignee: staff.'),
+        ]
+        ordinary = [
+            # Not in the shapes the views wrote them in
+            self.comment(self.student, 'Changed department from IT to Registrar.'),
+            self.comment(self.staff, 'Changed assignment from my old laptop to the new one.'),
+            self.comment(self.staff, 'Status changed from "open" to "closed"'),
+            self.comment(self.student, 'Ticket unassigned from "staff"', True),
+        ]
+        TicketComment.objects.filter(pk=system[0].pk).update(created_at=timezone.now() - timedelta(days=3))
+        before = self.comments()
+        TicketEvent.objects.all().delete()
+
+        self.migration.comments_to_events(apps, connection.schema_editor())
+        self.assertEqual(
+            set(TicketComment.objects.values_list('pk', flat=True)), {comment.pk for comment in ordinary},
+        )
+        self.assertEqual(
+            sorted(TicketEvent.objects.values_list('code', flat=True)),
+            ['assigned', 'assigned', 'department_changed', 'department_changed', 'status_changed'],
+        )
+
+        self.migration.events_to_comments(apps, connection.schema_editor())
+        self.assertEqual(self.comments(), before)
+
+
+class SLATests(TestCase):
+    """SLA deadlines follow first responses and resolution, and the sweep escalates once."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user('admin', 'staff', 'it', is_staff=True)
+        cls.agent = make_user('agent', 'staff', 'it')
+        cls.student = make_user('student')
+
+    def setUp(self):
+        cache.clear()
+        workload_ledger.reconcile()
+        self.ticket = Ticket.objects.create(
+            subject='Portal', description='Cannot login', department='IT', created_by=self.student,
+        )
+
+    def reload(self):
+        return Ticket.objects.get(pk=self.ticket.pk)
+
+    def comment(self, author, is_internal=False):
+        return TicketComment.objects.create(
+            ticket=self.reload(), author=author, content='Looking into it', is_internal=is_internal,
+        )
+
+    def test_deadlines(self):
+        ticket = self.reload()
+        self.assertIsNone(ticket.first_response_at)
+        # Counted from just before created_at was set
+        self.assertAlmostEqual(ticket.sla_due_at, ticket.created_at + timedelta(hours=8), delta=timedelta(seconds=1))
+
+        # The creator's comments and internal notes are not responses
+        self.comment(self.student)
+        self.comment(self.agent, is_internal=True)
+        self.assertIsNone(self.reload().first_response_at)
+
+        comment = self.comment(self.agent)
+        ticket = self.reload()
+        self.assertEqual(ticket.first_response_at, comment.created_at)
+        self.assertEqual(ticket.sla_due_at, ticket.created_at + timedelta(days=3))
+
+        ticket.status = 'resolved'
+        ticket.save()
+        ticket = self.reload()
+        self.assertIsNotNone(ticket.resolved_at)
+        self.assertIsNone(ticket.sla_due_at)
+        ticket.status = 'open'
+        ticket.save()
+        ticket = self.reload()
+        self.assertIsNone(ticket.resolved_at)
+        self.assertEqual(ticket.sla_due_at, ticket.created_at + timedelta(days=3))
+
+    def test_status_change_by_staff_is_a_response(self):
+        ticket = self.reload()
+        attribute_change(ticket, self.student)
+        ticket.status = 'on_hold'
+        ticket.save()
+        self.assertIsNone(self.reload().first_response_at)
+
+        attribute_change(ticket, self.agent)
+        ticket.status = 'in_progress'
+        ticket.save()
+        self.assertIsNotNone(self.reload().first_response_at)
+
+    def test_stale_saves_keep_the_first_response(self):
+        stale = [self.reload() for _ in range(3)]
+        self.comment(self.agent)
+        answered = self.reload()
+
+        stale[0].status = 'in_progress'
+        stale[1].assigned_to = self.agent
+        stale[2].subject = 'Portal login'
+        for ticket in stale:
+            attribute_change(ticket, self.student)
+            ticket.save()
+            with self.subTest(ticket=ticket):
+                ticket = self.reload()
+                self.assertEqual(ticket.first_response_at, answered.first_response_at)
+                self.assertEqual(ticket.sla_due_at, ticket.created_at + timedelta(days=3))
+        self.assertEqual(sweep(now=self.ticket.created_at + timedelta(hours=9)), [])
+
+    def test_escalate(self):
+        ticket = self.reload()
+        now = ticket.created_at + timedelta(hours=9)
+        self.assertTrue(escalate(ticket, now))
+        ticket = self.reload()
+        self.assertEqual((ticket.priority, ticket.status, ticket.assigned_to), ('urgent', 'in_progress', self.admin))
+        self.assertEqual(ticket.sla_escalated_at, now)
+        event = ticket.events.get(code=TicketEvent.ASSIGNED)
+        self.assertEqual(event.payload['reason'], 'sla_breached')
+        self.assertIsNone(event.actor)
+
+    def test_sweep(self):
+        later = Ticket.objects.create(subject='Wifi', description='Slow', priority='low', created_by=self.student)
+        now = self.ticket.created_at + timedelta(hours=7, minutes=45)
+
+        self.assertEqual(sweep(now=now, dry_run=True), [(self.ticket, False)])
+        self.assertIsNone(self.reload().sla_escalated_at)
+        self.assertEqual(sweep(now=now), [(self.ticket, False)])
+        self.assertEqual(self.reload().events.get(code=TicketEvent.ASSIGNED).payload['reason'], 'sla_at_risk')
+        # Escalated tickets are not escalated again
+        self.assertEqual(sweep(now=now + timedelta(days=2)), [(later, True)])
+        self.assertEqual(sweep(now=now + timedelta(days=30)), [])
+
+
+class BatchSubmissionTests(TestCase):
+    """Batch submissions do what the skipped save() signals would, or nothing at all."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = make_user('student')
+        cls.agents = [make_user(f'agent{i}', 'staff', 'it') for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        workload_ledger.reconcile()
+        self.client.force_login(self.student)
+
+    def submit(self, items, **options):
+        return self.client.post(
+            reverse('tickets:submit_tickets_batch_api'),
+            json.dumps({'tickets': items, **options}), content_type='application/json',
+        )
+
+    def loads(self):
+        # Seeds the cached loads on first use
+        TicketRouter._find_assignee('IT')
+        return {agent.pk: cache.get(workload_ledger._key(agent.pk)) for agent in self.agents}
+
+    def assertLedgerMatchesDatabase(self):
+        self.assertEqual(self.loads(), {
+            agent.pk: agent.assigned_tickets.filter(status__in=Ticket.ACTIVE_STATUSES).count()
+            for agent in self.agents
+        })
+
+    def test_mixed_batch(self):
+        response = self.submit([
+            {'subject': 'Portal password', 'description': 'Cannot login to the portal'},
+            {'subject': '', 'description': 'No subject'},
+            'not a ticket',
+            {'subject': 'Wifi', 'description': 'No internet', 'priority': 'whenever'},
+            {'subject': 'Email account', 'description': 'Locked out of my email', 'priority': 'high'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['created_count'], data['failed_count']), (2, 3))
+        self.assertEqual([result['success'] for result in data['results']], [True, False, False, False, True])
+        self.assertEqual(
+            [sorted(result['errors']) for result in data['results'] if not result['success']],
+            [['subject'], ['ticket'], ['priority']],
+        )
+
+        tickets = Ticket.objects.filter(pk__in=[result['ticket_id'] for result in data['results'] if result['success']])
+        self.assertEqual(len(tickets), 2)
+        for ticket in tickets:
+            self.assertEqual((ticket.department, ticket.status), ('IT', 'in_progress'))
+            self.assertIn(ticket.assigned_to, self.agents)
+            self.assertEqual(list(ticket.events.values_list('code', flat=True)), [TicketEvent.CREATED])
+            self.assertIsNotNone(ticket.sla_due_at)
+        self.assertEqual(find_discrepancies(), [])
+        self.assertLedgerMatchesDatabase()
+
+    def test_all_or_nothing(self):
+        before = self.loads()
+        response = self.submit([
+            {'subject': 'Portal password', 'description': 'Cannot login to the portal'},
+            {'subject': 'Wifi'},
+        ], all_or_nothing=True)
+        self.assertEqual(response.json()['created_count'], 0)
+        self.assertEqual(response.json()['results'][0]['errors'], {
+            'ticket': 'Not created: other tickets in the batch are invalid',
+        })
+        self.assertFalse(Ticket.objects.exists())
+        self.assertEqual(self.loads(), before)
+
+    def test_failed_insert_rolls_back(self):
+        before = self.loads()
+        with mock.patch('tickets.services.record_transitions', side_effect=RuntimeError('disk full')):
+            response = self.submit([
+                {'subject': 'Portal password', 'description': 'Cannot login to the portal'},
+                {'subject': 'Email account', 'description': 'Locked out of my email'},
+            ], all_or_nothing=True)
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(Ticket.objects.exists())
+        self.assertEqual(find_discrepancies(), [])
+        self.assertEqual(self.loads(), before)
+
+
+class RoutingRuleReloadTests(TestCase):
+    """Edits to the routing rules reach route_ticket() without a restart or a manual recompile."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = {
+            code: make_user(f'{code}_staff', 'staff', code)
+            for code in ['it', 'registrar', 'finance', 'scholarship', 'academic_affairs', 'student_affairs', 'alumni_affairs']
+        }
+
+    def setUp(self):
+        cache.clear()
+        workload_ledger.reconcile()
+        # Start from this test's rules, not those another test compiled
+        TicketRouter.compile_rules()
+
+    def route(self, text):
+        department, assignee = TicketRouter.route_ticket(Ticket(subject=text, description='', priority='medium'))
+        return department, assignee and assignee.username
+
+    def committed(self):
+        # Rule edits announce themselves once their transaction commits
+        return self.captureOnCommitCallbacks(execute=True)
+
+    def test_keyword_edits(self):
+        self.assertEqual(self.route('The printer jammed'), ('IT', 'it_staff'))
+        with self.committed():
+            keyword = RoutingKeyword.objects.create(rule=RoutingRule.objects.get(department='registrar'), keyword='Printer')
+        self.assertEqual(self.route('The printer jammed'), ('Registrar', 'registrar_staff'))
+
+        with self.committed():
+            keyword.keyword = 'stapler'
+            keyword.save()
+        self.assertEqual(self.route('The printer jammed'), ('IT', 'it_staff'))
+        self.assertEqual(self.route('The stapler jammed'), ('Registrar', 'registrar_staff'))
+
+        with self.committed():
+            keyword.delete()
+        self.assertEqual(self.route('The stapler jammed'), ('IT', 'it_staff'))
+
+    def test_rule_edits(self):
+        text = 'Scholarship grant'
+        self.assertEqual(self.route(text), ('Scholarship', 'scholarship_staff'))
+        rule = RoutingRule.objects.get(department='scholarship')
+        with self.committed():
+            rule.is_active = False
+            rule.save()
+        self.assertEqual(self.route(text), ('Finance (Accounting)', 'finance_staff'))
+
+        with self.committed():
+            rule.is_active = True
+            rule.save()
+        self.assertEqual(self.route(text), ('Scholarship', 'scholarship_staff'))
+
+        with self.committed():
+            rule.delete()
+        self.assertEqual(self.route(text), ('Finance (Accounting)', 'finance_staff'))
+
+    def test_other_processes_follow_within_the_interval(self):
+        # Without a shared cache only the periodic check sees the change
+        RoutingRule.objects.filter(department='scholarship').update(is_active=False, updated_at=timezone.now())
+        self.assertEqual(self.route('Scholarship grant'), ('Scholarship', 'scholarship_staff'))
+        with mock.patch('tickets.routing.RULES_CHECK_INTERVAL', 0):
+            self.assertEqual(self.route('Scholarship grant'), ('Finance (Accounting)', 'finance_staff'))
+
+    def test_same_staff_as_the_built_in_rules(self):
+        texts = [
+            'Wifi password', 'Transcript of records', 'Tuition refund', 'Scholarship grant',
+            'Exam grade', 'Club counseling', 'Alumni database',
+        ]
+        database = [self.route(text) for text in texts]
+        self.assertEqual({assignee for _, assignee in database}, {user.username for user in self.staff.values()})
+        with self.committed():
+            RoutingRule.objects.all().delete()
+        self.assertEqual([self.route(text) for text in texts], database)
+
+
+class ReplayRoutingCommandTests(TestCase):
+    """replay_routing scores the history like route_ticket(), and needs numpy to."""
+
+    def test_replay(self):
+        if not numpy_available():
+            self.skipTest('numpy is not installed')
+        student = make_user('student')
+        for subject, department in [
+            ('Wifi password', 'IT'), ('Tuition refund', 'Finance (Accounting)'),
+            ('Exam grade', 'Registrar'), ('Hello', None),
+        ]:
+            Ticket.objects.create(subject=subject, description='', department=department, created_by=student)
+        TicketRouter.compile_rules()
+        report = replay_routing()
+        self.assertEqual((report.agreed, report.compared, report.unlabelled), (2, 3, 1))
+
+        out = StringIO()
+        call_command('replay_routing', stdout=out)
+        self.assertIn('Agreement 66.7% (2 of 3 tickets)', out.getvalue())
+
+    def test_without_numpy(self):
+        with mock.patch('tickets.management.commands.replay_routing.numpy_available', return_value=False):
+            with self.assertRaisesMessage(CommandError, 'replay_routing requires numpy'):
+                call_command('replay_routing')
+
+
+class TicketEventStreamTests(TestCase):
+    """Each stream carries only what its user may see, and says so when it lost events."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user('staff', 'staff', 'it', is_staff=True)
+        cls.student = make_user('student')
+        cls.other = make_user('other')
+        cls.agent = make_user('agent', 'staff', 'it')
+        cls.new_agent = make_user('new_agent', 'staff', 'it')
+
+    def published(self, action):
+        """Events published by action once it commits."""
+        events = []
+        broker = mock.Mock(publish=events.append)
+        with mock.patch('tickets.events.get_broker', return_value=broker), self.captureOnCommitCallbacks(execute=True):
+            action()
+        return events
+
+    def received(self, user, events):
+        """(type, ticket_id) of what user's stream relays of events."""
+        broker = InProcessBroker()
+
+        async def read():
+            stream = event_stream(user.pk, user.is_staff, heartbeat=0.01)
+            self.assertIn('event: ready', await anext(stream))
+            for event in events:
+                broker.publish(event)
+            received = []
+            # Everything published has been relayed once the stream idles
+            while (chunk := await anext(stream)) != ': heartbeat\n\n':
+                event = json.loads(chunk.split('data: ', 1)[1])
+                received.append((event['type'], event.get('ticket_id')))
+            await stream.aclose()
+            return received
+
+        with mock.patch('tickets.events.get_broker', return_value=broker):
+            return async_to_sync(read)()
+
+    def test_filtering(self):
+        mine = Ticket.objects.create(subject='Portal', description='Cannot login', created_by=self.student, assigned_to=self.agent)
+        theirs = Ticket.objects.create(subject='Wifi', description='Slow', created_by=self.other)
+
+        def changes():
+            for ticket in [mine, theirs]:
+                ticket.status = 'in_progress'
+                ticket.save()
+            TicketComment.objects.create(ticket=mine, author=self.agent, content='Checked the logs', is_internal=True)
+            TicketComment.objects.create(ticket=mine, author=self.agent, content='Try again now')
+            mine.assigned_to = self.new_agent
+            mine.save()
+
+        events = self.published(changes)
+        public = [
+            ('ticket.status', mine.pk), ('ticket.comment', mine.pk), ('ticket.assigned', mine.pk),
+        ]
+        self.assertEqual(self.received(self.staff, events), [(event['type'], event['ticket_id']) for event in events])
+        self.assertEqual(self.received(self.student, events), public)
+        # The previous assignee still hears that the ticket left them
+        self.assertEqual(self.received(self.agent, events), public)
+        self.assertEqual(self.received(self.new_agent, events), [('ticket.assigned', mine.pk)])
+        self.assertEqual(self.received(self.other, events), [('ticket.status', theirs.pk)])
+
+    def test_overflow_resyncs(self):
+        ticket = Ticket.objects.create(subject='Portal', description='Cannot login', created_by=self.student)
+
+        def changes():
+            for i in range(EVENT_QUEUE_SIZE + 1):
+                ticket.status = ['open', 'on_hold'][i % 2 == 0]
+                ticket.save()
+
+        events = self.published(changes)
+        self.assertEqual(len(events), EVENT_QUEUE_SIZE + 1)
+        received = self.received(self.student, events)
+        # Whatever was relayed before the backlog overflowed, then a resync
+        # in place of the events lost
+        self.assertEqual(received[-1], ('resync', None))
+        self.assertEqual(received[:-1], [('ticket.status', ticket.pk)] * (len(received) - 1))
+        self.assertLess(len(received), len(events))
+        self.assertEqual(self.received(self.student, events[:3]), [('ticket.status', ticket.pk)] * 3)
+
+
+class TicketStatsTests(TestCase):
+    """The stats API and dashboard match per-status COUNTs, in queries that do not grow with the tickets."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user('staff', 'staff', 'it', is_staff=True)
+        cls.student = make_user('student')
+        cls.agent = make_user('agent', 'staff', 'it')
+        other = make_user('other')
+        cls.make_tickets(60, [cls.student, other, cls.agent], [cls.agent, None])
+
+    @classmethod
+    def make_tickets(cls, count, creators, assignees):
+        rng = random.Random(count)
+        statuses = [status for status, _ in Ticket.STATUS_CHOICES]
+        priorities = [priority for priority, _ in Ticket.PRIORITY_CHOICES]
+        for i in range(count):
+            Ticket.objects.create(
+                subject=f'Ticket {i}', description='Cannot login', status=rng.choice(statuses),
+                priority=rng.choice(priorities), created_by=rng.choice(creators), assigned_to=rng.choice(assignees),
+            )
+
+    def expected(self, tickets, user=None):
+        # As the stats API counted before the rollups, one COUNT per figure
+        stats = {status: tickets.filter(status=status).count() for status, _ in Ticket.STATUS_CHOICES}
+        stats['urgent'] = tickets.filter(priority='urgent', status__in=['open', 'in_progress']).count()
+        stats['total'] = tickets.count()
+        if user is not None:
+            stats['my_tickets'] = Ticket.objects.filter(created_by=user).count()
+            stats['assigned_to_me'] = Ticket.objects.filter(assigned_to=user).count()
+        return stats
+
+    def stats(self, user):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('tickets:get_ticket_stats_api'))
+        return response.json(), len(context.captured_queries)
+
+    def test_stats_api(self):
+        staff, staff_queries = self.stats(self.staff)
+        self.assertEqual(staff, {**self.expected(Ticket.objects.all()), 'created_today': 60, 'resolved_today': staff['resolved']})
+        for user in [self.student, self.agent]:
+            with self.subTest(user=user.username):
+                mine = Ticket.objects.filter(Q(created_by=user) | Q(assigned_to=user))
+                self.assertEqual(self.stats(user)[0], self.expected(mine, user))
+        student_queries = self.stats(self.student)[1]
+
+        self.make_tickets(40, [self.student, self.agent], [self.agent, self.student, None])
+        self.assertEqual(self.stats(self.staff)[1], staff_queries)
+        self.assertEqual(self.stats(self.student)[1], student_queries)
+
+    def test_dashboard(self):
+        for user, tickets in [(self.staff, Ticket.objects.all()), (self.student, Ticket.objects.filter(created_by=self.student))]:
+            with self.subTest(user=user.username):
+                self.client.force_login(user)
+                context = self.client.get(reverse('dashboard:dashboard')).context
+                expected = self.expected(tickets)
+                self.assertEqual(context['open_tickets'], expected['open'])
+                self.assertEqual(context['in_progress_tickets'], expected['in_progress'])
+                self.assertEqual(context['resolved_tickets'], expected['resolved'] + expected['closed'])
+                self.assertEqual(context['urgent_tickets'], expected['urgent'])
+                self.assertEqual(context['resolved_today'], expected['resolved'])
+                self.assertEqual(list(context['latest_tickets']), list(tickets.order_by('-created_at')[:5]))
+
+
+class CSVExportTests(TestCase):
+    """The streamed CSV export is what the per-ticket export wrote, from one query."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user('staff', 'staff', 'it', is_staff=True)
+        cls.student = make_user('student')
+        cls.agent = make_user('agent', 'staff', 'it')
+        Ticket.objects.create(
+            subject='Portal, again', description='Says "denied"\non every login', department='IT',
+            status='in_progress', priority='high', created_by=cls.student, assigned_to=cls.agent,
+        )
+        Ticket.objects.create(subject='Wifi', description='Slow', created_by=cls.staff)
+        Ticket.objects.create(subject='Grades', description='Missing', created_by=cls.agent, assigned_to=cls.student)
+
+    def export(self, user):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('tickets:export_tickets_csv'))
+            content = b''.join(response.streaming_content).decode()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        return content, len(context.captured_queries)
+
+    def expected(self, tickets):
+        # Row by row, as the export was written before it streamed
+        lines = StringIO()
+        writer = csv.writer(lines)
+        writer.writerow([
+            'Ticket ID', 'Title', 'Description', 'Status', 'Priority',
+            'Creator', 'Assignee', 'Department', 'Created At', 'Updated At',
+        ])
+        for ticket in tickets.order_by('-created_at', '-id'):
+            writer.writerow([
+                ticket.id, ticket.subject, ticket.description, ticket.get_status_display(),
+                ticket.get_priority_display(), ticket.created_by.username,
+                ticket.assigned_to.username if ticket.assigned_to else 'Unassigned',
+                ticket.department or 'N/A',
+                ticket.created_at.strftime('%Y-%m-%d %H:%M:%S'), ticket.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
+            ])
+        return lines.getvalue()
+
+    def test_same_output(self):
+        self.assertEqual(self.export(self.staff)[0], self.expected(Ticket.objects.all()))
+        self.assertEqual(
+            self.export(self.student)[0],
+            self.expected(Ticket.objects.filter(Q(created_by=self.student) | Q(assigned_to=self.student))),
+        )
+
+    def test_queries_do_not_grow(self):
+        _, queries = self.export(self.staff)
+        for i in range(30):
+            Ticket.objects.create(subject=f'Ticket {i}', description='Slow', created_by=self.student, assigned_to=self.agent)
+        self.assertEqual(self.export(self.staff)[1], queries)
+
+
+class BenchmarkCommandTests(TestCase):
+    """benchmark_tickets covers every tickets URL and leaves its dataset as it found it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user('staff', 'staff', 'it', is_staff=True)
+        cls.student = make_user('student')
+        cls.ticket = Ticket.objects.create(subject='Portal', description='Cannot login', created_by=cls.student)
+
+    def command(self):
+        command = benchmark_tickets.Command(stdout=OutputWrapper(StringIO()))
+        command.iterations = 3
+        command.staff = command.other_staff = self.staff
+        command.student = self.student
+        command.ticket = self.ticket
+        command.attachment = None
+        command.export_job = ExportJob.objects.create(user=self.student)
+        return command
+
+    def test_every_url_has_a_case(self):
+        self.assertEqual(benchmark_tickets.unbenchmarked_urls(self.command().cases()), set())
+        self.assertEqual(benchmark_tickets.unbenchmarked_urls([]) & {'get_tickets_api'}, {'get_tickets_api'})
+
+    def test_measure(self):
+        command = self.command()
+
+        def read():
+            Ticket.objects.count()
+            Ticket.objects.exists()
+            return 200
+
+        result = command.measure('read', read)
+        self.assertEqual((result['status'], result['queries'], result['queries_cold']), (200, 2, 2))
+        self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+
+        def write():
+            Ticket.objects.create(subject='Wifi', description='Slow', created_by=self.student)
+            return 201
+
+        self.assertEqual(command.measure('write', write, rollback=True)['status'], 201)
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_percentile(self):
+        values = [5, 1, 4, 2, 3]
+        self.assertEqual(
+            [benchmark_tickets.percentile(values, pct) for pct in (0, 20, 50, 95, 100)], [1, 1, 3, 5, 5],
+        )
+
+
+class SeedTicketsTests(TestCase):
+    """seed_tickets is deterministic for a seed and leaves derived data consistent."""
+
+    def dataset(self):
+        return list(Ticket.objects.order_by('created_at').values_list(
+            'subject', 'description', 'status', 'priority', 'department',
+            'created_by__username', 'assigned_to__username',
+        ))
+
+    def test_command(self):
+        out = StringIO()
+        call_command(
+            'seed_tickets', users=20, tickets=50, comments_per_ticket=2, attachments_per_ticket=1,
+            batch_size=16, seed=7, stdout=out,
+        )
+        self.assertIn('✓ Seeded 50 tickets', out.getvalue())
+        self.assertEqual(CustomUser.objects.filter(username__startswith='seed_user_').count(), 20)
+        self.assertEqual(Ticket.objects.count(), 50)
+        self.assertEqual(find_discrepancies(), [])
+        self.assertEqual(Ticket.objects.filter(status='open', sla_due_at__isnull=True).count(), 0)
+        self.assertFalse(Ticket.objects.exclude(status='open').filter(assigned_to__isnull=True).exists())
+
+        # Seed users are reused
+        call_command('seed_tickets', users=20, tickets=5, seed=7, stdout=StringIO())
+        self.assertEqual(CustomUser.objects.filter(username__startswith='seed_user_').count(), 20)
+        self.assertEqual(Ticket.objects.count(), 55)
+
+    def test_same_seed_same_data(self):
+        with transaction.atomic():
+            summary = TicketSeeder(users=10, tickets=30, batch_size=8, seed=3).run()
+            first = self.dataset()
+            transaction.set_rollback(True)
+        self.assertEqual(TicketSeeder(users=10, tickets=30, batch_size=8, seed=3).run(), summary)
+        self.assertEqual(self.dataset(), first)
+
+        Ticket.objects.all().delete()
+        TicketSeeder(users=10, tickets=30, batch_size=8, seed=4).run()
+        self.assertNotEqual(self.dataset(), first)
+
+    def test_invalid_options(self):
+        with self.assertRaisesMessage(CommandError, 'Invalid weight "bogus=1"'):
+            call_command('seed_tickets', tickets=1, status_weights='bogus=1', stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, 'At least one weight must be positive'):
+            call_command('seed_tickets', tickets=1, priority_weights='low=0', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('seed_tickets', tickets=1, batch_size=0, stdout=StringIO())
+
+
+class RequestMetricsTests(TestCase):
+    """RequestMetricsMiddleware counts queries and duplicates per request and view."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user('staff', 'staff', 'it', is_staff=True)
+        cls.student = make_user('student')
+        for i in range(5):
+            Ticket.objects.create(subject=f'Portal {i}', description='Cannot login', created_by=cls.student)
+
+    def setUp(self):
+        metrics_registry.reset()
+        self.addCleanup(metrics_registry.reset)
+
+    def test_duplicate_queries(self):
+        def view(request):
+            for _ in range(3):
+                list(Ticket.objects.filter(subject='Portal 0'))
+            Ticket.objects.count()
+            return HttpResponse()
+
+        response = RequestMetricsMiddleware(view)(RequestFactory().get('/'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="4 queries"')
+        self.assertIn('dup;desc="2 duplicate queries"', timing)
+
+        metrics = metrics_registry.snapshot()['unresolved']
+        self.assertEqual((metrics['requests'], metrics['queries_max'], metrics['duplicate_queries_max']), (1, 4, 2))
+        self.assertEqual(metrics['most_repeated_query']['count'], 3)
+        self.assertEqual(sum(metrics['histogram'].values()), 1)
+
+    def test_metrics_api(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('tickets:get_tickets_api'))
+        self.assertEqual(response.status_code, 200)
+        # The list endpoint does not query per ticket
+        self.assertNotIn('dup;', response['Server-Timing'])
+
+        url = reverse('dashboard:request_metrics_api')
+        views = self.client.get(url, {'reset': 'true'}).json()['views']
+        self.assertEqual(views['tickets:get_tickets_api']['requests'], 1)
+        self.assertEqual(views['tickets:get_tickets_api']['duplicate_queries_max'], 0)
+        self.assertEqual(list(self.client.get(url).json()['views']), ['dashboard:request_metrics_api'])
+
+        self.client.force_login(self.student)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class TicketDetailAPITests(TestCase):
+    """The detail API costs the same queries however long the thread, and pages comments."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user('staff', 'staff', 'it', is_staff=True)
+        cls.student = make_user('student')
+        cls.ticket = Ticket.objects.create(
+            subject='Portal', description='Cannot login', created_by=cls.student, assigned_to=cls.staff,
+        )
+
+    def add_thread(self, count):
+        for i in range(count):
+            author = make_user(f'author_{count}_{i}', 'staff', is_staff=True) if i % 2 else self.student
+            TicketComment.objects.create(
+                ticket=self.ticket, author=author, content=f'Comment {i}', is_internal=i % 4 == 1,
+            )
+            TicketAttachment.objects.create(
+                ticket=self.ticket, file=f'ticket_attachments/{count}_{i}.pdf', filename=f'{count}_{i}.pdf',
+                file_type='application/pdf', file_size=1000, uploaded_by=author,
+            )
+
+    def get(self, **params):
+        return self.client.get(reverse('tickets:get_ticket_detail_api', args=[self.ticket.pk]), params)
+
+    def test_constant_queries(self):
+        self.client.force_login(self.staff)
+        self.add_thread(1)
+        with CaptureQueriesContext(connection) as short:
+            self.assertEqual(len(self.get().json()['comments']), 1)
+        self.add_thread(8)
+        with CaptureQueriesContext(connection) as long:
+            data = self.get().json()
+        self.assertEqual((len(data['comments']), len(data['attachments'])), (9, 9))
+        self.assertEqual(len(long), len(short))
+
+    def test_internal_comments_hidden(self):
+        self.add_thread(8)
+        self.client.force_login(self.student)
+        comments = self.get().json()['comments']
+        self.assertEqual(len(comments), 6)
+        self.assertFalse(any(comment['is_internal'] for comment in comments))
+
+    def test_comment_pages(self):
+        self.add_thread(7)
+        self.client.force_login(self.staff)
+        expected = [comment['id'] for comment in self.get().json()['comments']]
+
+        seen, after = [], ''
+        while True:
+            data = self.get(comments_after=after, comments_limit=3).json()
+            seen += [comment['id'] for comment in data['comments']]
+            pagination = data['comments_pagination']
+            self.assertEqual(pagination['limit'], 3)
+            if not pagination['has_more']:
+                self.assertIsNone(pagination['next_after'])
+                break
+            after = pagination['next_after']
+        self.assertEqual(seen, expected)
+        self.assertNotIn('comments_pagination', self.get().json())
+        self.assertEqual(self.get(comments_limit='many').status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+    """The list API answers an unchanged poll with a 304 and changes its ETag with the tickets."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user('staff', 'staff', 'it', is_staff=True)
+        cls.other_staff = make_user('other_staff', 'staff', 'it', is_staff=True)
+        cls.student = make_user('student')
+        for i in range(4):
+            Ticket.objects.create(
+                subject=f'Portal {i}', description='Cannot login', status=['open', 'resolved'][i % 2],
+                created_by=cls.student,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.staff)
+
+    def get(self, params=None, **headers):
+        return self.client.get(reverse('tickets:get_tickets_api'), params or {}, headers=headers)
+
+    def test_unchanged_poll(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with CaptureQueriesContext(connection) as full:
+            self.get()
+        with CaptureQueriesContext(connection) as poll:
+            not_modified = self.get(if_none_match=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        self.assertEqual(not_modified.content, b'')
+        self.assertLess(len(poll), len(full))
+
+        self.assertEqual(self.get(if_modified_since=response['Last-Modified']).status_code, 304)
+
+    def test_etag_changes(self):
+        etag = self.get()['ETag']
+        ticket = Ticket.objects.first()
+
+        TicketComment.objects.create(ticket=ticket, author=self.staff, content='Looking into it')
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        etag = response['ETag']
+
+        ticket.priority = 'urgent'
+        ticket.save()
+        self.assertEqual(self.get(if_none_match=etag).status_code, 200)
+        etag = self.get()['ETag']
+
+        # Deleting an older ticket leaves the latest activity unchanged
+        Ticket.objects.exclude(pk=ticket.pk).order_by('last_activity_at').first().delete()
+        self.assertEqual(self.get(if_none_match=etag).status_code, 200)
+
+    def test_etag_per_user_and_filter(self):
+        etag = self.get()['ETag']
+        self.assertNotEqual(self.get({'status': 'open'})['ETag'], etag)
+        self.assertEqual(self.get({'status': 'open'}, if_none_match=etag).status_code, 200)
+
+        self.client.force_login(self.other_staff)
+        self.assertNotEqual(self.get()['ETag'], etag)
+        self.assertEqual(self.get(if_none_match=etag).status_code, 200)
@@ -1,6 +1,6 @@
 
 from django.urls import path
-from . import views
+from . import async_views, views
 
 app_name = 'tickets'
 
@@ -16,14 +16,26 @@ urlpatterns = [
     # API endpoints
     path('api/tickets/', views.get_tickets_api, name='get_tickets_api'),
     path('api/tickets/stats/', views.get_ticket_stats_api, name='get_ticket_stats_api'),
+    path('api/tickets/events/', views.ticket_events_stream, name='ticket_events_stream'),
     path('api/tickets/search/', views.search_tickets_api, name='search_tickets_api'),
     path('api/tickets/submit/', views.submit_ticket_api, name='submit_ticket_api'),
+    path('api/tickets/submit/batch/', views.submit_tickets_batch_api, name='submit_tickets_batch_api'),
     path('api/tickets/bulk-update/', views.bulk_update_tickets_api, name='bulk_update_tickets_api'),
     path('api/tickets/export/', views.export_tickets_csv, name='export_tickets_csv'),
+    path('api/exports/<int:job_id>/', views.export_job_status_api, name='export_job_status_api'),
+    path('api/exports/<int:job_id>/download/', views.download_export, name='download_export'),
     path('api/departments/', views.get_departments_api, name='get_departments_api'),
     path('api/users/', views.get_users_api, name='get_users_api'),
+    path('api/analytics/trends/', views.get_ticket_trends_api, name='get_ticket_trends_api'),
     path('api/tickets/<int:ticket_id>/', views.get_ticket_detail_api, name='get_ticket_detail_api'),
+    path('api/tickets/<int:ticket_id>/timeline/', views.get_ticket_timeline_api, name='get_ticket_timeline_api'),
     path('api/tickets/<int:ticket_id>/comment/', views.add_comment_api, name='add_comment_api'),
     path('api/tickets/<int:ticket_id>/status/', views.update_ticket_status_api, name='update_ticket_status_api'),
     path('api/tickets/<int:ticket_id>/assign/', views.assign_ticket_api, name='assign_ticket_api'),
+    
+    # Async versions of the read-heavy endpoints, for ASGI deployments
+    path('api/async/tickets/', async_views.get_tickets_api, name='async_get_tickets_api'),
+    path('api/async/tickets/stats/', async_views.get_ticket_stats_api, name='async_get_ticket_stats_api'),
+    path('api/async/tickets/search/', async_views.search_tickets_api, name='async_search_tickets_api'),
+    path('api/async/tickets/<int:ticket_id>/', async_views.get_ticket_detail_api, name='async_get_ticket_detail_api'),
 ]
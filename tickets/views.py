@@ -2,16 +2,36 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .models import Ticket, TicketComment, TicketAttachment
+from .models import Ticket, TicketComment, TicketAttachment, TicketCounter, ExportJob
 from .forms import TicketForm, TicketUpdateForm, TicketCommentForm
 from .routing import TicketRouter
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST, require_http_methods
+from .workload import workload_ledger
+from .pagination import InvalidCursor, cached_count, comment_page_params, comments_after, keyset_page
+from .stats import rollup_stats, today_stats
+from .analytics import last_updated, trend_params, trend_rows
+from .counters import update_tickets
+from .history import attribute_change, describe_events, serialize_events
+from .services import create_tickets, max_batch_size
+from .search import search_tickets
+from .exports import enqueue_export, fail_if_stale, parquet_available, stream_csv
+from .events import event_stream
+from .filters import filter_params, filter_tickets, ticket_listing
+from .serializers import (
+    serialize_attachment, serialize_comment, serialize_search_result, serialize_ticket_detail,
+    serialize_ticket_row,
+)
+from .response_cache import cached_payload
+from .conditional import listed_tickets, single_ticket, ticket_scope_condition, visible_tickets
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import condition, require_POST, require_http_methods
+from django.views.decorators.cache import cache_control
 from django.utils.html import escape
 from django.core.paginator import Paginator
-from django.db.models import Q, Count
+from django.db.models import Q, Count, Sum
 from django.views.decorators.csrf import csrf_exempt
 import json
+import os
 from django.utils import timezone
 from datetime import datetime, timedelta
 
@@ -21,65 +41,51 @@ def ticket_list(request):
     return render(request, 'tickets/ticket_list.html', {'tickets': tickets})
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@ticket_scope_condition(listed_tickets)
 def get_tickets_api(request):
     """
-    API endpoint to get tickets with filtering and pagination
+    API endpoint to get tickets with filtering and pagination.
+    Pass ``cursor`` (empty for the first page) to use keyset pagination
+    instead of page numbers.
     """
-    # Get query parameters
-    status = request.GET.get('status', '')
-    priority = request.GET.get('priority', '')
-    department = request.GET.get('department', '')
-    assigned_to_me = request.GET.get('assigned_to_me', 'false').lower() == 'true'
-    my_tickets = request.GET.get('my_tickets', 'false').lower() == 'true'
     page = int(request.GET.get('page', 1))
     per_page = int(request.GET.get('per_page', 20))
     
-    # Start with base queryset
-    tickets = Ticket.objects.all()
-    
-    # Apply filters based on user role
-    if not request.user.is_staff:
-        # Regular users only see their own tickets or tickets assigned to them
-        tickets = tickets.filter(
-            Q(created_by=request.user) | Q(assigned_to=request.user)
-        )
-    
-    # Apply additional filters
-    if status:
-        tickets = tickets.filter(status=status)
-    if priority:
-        tickets = tickets.filter(priority=priority)
-    if department:
-        tickets = tickets.filter(department=department)
-    if assigned_to_me:
-        tickets = tickets.filter(assigned_to=request.user)
-    if my_tickets:
-        tickets = tickets.filter(created_by=request.user)
-    
-    # Order by creation date (newest first)
-    tickets = tickets.order_by('-created_at')
+    # Tickets the user may see, narrowed by the status/priority/department
+    # and my_tickets/assigned_to_me filters
+    tickets = filter_tickets(request.user, request.GET)
+    
+    # Newest first, with only the serialized columns; a page is one query
+    tickets = ticket_listing(tickets)
+    
+    # Cursor mode: constant-time pages, total count only on request and
+    # served from a short-lived cache
+    if 'cursor' in request.GET:
+        try:
+            page_tickets, next_cursor = keyset_page(tickets, request.GET['cursor'], per_page)
+        except InvalidCursor as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        pagination = {
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'has_next': next_cursor is not None,
+        }
+        if request.GET.get('include_count', 'false').lower() == 'true':
+            pagination['total_count'] = cached_count(tickets)
+        
+        return JsonResponse({
+            'tickets': [serialize_ticket_row(ticket) for ticket in page_tickets],
+            'pagination': pagination,
+        })
     
     # Paginate
     paginator = Paginator(tickets, per_page)
     page_obj = paginator.get_page(page)
     
     # Serialize tickets
-    tickets_data = []
-    for ticket in page_obj:
-        tickets_data.append({
-            'id': ticket.id,
-            'subject': ticket.subject,
-            'description': ticket.description,
-            'status': ticket.status,
-            'priority': ticket.priority,
-            'department': ticket.department,
-            'created_by': ticket.created_by.username,
-            'assigned_to': ticket.assigned_to.username if ticket.assigned_to else None,
-            'created_at': ticket.created_at.isoformat(),
-            'updated_at': ticket.updated_at.isoformat(),
-            'comments_count': ticket.comments.count(),
-            'attachments_count': ticket.attachments.count(),
-        })
+    tickets_data = [serialize_ticket_row(ticket) for ticket in page_obj]
     
     return JsonResponse({
         'tickets': tickets_data,
@@ -93,49 +99,78 @@ def get_tickets_api(request):
     })
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@ticket_scope_condition(visible_tickets, daily=True)
 def get_ticket_stats_api(request):
     """
     API endpoint to get ticket statistics
     """
     if request.user.is_staff:
-        # Admin stats - all tickets
-        stats = {
-            'open': Ticket.objects.filter(status='open').count(),
-            'in_progress': Ticket.objects.filter(status='in_progress').count(),
-            'on_hold': Ticket.objects.filter(status='on_hold').count(),
-            'resolved': Ticket.objects.filter(status='resolved').count(),
-            'closed': Ticket.objects.filter(status='closed').count(),
-            'urgent': Ticket.objects.filter(priority='urgent', status__in=['open', 'in_progress']).count(),
-            'total': Ticket.objects.count(),
-        }
+        # Admin stats - all tickets, from the counter rollups
+        stats = rollup_stats()
         
         # Recent activity
-        today = timezone.now().date()
-        stats['created_today'] = Ticket.objects.filter(created_at__date=today).count()
-        stats['resolved_today'] = Ticket.objects.filter(
-            status='resolved', 
-            updated_at__date=today
-        ).count()
+        stats.update(today_stats(Ticket.objects.all()))
         
     else:
         # User stats - only their tickets
-        user_tickets = Ticket.objects.filter(
-            Q(created_by=request.user) | Q(assigned_to=request.user)
-        )
-        
-        stats = {
-            'open': user_tickets.filter(status='open').count(),
-            'in_progress': user_tickets.filter(status='in_progress').count(),
-            'on_hold': user_tickets.filter(status='on_hold').count(),
-            'resolved': user_tickets.filter(status='resolved').count(),
-            'closed': user_tickets.filter(status='closed').count(),
-            'urgent': user_tickets.filter(priority='urgent', status__in=['open', 'in_progress']).count(),
-            'total': user_tickets.count(),
-            'my_tickets': Ticket.objects.filter(created_by=request.user).count(),
-            'assigned_to_me': Ticket.objects.filter(assigned_to=request.user).count(),
-        }
+        stats = rollup_stats(request.user)
     
     return JsonResponse(stats)
+
+def trends_last_modified(request):
+    # None skips the conditional check, so non-staff users still get a 403
+    return last_updated() if request.user.is_staff else None
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(last_modified_func=trends_last_modified)
+def get_ticket_trends_api(request):
+    """
+    API endpoint for tickets created and resolved over time (admin only).
+    Read from the activity rollups, so it is as current as the last
+    rollup_ticket_activity run. Takes granularity (day or hour), since and
+    until (ISO dates, the last 12 months by default) and group_by
+    (department or priority).
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Permission denied - admin only'}, status=403)
+    
+    try:
+        granularity, start, end, group_by = trend_params(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    updated_at = last_updated()
+    return JsonResponse({
+        'granularity': granularity,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'group_by': group_by,
+        'updated_at': updated_at.isoformat() if updated_at else None,
+        'series': [{
+            'bucket': row['bucket'].isoformat(),
+            **({group_by: row[group_by]} if group_by else {}),
+            'created': row['created_count'],
+            'resolved': row['resolved_count'],
+        } for row in trend_rows(granularity, start, end, group_by)],
+    })
+
+@login_required
+@require_http_methods(["GET"])
+async def ticket_events_stream(request):
+    """
+    Server-Sent Events stream of the ticket changes the user may see
+    (created, status, assignment, comment). Needs an ASGI server.
+    """
+    user = await request.auser()
+    response = StreamingHttpResponse(
+        event_stream(user.pk, user.is_staff), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Keep nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
     
 @login_required
 def ticket_detail(request, ticket_id):
@@ -157,6 +192,7 @@ def ticket_detail(request, ticket_id):
             # Set ticket status to in_progress if it's currently open
             if ticket.status == 'open':
                 ticket.status = 'in_progress'
+                attribute_change(ticket, request.user, reason='commented')
                 ticket.save()
                 messages.info(request, "Ticket status updated to 'In Progress'")
             
@@ -168,78 +204,98 @@ def ticket_detail(request, ticket_id):
     return render(request, 'tickets/ticket_detail.html', {
         'ticket': ticket,
         'comments': comments,
-        'comment_form': comment_form
+        'comment_form': comment_form,
+        'history': describe_events(list(ticket.events.select_related('actor'))),
     })
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@ticket_scope_condition(single_ticket)
 def get_ticket_detail_api(request, ticket_id):
     """
-    API endpoint to get detailed ticket information
+    API endpoint to get detailed ticket information.
+    Comments come oldest first; pass ``comments_after`` (a comment id, empty
+    for the start) and/or ``comments_limit`` to load them in pages.
     """
-    ticket = get_object_or_404(Ticket, id=ticket_id)
+    ticket = get_object_or_404(
+        Ticket.objects.select_related('created_by', 'assigned_to'), id=ticket_id
+    )
     
     # Check permissions
-    if not request.user.is_staff and request.user != ticket.created_by and request.user != ticket.assigned_to:
+    if not request.user.is_staff and request.user.id not in (ticket.created_by_id, ticket.assigned_to_id):
         return JsonResponse({'error': 'Permission denied'}, status=403)
     
     # Serialize ticket data
-    ticket_data = {
-        'id': ticket.id,
-        'subject': ticket.subject,
-        'description': ticket.description,
-        'status': ticket.status,
-        'priority': ticket.priority,
-        'department': ticket.department,
-        'created_by': {
-            'id': ticket.created_by.id,
-            'username': ticket.created_by.username,
-            'email': ticket.created_by.email,
-        },
-        'assigned_to': {
-            'id': ticket.assigned_to.id,
-            'username': ticket.assigned_to.username,
-            'email': ticket.assigned_to.email,
-        } if ticket.assigned_to else None,
-        'created_at': ticket.created_at.isoformat(),
-        'updated_at': ticket.updated_at.isoformat(),
-    }
+    ticket_data = serialize_ticket_detail(ticket)
     
-    # Get comments
-    comments = []
-    for comment in ticket.comments.all():
-        # Only show internal comments to staff
-        if comment.is_internal and not request.user.is_staff:
-            continue
-            
-        comments.append({
-            'id': comment.id,
-            'content': comment.content,
-            'author': {
-                'id': comment.author.id,
-                'username': comment.author.username,
-            },
-            'created_at': comment.created_at.isoformat(),
-            'is_internal': comment.is_internal,
-        })
+    # Get comments with their authors; only staff see internal comments
+    comment_rows = ticket.comments.select_related('author').order_by('created_at', 'id')
+    if not request.user.is_staff:
+        comment_rows = comment_rows.filter(is_internal=False)
     
-    # Get attachments
-    attachments = []
-    for attachment in ticket.attachments.all():
-        attachments.append({
-            'id': attachment.id,
-            'filename': attachment.filename,
-            'file_type': attachment.file_type,
-            'file_size': attachment.file_size,
-            'uploaded_by': attachment.uploaded_by.username,
-            'uploaded_at': attachment.uploaded_at.isoformat(),
-            'url': attachment.file.url if attachment.file else None,
-        })
+    paginate_comments = 'comments_after' in request.GET or 'comments_limit' in request.GET
+    if paginate_comments:
+        try:
+            after, limit = comment_page_params(request.GET)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid comment pagination parameters'}, status=400)
+        
+        comment_rows = list(comments_after(comment_rows, after, limit))
+        has_more = len(comment_rows) > limit
+        comment_rows = comment_rows[:limit]
+    
+    comments = [serialize_comment(comment) for comment in comment_rows]
+    
+    # Get attachments with their uploaders
+    attachments = [
+        serialize_attachment(attachment)
+        for attachment in ticket.attachments.select_related('uploaded_by')
+    ]
     
     ticket_data['comments'] = comments
     ticket_data['attachments'] = attachments
+    if paginate_comments:
+        ticket_data['comments_pagination'] = {
+            'limit': limit,
+            'has_more': has_more,
+            'next_after': comments[-1]['id'] if has_more else None,
+        }
     
     return JsonResponse(ticket_data)
 
+@login_required
+@cache_control(private=True, no_cache=True)
+@ticket_scope_condition(single_ticket)
+def get_ticket_timeline_api(request, ticket_id):
+    """
+    API endpoint for a ticket's history: status, assignment, department and
+    priority changes, oldest first. Paginated like the detail API's
+    comments, with ``after`` (an event id) and ``limit``.
+    """
+    ticket = get_object_or_404(Ticket, id=ticket_id)
+    
+    if not request.user.is_staff and request.user.id not in (ticket.created_by_id, ticket.assigned_to_id):
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    try:
+        after, limit = comment_page_params(request.GET, prefix='')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid pagination parameters'}, status=400)
+    
+    events = list(comments_after(ticket.events.select_related('actor'), after, limit))
+    has_more = len(events) > limit
+    events = serialize_events(events[:limit])
+    
+    return JsonResponse({
+        'ticket_id': ticket.id,
+        'events': events,
+        'pagination': {
+            'limit': limit,
+            'has_more': has_more,
+            'next_after': events[-1]['id'] if has_more else None,
+        },
+    })
+
 @login_required
 def create_ticket(request):
     if request.method == 'POST':
@@ -265,7 +321,9 @@ def create_ticket(request):
                     ticket.status = 'in_progress'
                     messages.info(request, f'Ticket automatically assigned to {assigned_user.username}.')
             
+            attribute_change(ticket, request.user)
             ticket.save()
+            workload_ledger.record_change(None, None, ticket.assigned_to_id, ticket.status)
             
             # Handle file attachments
             files = request.FILES.getlist('attachments')
@@ -301,35 +359,15 @@ def submit_ticket_api(request):
     try:
         data = json.loads(request.body)
         
-        # Validate required fields
-        if not data.get('subject') or not data.get('description'):
-            return JsonResponse({'error': 'Subject and description are required'}, status=400)
-        
-        # Sanitize input
-        subject = escape(data['subject'][:255])  # Limit length
-        description = escape(data['description'][:2000])  # Limit length
-        priority = data.get('priority', 'medium')
-        department = data.get('department', '')
-        
-        # Create ticket
-        ticket = Ticket.objects.create(
-            subject=subject,
-            description=description,
-            priority=priority,
-            department=department,
-            created_by=request.user,
-        )
-        
-        # Auto-assign using the ticket router
-        if not request.user.is_staff:
-            dept, assigned_user = TicketRouter.route_ticket(ticket)
-            if dept:
-                ticket.department = dept
-            if assigned_user:
-                ticket.assigned_to = assigned_user
-                ticket.status = 'in_progress'
-            ticket.save()
+        # Validate, route and insert in one transaction: a single INSERT
+        result = create_tickets(request.user, [data])[0]
+        if not result['success']:
+            errors = result['errors']
+            if 'subject' in errors or 'description' in errors:
+                return JsonResponse({'error': 'Subject and description are required'}, status=400)
+            return JsonResponse({'error': next(iter(errors.values())), 'errors': errors}, status=400)
         
+        ticket = result['ticket']
         return JsonResponse({
             'success': True,
             'ticket_id': ticket.id,
@@ -343,6 +381,54 @@ def submit_ticket_api(request):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+@login_required
+@require_http_methods(["POST"])
+def submit_tickets_batch_api(request):
+    """
+    API endpoint to submit many tickets at once (e.g. email or kiosk imports).
+    JSON body: ``tickets``, a list of objects shaped like submit_ticket_api's
+    (staff may add ``created_by_id``), and optional ``all_or_nothing``.
+    All valid tickets are inserted in one transaction; the response has one
+    result per submitted ticket, in order.
+    """
+    try:
+        data = json.loads(request.body)
+        items = data.get('tickets') if isinstance(data, dict) else None
+        
+        if not isinstance(items, list) or not items:
+            return JsonResponse({'error': 'A non-empty "tickets" list is required'}, status=400)
+        if len(items) > max_batch_size():
+            return JsonResponse({'error': f'At most {max_batch_size()} tickets per batch'}, status=400)
+        
+        results = create_tickets(request.user, items, all_or_nothing=bool(data.get('all_or_nothing')))
+        
+        serialized = []
+        for result in results:
+            if result['success']:
+                ticket = result['ticket']
+                serialized.append({
+                    'index': result['index'],
+                    'success': True,
+                    'ticket_id': ticket.id,
+                    'assigned_to': ticket.assigned_to.username if ticket.assigned_to else None,
+                    'department': ticket.department,
+                })
+            else:
+                serialized.append(result)
+        created = sum(1 for result in results if result['success'])
+        
+        return JsonResponse({
+            'success': created == len(results),
+            'created_count': created,
+            'failed_count': len(results) - created,
+            'results': serialized,
+        })
+        
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
 @login_required
 @require_http_methods(["POST"])
 def add_comment_api(request, ticket_id):
@@ -381,6 +467,7 @@ def add_comment_api(request, ticket_id):
         # Update ticket status if it's currently open
         if ticket.status == 'open':
             ticket.status = 'in_progress'
+            attribute_change(ticket, request.user, reason='commented')
             ticket.save()
         
         return JsonResponse({
@@ -422,15 +509,10 @@ def update_ticket_status_api(request, ticket_id):
         
         old_status = ticket.status
         ticket.status = new_status
+        # The change is recorded in the ticket's history
+        attribute_change(ticket, request.user)
         ticket.save()
-        
-        # Add a system comment about the status change
-        TicketComment.objects.create(
-            ticket=ticket,
-            author=request.user,
-            content=f'Status changed from "{old_status}" to "{new_status}"',
-            is_internal=True,
-        )
+        workload_ledger.record_change(ticket.assigned_to_id, old_status, ticket.assigned_to_id, new_status)
         
         return JsonResponse({
             'success': True,
@@ -464,21 +546,19 @@ def assign_ticket_api(request, ticket_id):
             assignee = get_object_or_404(User, id=assignee_id)
             
             old_assignee = ticket.assigned_to
+            old_status = ticket.status
             ticket.assigned_to = assignee
             
             # Update status to in_progress if it was open
             if ticket.status == 'open':
                 ticket.status = 'in_progress'
             
+            # The change is recorded in the ticket's history
+            attribute_change(ticket, request.user)
             ticket.save()
-            
-            # Add a system comment
-            old_name = old_assignee.username if old_assignee else 'no one'
-            TicketComment.objects.create(
-                ticket=ticket,
-                author=request.user,
-                content=f'Ticket assigned from "{old_name}" to "{assignee.username}"',
-                is_internal=True,
+            workload_ledger.record_change(
+                old_assignee.id if old_assignee else None, old_status,
+                assignee.id, ticket.status,
             )
             
             return JsonResponse({
@@ -494,15 +574,10 @@ def assign_ticket_api(request, ticket_id):
             # Unassign ticket
             old_assignee = ticket.assigned_to
             ticket.assigned_to = None
+            attribute_change(ticket, request.user)
             ticket.save()
-            
             if old_assignee:
-                TicketComment.objects.create(
-                    ticket=ticket,
-                    author=request.user,
-                    content=f'Ticket unassigned from "{old_assignee.username}"',
-                    is_internal=True,
-                )
+                workload_ledger.record_change(old_assignee.id, ticket.status, None, ticket.status)
             
             return JsonResponse({
                 'success': True,
@@ -534,23 +609,33 @@ def bulk_update_tickets_api(request):
         
         tickets = Ticket.objects.filter(id__in=ticket_ids)
         updated_count = 0
+        changes = {}
         
         if action == 'close':
-            updated_count = tickets.update(status='closed')
+            changes = {'status': 'closed'}
         elif action == 'reopen':
-            updated_count = tickets.update(status='open')
+            changes = {'status': 'open'}
         elif action == 'mark_resolved':
-            updated_count = tickets.update(status='resolved')
+            changes = {'status': 'resolved'}
         elif action == 'assign':
             assignee_id = data.get('assignee_id')
             if assignee_id:
                 from django.contrib.auth import get_user_model
                 User = get_user_model()
                 assignee = get_object_or_404(User, id=assignee_id)
-                updated_count = tickets.update(assigned_to=assignee)
+                changes = {'assigned_to': assignee}
         else:
             return JsonResponse({'error': 'Invalid action'}, status=400)
         
+        if changes:
+            # Counters are kept in step within the update's transaction
+            # History is written for every ticket in one bulk insert
+            updated_count, transitions = update_tickets(tickets, actor=request.user, **changes)
+            workload_ledger.record_changes(
+                (old.assigned_to_id, old.status, new.assigned_to_id, new.status)
+                for old, new in transitions
+            )
+        
         return JsonResponse({
             'success': True,
             'message': f'{updated_count} tickets updated successfully',
@@ -579,83 +664,120 @@ def search_tickets_api(request):
             Q(created_by=request.user) | Q(assigned_to=request.user)
         )
     
-    # Search in subject, description, and comments
-    tickets = tickets.filter(
-        Q(subject__icontains=query) |
-        Q(description__icontains=query) |
-        Q(comments__content__icontains=query)
-    ).distinct()
-    
-    # Limit results
-    tickets = tickets[:20]
-    
-    # Serialize results
-    results = []
-    for ticket in tickets:
-        results.append({
-            'id': ticket.id,
-            'subject': ticket.subject,
-            'status': ticket.status,
-            'priority': ticket.priority,
-            'created_by': ticket.created_by.username,
-            'created_at': ticket.created_at.isoformat(),
-        })
+    # Full-text search over subject, description and public comments,
+    # best match first
+    tickets = search_tickets(tickets, query, limit=20)
     
-    return JsonResponse({'tickets': results})
+    return JsonResponse({'tickets': [serialize_search_result(ticket) for ticket in tickets]})
 
 @login_required
+@require_http_methods(["GET", "POST"])
 def export_tickets_csv(request):
     """
-    API endpoint to export tickets as CSV
+    API endpoint to export tickets as CSV.
+    GET streams the CSV straight away; POST queues a background export job
+    (JSON body: ``format`` csv, jsonl or parquet and optional ``filters``)
+    and returns its status. Both take the same filters as get_tickets_api.
     """
-    import csv
-    from django.http import HttpResponse
+    if request.method == 'POST':
+        return _queue_export(request)
     
-    # Get tickets based on user permissions
-    if request.user.is_staff:
-        tickets = Ticket.objects.all()
-    else:
-        tickets = Ticket.objects.filter(
-            Q(created_by=request.user) | Q(assigned_to=request.user)
-        )
+    # Get tickets based on user permissions and filters
+    tickets = filter_tickets(request.user, request.GET)
     
-    # Create HTTP response with CSV content type
-    response = HttpResponse(content_type='text/csv')
+    # Stream the CSV as it is written instead of building it in memory
+    response = StreamingHttpResponse(stream_csv(tickets), content_type='text/csv')
     response['Content-Disposition'] = f'attachment; filename="tickets_export_{timezone.now().strftime("%Y%m%d")}.csv"'
     
-    writer = csv.writer(response)
-    
-    # Write header
-    writer.writerow([
-        'Ticket ID', 'Title', 'Description', 'Status', 'Priority', 
-        'Creator', 'Assignee', 'Department', 'Created At', 'Updated At'
-    ])
-    
-    # Write ticket data
-    for ticket in tickets:
-        writer.writerow([
-            ticket.id,
-            ticket.subject,
-            ticket.description,
-            ticket.get_status_display(),
-            ticket.get_priority_display(),
-            ticket.created_by.username,
-            ticket.assigned_to.username if ticket.assigned_to else 'Unassigned',
-            ticket.department or 'N/A',
-            ticket.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            ticket.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
-        ])
-    
     return response
 
+def _queue_export(request):
+    try:
+        data = json.loads(request.body) if request.body else {}
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+    
+    filters = data.get('filters')
+    if filters is not None and not (
+        isinstance(filters, dict)
+        and all(isinstance(value, (str, int, float, bool)) for value in filters.values())
+    ):
+        return JsonResponse({'error': 'filters must be an object of filter values'}, status=400)
+    
+    export_format = data.get('format', 'csv')
+    if export_format not in dict(ExportJob.FORMAT_CHOICES):
+        return JsonResponse({'error': 'Invalid export format'}, status=400)
+    if export_format == 'parquet' and not parquet_available():
+        return JsonResponse({'error': 'Parquet export requires pyarrow'}, status=400)
+    
+    filters = filter_params(filters or request.GET)
+    job = enqueue_export(request.user, export_format, filters)
+    return JsonResponse(_serialize_export_job(job), status=202)
+
+def _serialize_export_job(job):
+    return {
+        'id': job.id,
+        'format': job.format,
+        'filters': job.filters,
+        'status': job.status,
+        'total_rows': job.total_rows,
+        'rows_written': job.rows_written,
+        'progress': round(job.progress, 4),
+        'error': job.error or None,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'status_url': reverse('tickets:export_job_status_api', args=[job.id]),
+        'download_url': (
+            reverse('tickets:download_export', args=[job.id]) if job.status == 'completed' else None
+        ),
+    }
+
+@login_required
+def export_job_status_api(request, job_id):
+    """
+    API endpoint to get the status and progress of an export job
+    """
+    job = get_object_or_404(ExportJob, id=job_id, user=request.user)
+    # Jobs orphaned by a restart would otherwise stay queued/running forever
+    job = fail_if_stale(job)
+    return JsonResponse(_serialize_export_job(job))
+
+@login_required
+def download_export(request, job_id):
+    """
+    Download the file of a completed export job
+    """
+    job = get_object_or_404(ExportJob, id=job_id, user=request.user)
+    if job.status != 'completed' or not job.file:
+        return JsonResponse({'error': 'Export is not ready'}, status=409)
+    
+    return FileResponse(
+        job.file.open('rb'), as_attachment=True, filename=os.path.basename(job.file.name)
+    )
+
 @login_required
 def get_departments_api(request):
     """
     API endpoint to get all departments
     """
-    # Since departments are stored as strings in tickets, we'll get unique departments
-    departments = Ticket.objects.values_list('department', flat=True).distinct()
-    departments = [dept for dept in departments if dept]  # Remove None values
+    # Cached until the next ticket change
+    payload = cached_payload('departments', ['tickets'], None, _departments_payload)
+    return JsonResponse(payload)
+
+def _departments_payload():
+    # Since departments are stored as strings in tickets, we'll get unique
+    # departments and their ticket counts from the counter rollups
+    ticket_counts = {
+        row['department']: row['ticket_count']
+        for row in TicketCounter.objects.exclude(department='').values('department').annotate(
+            ticket_count=Sum('count')
+        )
+        if row['ticket_count']
+    }
+    departments = list(ticket_counts)
     
     # Add standard departments that might not have tickets yet
     standard_departments = [
@@ -667,30 +789,59 @@ def get_departments_api(request):
     
     department_data = []
     for dept in all_departments:
-        ticket_count = Ticket.objects.filter(department=dept).count()
+        ticket_count = ticket_counts.get(dept, 0)
         department_data.append({
             'id': dept.lower().replace(' ', '_').replace('(', '').replace(')', ''),
             'name': dept,
             'ticket_count': ticket_count,
         })
     
-    return JsonResponse({'departments': department_data})
+    return {'departments': department_data}
 
 @login_required
 def get_users_api(request):
     """
-    API endpoint to get users (admin only)
+    API endpoint to get users (admin only), paginated.
+    Filters: ``role`` (including 'admin' for staff), ``department`` and
+    ``is_active``.
     """
     if not request.user.is_staff:
         return JsonResponse({'error': 'Permission denied'}, status=403)
     
+    try:
+        params = {
+            'page': int(request.GET.get('page', 1)),
+            'per_page': min(max(int(request.GET.get('per_page', 50)), 1), 500),
+            'role': request.GET.get('role', ''),
+            'department': request.GET.get('department', ''),
+            'is_active': request.GET.get('is_active', '').lower(),
+        }
+    except ValueError:
+        return JsonResponse({'error': 'Invalid pagination parameters'}, status=400)
+    
+    # Cached until the next user change
+    payload = cached_payload('users', ['users'], params, lambda: _users_payload(**params))
+    return JsonResponse(payload)
+
+def _users_payload(page, per_page, role, department, is_active):
     from django.contrib.auth import get_user_model
     User = get_user_model()
     
-    users = User.objects.all()
-    users_data = []
+    users = User.objects.order_by('id')
+    if role == 'admin':
+        users = users.filter(is_staff=True)
+    elif role:
+        users = users.filter(role=role, is_staff=False)
+    if department:
+        users = users.filter(department=department)
+    if is_active in ('true', 'false'):
+        users = users.filter(is_active=is_active == 'true')
+    
+    paginator = Paginator(users, per_page)
+    page_obj = paginator.get_page(page)
     
-    for user in users:
+    users_data = []
+    for user in page_obj:
         users_data.append({
             'id': user.id,
             'name': f"{user.first_name} {user.last_name}".strip() or user.username,
@@ -702,7 +853,16 @@ def get_users_api(request):
             'date_joined': user.date_joined.isoformat(),
         })
     
-    return JsonResponse({'users': users_data})
+    return {
+        'users': users_data,
+        'pagination': {
+            'current_page': page_obj.number,
+            'total_pages': paginator.num_pages,
+            'total_count': paginator.count,
+            'has_next': page_obj.has_next(),
+            'has_previous': page_obj.has_previous(),
+        }
+    }
 
 # ... keep existing code (update_ticket, delete_attachment, reroute_ticket methods)
 @login_required
@@ -722,12 +882,14 @@ def update_ticket(request, ticket_id):
             form = TicketForm(request.POST, instance=ticket)
         
         old_assigned_to = ticket.assigned_to
-        old_department = ticket.department
+        old_status = ticket.status
             
         if form.is_valid():
             # Save without committing to check for changes
             updated_ticket = form.save(commit=False)
             
+            attribute_change(updated_ticket, request.user)
+            
             # If non-admin user is updating and significant fields changed
             # re-route the ticket unless admin assigned it manually
             if (not request.user.is_staff and 
@@ -743,29 +905,14 @@ def update_ticket(request, ticket_id):
                     updated_ticket.assigned_to = assigned_user
                     updated_ticket.status = 'in_progress'
                     messages.info(request, f'Ticket reassigned to {assigned_user.username} based on your changes.')
+                attribute_change(updated_ticket, request.user, reason='routed')
             
+            # Assignment, department and status changes go to the history
             updated_ticket.save()
-            
-            # If admin manually changed assignment, log it
-            if request.user.is_staff:
-                if old_assigned_to != updated_ticket.assigned_to:
-                    new_assignee = updated_ticket.assigned_to.username if updated_ticket.assigned_to else "no one"
-                    old_assignee = old_assigned_to.username if old_assigned_to else "no one"
-                    
-                    comment = TicketComment(
-                        ticket=ticket,
-                        author=request.user,
-                        content=f"Changed assignment from {old_assignee} to {new_assignee}."
-                    )
-                    comment.save()
-                
-                if old_department != updated_ticket.department:
-                    comment = TicketComment(
-                        ticket=ticket,
-                        author=request.user,
-                        content=f"Changed department from {old_department or 'None'} to {updated_ticket.department or 'None'}."
-                    )
-                    comment.save()
+            workload_ledger.record_change(
+                old_assigned_to.id if old_assigned_to else None, old_status,
+                updated_ticket.assigned_to_id, updated_ticket.status,
+            )
             
             # Handle file attachments
             files = request.FILES.getlist('attachments')
@@ -828,6 +975,7 @@ def reroute_ticket(request, ticket_id):
     # Save old values for comparison
     old_department = ticket.department
     old_assigned_to = ticket.assigned_to
+    old_status = ticket.status
     
     # Get new assignments from router
     department, assigned_user = TicketRouter.route_ticket(ticket)
@@ -846,17 +994,14 @@ def reroute_ticket(request, ticket_id):
         if ticket.status == 'open':
             ticket.status = 'in_progress'
     
-    # Only save if there were changes
+    # Only save if there were changes; they are recorded in the history
     if has_changes:
+        attribute_change(ticket, request.user, reason='rerouted')
         ticket.save()
-        
-        # Add a comment about the re-routing
-        comment = TicketComment(
-            ticket=ticket,
-            author=request.user,
-            content=f"Ticket was re-routed to department: {department or 'None'}, assignee: {assigned_user.username if assigned_user else 'None'}."
+        workload_ledger.record_change(
+            old_assigned_to.id if old_assigned_to else None, old_status,
+            ticket.assigned_to_id, ticket.status,
         )
-        comment.save()
         
         return JsonResponse({
             'success': True,
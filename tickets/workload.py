@@ -0,0 +1,166 @@
+"""
+Workload ledger used by the ticket router to pick the least loaded assignee
+without counting every candidate's tickets on each routing decision.
+"""
+import heapq
+import threading
+import time
+
+from django.core.cache import cache
+
+from .response_cache import bump_version_on_commit, get_version
+
+
+class WorkloadLedger:
+    """
+    Active (open/in progress) ticket counts per assignee.
+
+    Counts live in Django's cache, keyed by user id, and are adjusted
+    incrementally by the views that create, assign or change the status of
+    tickets. Candidate pools from TicketRouter._candidate_users() are kept
+    in per-process heaps ordered the same way as that query, so picking an
+    assignee is a heap lookup rather than a COUNT over the tickets table.
+
+    Pools are rebuilt from the database every RECONCILE_INTERVAL seconds,
+    which also reseeds the cached counts and corrects any drift from changes
+    made outside the tracked code paths (admin edits, other processes when
+    the cache is not shared). They are also dropped as soon as a user is
+    saved (users_changed(), from a signal), so deactivated users or users
+    who moved department stop receiving tickets.
+    """
+
+    KEY_PREFIX = 'tickets:workload:'
+    RECONCILE_INTERVAL = 300  # seconds
+    # response_cache version bumped when candidate users change
+    USERS_NAMESPACE = 'workload-users'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._pools = {}
+        self._reconciled_at = time.monotonic()
+        self._users_version = None
+
+    def _key(self, user_id):
+        return f'{self.KEY_PREFIX}{user_id}'
+
+    def least_loaded(self, department, priority='medium'):
+        """
+        Return the least loaded eligible user for the department, or None.
+        """
+        users_version = get_version(self.USERS_NAMESPACE)
+        with self._lock:
+            if (
+                users_version != self._users_version
+                or time.monotonic() - self._reconciled_at > self.RECONCILE_INTERVAL
+            ):
+                self.reconcile()
+                self._users_version = users_version
+
+            pool_key = (department, priority == 'urgent')
+            pool = self._pools.get(pool_key)
+            if pool is None:
+                pool = self._build_pool(department, priority)
+
+            heap = pool['heap']
+            reseeded = False
+            while heap:
+                rank, load, user_id = heap[0]
+                current = cache.get(self._key(user_id))
+                if current is None:
+                    if not reseeded:
+                        # Count was evicted from the cache; reseed from the database
+                        pool = self._build_pool(department, priority)
+                        heap = pool['heap']
+                        reseeded = True
+                        continue
+                    current = load
+                if current != load:
+                    # Entry predates a change to this user's workload
+                    heapq.heapreplace(heap, (rank, current, user_id))
+                    continue
+                return pool['users'][user_id]
+            return None
+
+    def _build_pool(self, department, priority):
+        from .routing import TicketRouter
+
+        urgent = priority == 'urgent'
+        users = {}
+        ranks = {}
+        heap = []
+        for user in TicketRouter._candidate_users(department, priority):
+            # Same precedence as the query's ordering: department members
+            # first, then (for urgent tickets) admins, then workload.
+            rank = (not user.in_department, urgent and not user.is_staff)
+            users[user.id] = user
+            ranks[user.id] = rank
+            heap.append((rank, user.active_tickets, user.id))
+        heapq.heapify(heap)
+
+        cache.set_many(
+            {self._key(user_id): load for _, load, user_id in heap},
+            timeout=None,
+        )
+        pool = {'heap': heap, 'users': users, 'ranks': ranks}
+        self._pools[(department, urgent)] = pool
+        return pool
+
+    def reconcile(self):
+        """
+        Drop all pools so they are rebuilt, with fresh counts, on next use.
+        """
+        with self._lock:
+            self._pools = {}
+            self._reconciled_at = time.monotonic()
+
+    def users_changed(self):
+        """
+        Drop the pools of every process sharing the cache once the current
+        transaction commits, e.g. after a user was deactivated or moved.
+        """
+        bump_version_on_commit(self.USERS_NAMESPACE)
+
+    def record_change(self, old_assignee_id, old_status, new_assignee_id, new_status):
+        """
+        Record a ticket moving between assignees and/or statuses.
+        Pass None for the old values when the ticket is new.
+        """
+        self.record_changes([(old_assignee_id, old_status, new_assignee_id, new_status)])
+
+    def record_changes(self, changes):
+        """
+        Apply many (old_assignee_id, old_status, new_assignee_id, new_status)
+        changes with one cache update per affected user.
+        """
+        from .routing import TicketRouter
+
+        active = TicketRouter.ACTIVE_STATUSES
+        deltas = {}
+        for old_assignee_id, old_status, new_assignee_id, new_status in changes:
+            if old_assignee_id is not None and old_status in active:
+                deltas[old_assignee_id] = deltas.get(old_assignee_id, 0) - 1
+            if new_assignee_id is not None and new_status in active:
+                deltas[new_assignee_id] = deltas.get(new_assignee_id, 0) + 1
+
+        for user_id, delta in deltas.items():
+            if delta:
+                self._adjust(user_id, delta)
+
+    def _adjust(self, user_id, delta):
+        try:
+            load = cache.incr(self._key(user_id), delta)
+        except ValueError:
+            # Not tracked yet; the next pool build seeds it from the database
+            return
+
+        if delta < 0:
+            # A lighter workload must be able to reach the top of the heap;
+            # heavier workloads are corrected lazily when inspected.
+            with self._lock:
+                for pool in self._pools.values():
+                    rank = pool['ranks'].get(user_id)
+                    if rank is not None:
+                        heapq.heappush(pool['heap'], (rank, load, user_id))
+
+
+workload_ledger = WorkloadLedger()